@@ -3,13 +3,34 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+import timeit
 import unittest
 
 import isolation
+import endgame
 import game_agent
+import move_ordering
+import opening_book
+import parallel_search
+import results
+import sample_players
+import sprt
+import tournament
+import transposition
 
 from importlib import reload
 
+try:
+    import batch_scores
+except ImportError:  # NumPy is not installed
+    batch_scores = None
+
 
 class IsolationTest(unittest.TestCase):
     """Unit tests for isolation agents"""
@@ -21,5 +42,1290 @@ class IsolationTest(unittest.TestCase):
         self.game = isolation.Board(self.player1, self.player2)
 
 
+class KnightNeighborsTest(unittest.TestCase):
+    """Unit tests for the precomputed knight move tables"""
+
+    def test_board_sizes(self):
+        """ The tables list every on-board knight move for any board size. """
+        for width, height in [(7, 7), (1, 1), (3, 2), (5, 8), (9, 4)]:
+            neighbors = isolation.isolation.knight_neighbors(width, height)
+            self.assertIs(neighbors, isolation.isolation.knight_neighbors(width, height))
+            for idx in range(width * height):
+                r, c = idx % height, idx // height
+                expected = sorted((r + dr, c + dc)
+                                  for dr in (-2, -1, 1, 2) for dc in (-2, -1, 1, 2)
+                                  if abs(dr) != abs(dc) and
+                                  0 <= r + dr < height and 0 <= c + dc < width)
+                self.assertEqual(sorted(move for _, move in neighbors[idx]), expected)
+                for neighbor, (row, col) in neighbors[idx]:
+                    self.assertEqual(neighbor, row + col * height)
+
+
+class BitBoardTest(unittest.TestCase):
+    """Unit tests comparing the BitBoard backend to the list based Board"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def assertSameState(self, board, bitboard):
+        for player in (self.player1, self.player2):
+            self.assertEqual(sorted(board.get_legal_moves(player)),
+                             sorted(bitboard.get_legal_moves(player)))
+            self.assertEqual(board.get_player_location(player),
+                             bitboard.get_player_location(player))
+            self.assertEqual(board.utility(player), bitboard.utility(player))
+            self.assertEqual(board.is_winner(player), bitboard.is_winner(player))
+            self.assertEqual(board.is_loser(player), bitboard.is_loser(player))
+        self.assertEqual(board.active_player, bitboard.active_player)
+        self.assertEqual(board.get_blank_spaces(), bitboard.get_blank_spaces())
+        self.assertEqual(board._board_state, bitboard._board_state)
+        self.assertEqual(board.to_string(), bitboard.to_string())
+
+    def test_random_games(self):
+        """ The backends agree on every state of randomly played games. """
+        rng = random.Random(0)
+        for width, height in [(7, 7), (5, 8), (9, 4)]:
+            for _ in range(10):
+                board = isolation.Board(self.player1, self.player2, width, height)
+                bitboard = isolation.BitBoard(self.player1, self.player2, width, height)
+                self.assertSameState(board, bitboard)
+                while board.get_legal_moves():
+                    move = rng.choice(sorted(board.get_legal_moves()))
+                    self.assertTrue(bitboard.move_is_legal(move))
+                    board.apply_move(move)
+                    bitboard.apply_move(move)
+                    self.assertSameState(board, bitboard)
+
+    def test_seeded_move_order(self):
+        """ Seeded backends return the legal moves in the same order. """
+        for seed in range(5):
+            board = isolation.Board(self.player1, self.player2, seed=seed)
+            bitboard = isolation.BitBoard(self.player1, self.player2, seed=seed)
+            while True:
+                for player in (self.player1, self.player2):
+                    self.assertEqual(board.get_legal_moves(player), bitboard.get_legal_moves(player))
+                moves = board.get_legal_moves()
+                self.assertEqual(moves, bitboard.get_legal_moves())
+                if not moves:
+                    break
+                board.apply_move(moves[0])
+                bitboard.apply_move(moves[0])
+
+    def test_forecast_move(self):
+        """ forecast_move returns a BitBoard and leaves the original intact. """
+        bitboard = isolation.BitBoard(self.player1, self.player2)
+        bitboard.apply_move((3, 3))
+        child = bitboard.forecast_move((0, 0))
+        self.assertIsInstance(child, isolation.BitBoard)
+        self.assertEqual(bitboard.move_count, 1)
+        self.assertEqual(child.move_count, 2)
+        self.assertTrue(bitboard.move_is_legal((0, 0)))
+        self.assertFalse(child.move_is_legal((0, 0)))
+
+
+class PushPopTest(unittest.TestCase):
+    """Unit tests for the in-place push_move/pop_move board API"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def assertSameBoard(self, expected, actual):
+        self.assertEqual(expected._board_state, actual._board_state)
+        self.assertEqual(expected.move_count, actual.move_count)
+        self.assertEqual(expected.active_player, actual.active_player)
+        self.assertEqual(expected.inactive_player, actual.inactive_player)
+
+    def test_push_matches_forecast(self):
+        """ push_move produces the forecast_move state; pop_move restores. """
+        rng = random.Random(1)
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls(self.player1, self.player2)
+            history = []
+            while game.get_legal_moves():
+                for move in sorted(game.get_legal_moves()):
+                    expected = game.forecast_move(move)
+                    before = game.copy()
+                    game.push_move(move)
+                    self.assertSameBoard(expected, game)
+                    game.pop_move()
+                    self.assertSameBoard(before, game)
+                move = rng.choice(sorted(game.get_legal_moves()))
+                history.append(game.copy())
+                game.push_move(move)
+            while history:
+                game.pop_move()
+                self.assertSameBoard(history.pop(), game)
+            self.assertRaises(RuntimeError, game.pop_move)
+
+    def test_search_restores_board(self):
+        """ The search agents leave the board they are given unchanged. """
+        time_left = lambda: 1000.
+        agents = [game_agent.MinimaxPlayer(score_fn=sample_players.improved_score),
+                  game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score),
+                  sample_players.GreedyPlayer()]
+        for agent in agents:
+            game = isolation.Board(agent, self.player2)
+            game.apply_move((3, 3))
+            game.apply_move((2, 4))
+            before = game.copy()
+            if isinstance(agent, game_agent.MinimaxPlayer):
+                agent.time_left = time_left
+                move = agent.minimax(game, 3)
+            else:
+                start = timeit.default_timer()
+                move = agent.get_move(
+                    game, lambda: 150 - 1000 * (timeit.default_timer() - start))
+            self.assertIn(move, game.get_legal_moves())
+            self.assertSameBoard(before, game)
+
+    def test_agent_options(self):
+        """ The agents reject the options of the other search agent. """
+        self.assertRaises(TypeError, game_agent.MinimaxPlayer,
+                          ordering=move_ordering.MoveOrdering())
+        self.assertRaises(TypeError, game_agent.MinimaxPlayer, book=None)
+        self.assertRaises(TypeError, game_agent.AlphaBetaPlayer,
+                          batch_score_fn=lambda game, moves, player: None)
+        self.assertRaises(TypeError, game_agent.MCTSPlayer, endgame=None)
+
+    def test_alphabeta_matches_minimax(self):
+        """ Alpha-beta pruning chooses a move with the minimax value. """
+        time_left = lambda: 1000.
+        minimax_agent = game_agent.MinimaxPlayer(score_fn=sample_players.improved_score)
+        alphabeta_agent = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+        for agent in (minimax_agent, alphabeta_agent):
+            agent.time_left = time_left
+        rng = random.Random(2)
+        for _ in range(5):
+            game = isolation.Board(minimax_agent, self.player2)
+            ab_game = isolation.Board(alphabeta_agent, self.player2)
+            for _ in range(4):
+                move = rng.choice(sorted(game.get_legal_moves()))
+                game.apply_move(move)
+                ab_game.apply_move(move)
+            minimax_move = minimax_agent.minimax(game, 3)
+            alphabeta_move = alphabeta_agent.alphabeta(ab_game, 3)
+            values = {}
+            for move in game.get_legal_moves():
+                game.push_move(move)
+                values[move] = minimax_agent._min_value(game, 2)
+                game.pop_move()
+            self.assertEqual(values[minimax_move], max(values.values()))
+            self.assertEqual(values[alphabeta_move], max(values.values()))
+
+
+class EncodingTest(unittest.TestCase):
+    """Unit tests for the compact encoding of game states"""
+
+    def test_round_trip(self):
+        """ Decoded boards match the encoded state on both backends. """
+        rng = random.Random(0)
+        for _ in range(20):
+            game = isolation.Board("Player1", "Player2", shuffle_moves=False)
+            for _ in range(rng.randint(0, 12)):
+                moves = game.get_legal_moves()
+                if not moves:
+                    break
+                game.apply_move(rng.choice(moves))
+            for board_cls in (isolation.Board, isolation.BitBoard):
+                encoding = board_cls.decode(game.encode(), "Player1", "Player2").encode()
+                self.assertEqual(encoding, game.encode())
+                decoded = board_cls.decode(encoding, "Player1", "Player2",
+                                           shuffle_moves=False)
+                self.assertEqual(decoded.to_string(), game.to_string())
+                self.assertEqual(decoded.hash(), game.hash())
+                self.assertEqual(decoded.active_player, game.active_player)
+                self.assertEqual(decoded.get_legal_moves(), game.get_legal_moves())
+
+
+class ParallelSearchTest(unittest.TestCase):
+    """Unit tests for the parallel root search"""
+
+    def setUp(self):
+        # parallel_search must catch the SearchTimeout class of the current
+        # game_agent module, which other tests reload
+        reload(game_agent)
+        reload(parallel_search)
+
+    def test_get_move(self):
+        """ The parallel search returns a move from a completed search of
+        all root moves before the deadline. """
+        player = parallel_search.ParallelAlphaBetaPlayer(
+            workers=2, score_fn=sample_players.improved_score, instrument=True)
+        player.start()
+        try:
+            game = isolation.Board("Player1", player)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            game.apply_move((0, 2))
+            move_start = timeit.default_timer()
+            time_left = lambda: 150 - 1000 * (timeit.default_timer() - move_start)
+            move = player.get_move(game, time_left)
+            self.assertGreater(time_left(), 0)
+            self.assertIn(move, game.get_legal_moves())
+            self.assertGreaterEqual(player.stats.depth, 1)
+            self.assertGreater(player.stats.nodes, 0)
+        finally:
+            player.close()
+
+    def test_worker_values(self):
+        """ The values a worker reports for each depth are those of the
+        serial search of the same root moves. """
+        player = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+        player.time_left = lambda: float("inf")
+        game = isolation.Board("Player1", player)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        game.apply_move((0, 2))
+        moves = game.get_legal_moves()
+        results, _ = parallel_search.search_worker(
+            game.encode(), moves, (sample_players.improved_score, False, False),
+            timeit.default_timer() + 10., 4)
+        self.assertEqual(len(results), 4)
+        for depth, (value, _) in enumerate(results, 1):
+            expected = max(player._search(game.forecast_move(move), depth - 1, float("-inf"),
+                                          float("inf"), False)[0] for move in moves)
+            self.assertEqual(value, expected)
+
+
+class ZobristHashTest(unittest.TestCase):
+    """Unit tests for the incremental Zobrist hash of the board"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def full_hash(self, game):
+        """ Compute the Zobrist hash of a board from scratch. """
+        keys = isolation.isolation.zobrist_keys(game.width, game.height)
+        state = game._board_state
+        h = 0
+        for idx in range(game.width * game.height):
+            if state[idx]:
+                h ^= keys.blocked[idx]
+        for slot, loc in enumerate([state[-1], state[-2]]):
+            if loc is not None:
+                h ^= keys.locations[slot][loc]
+        if game.active_player == self.player2:
+            h ^= keys.side
+        return h
+
+    def test_incremental_hash(self):
+        """ apply_move, push_move and pop_move keep the hash up to date. """
+        rng = random.Random(3)
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls(self.player1, self.player2, 6, 8)
+            hashes = []
+            while game.get_legal_moves():
+                self.assertEqual(game.hash(), self.full_hash(game))
+                self.assertEqual(game.hash(), game.copy().hash())
+                hashes.append(game.hash())
+                game.push_move(rng.choice(sorted(game.get_legal_moves())))
+            while hashes:
+                game.pop_move()
+                self.assertEqual(game.hash(), hashes.pop())
+
+    def test_transpositions(self):
+        """ Equal states reached by different move orders share a hash. """
+        # (2, 2), (0, 3), (2, 4), (4, 3) form a cycle of knight moves
+        p2_moves = [(6, 6), (5, 4), (6, 2)]
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            games = []
+            for p1_moves in ([(2, 2), (0, 3), (2, 4), (4, 3)],
+                             [(2, 4), (0, 3), (2, 2), (4, 3)],
+                             [(4, 3), (2, 4), (0, 3), (2, 2)]):
+                game = board_cls(self.player1, self.player2)
+                for p1_move, p2_move in zip(p1_moves, p2_moves + [None]):
+                    game.apply_move(p1_move)
+                    if p2_move:
+                        game.apply_move(p2_move)
+                games.append(game)
+            self.assertEqual(games[0].hash(), games[1].hash())
+            self.assertNotEqual(games[0].hash(), games[2].hash())
+
+
+class SymmetryTest(unittest.TestCase):
+    """Unit tests for the canonical form of the board under its symmetries"""
+
+    def random_moves(self, rng, width, height, plies):
+        game = isolation.Board("Player1", "Player2", width, height)
+        moves = []
+        for _ in range(plies):
+            legal_moves = sorted(game.get_legal_moves())
+            if not legal_moves:
+                break
+            moves.append(rng.choice(legal_moves))
+            game.apply_move(moves[-1])
+        return moves
+
+    def test_canonical_invariant(self):
+        """ Every image of a state under a symmetry has the same canonical
+        key, and the moves map back and forth between them. """
+        rng = random.Random(5)
+        for width, height, num_symmetries in ((7, 7, 8), (6, 8, 4), (5, 5, 8)):
+            self.assertEqual(len(isolation.isolation.symmetries(width, height)),
+                             num_symmetries)
+            for plies in (0, 1, 2, 7, 20):
+                moves = self.random_moves(rng, width, height, plies)
+                keys = set()
+                for board_cls in (isolation.Board, isolation.BitBoard):
+                    for symmetry in range(num_symmetries):
+                        game = board_cls("Player1", "Player2", width, height)
+                        for move in moves:
+                            game.apply_move(game.transform_move(move, symmetry))
+                        key, to_canonical = game.canonical()
+                        keys.add(key)
+                        self.assertLessEqual(key, game.hash())
+                        for move in game.get_legal_moves():
+                            image = game.transform_move(move, to_canonical)
+                            self.assertEqual(game.transform_move(
+                                image, to_canonical, inverse=True), move)
+                self.assertEqual(len(keys), 1)
+
+    def test_canonical_move(self):
+        """ The moves of equivalent states map to the same canonical move. """
+        rng = random.Random(6)
+        moves = self.random_moves(rng, 7, 7, 6)
+        canonical_moves = set()
+        for symmetry in range(8):
+            game = isolation.Board("Player1", "Player2")
+            for move in moves:
+                game.apply_move(game.transform_move(move, symmetry))
+            _, to_canonical = game.canonical()
+            move = game.transform_move(moves[-1], symmetry)
+            canonical_moves.add(game.transform_move(move, to_canonical))
+        self.assertEqual(len(canonical_moves), 1)
+
+    def test_search_with_symmetry(self):
+        """ A table keyed on canonical states finds moves of the same value. """
+        time_left = lambda: 1000.
+        rng = random.Random(7)
+        reference = game_agent.MinimaxPlayer(score_fn=sample_players.improved_score)
+        reference.time_left = time_left
+        agent = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score,
+                                           tt=transposition.TranspositionTable(2**20),
+                                           symmetry=8)
+        agent.time_left = time_left
+        for _ in range(3):
+            game = isolation.Board(agent, "Player2")
+            ref_game = isolation.Board(reference, "Player2")
+            for move in self.random_moves(rng, 7, 7, 4):
+                game.apply_move(move)
+                ref_game.apply_move(move)
+            for depth in range(1, 5):
+                move = agent.alphabeta(game, depth)
+            values = {}
+            for m in ref_game.get_legal_moves():
+                ref_game.push_move(m)
+                values[m] = reference._min_value(ref_game, 3)
+                ref_game.pop_move()
+            self.assertEqual(values[move], max(values.values()))
+        self.assertGreater(agent.tt.stats.hits, 0)
+
+
+class EndgameTest(unittest.TestCase):
+    """Unit tests for the partition detector and the endgame solver"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def partitioned_games(self, count, seed):
+        """Play random games on a 5x5 board until the players are
+        partitioned, and return the games that are not over yet.
+        """
+        rng = random.Random(seed)
+        games = []
+        while len(games) < count:
+            game = isolation.Board("Player1", "Player2", width=5, height=5,
+                                   shuffle_moves=False)
+            while game.get_legal_moves():
+                if game.move_count >= 2 and endgame.partition(game) is not None:
+                    games.append(game)
+                    break
+                game.apply_move(rng.choice(game.get_legal_moves()))
+        return games
+
+    def test_partition(self):
+        """ Players that can reach a common cell are not partitioned. """
+        game = isolation.Board("Player1", "Player2")
+        self.assertIsNone(endgame.partition(game))
+        game.apply_move((0, 0))
+        game.apply_move((6, 6))
+        self.assertIsNone(endgame.partition(game))
+
+        for game in self.partitioned_games(10, seed=0):
+            (loc_1, region_1), (loc_2, region_2) = endgame.partition(game)
+            self.assertEqual(region_1 & region_2, 0)
+            for loc, region, player in [(loc_1, region_1, "Player1"),
+                                        (loc_2, region_2, "Player2")]:
+                self.assertEqual(game.get_player_location(player),
+                                 (loc % game.height, loc // game.height))
+                for r, c in game.get_legal_moves(player):
+                    self.assertTrue(region >> (r + c * game.height) & 1)
+
+    def test_solver_matches_search(self):
+        """ The solver agrees with an exhaustive alpha-beta search. """
+        solver = endgame.EndgameSolver(max_cells=25)
+        for game in self.partitioned_games(30, seed=1):
+            player = game_agent.AlphaBetaPlayer(score_fn=sample_players.null_score)
+            player.time_left = lambda: float("inf")
+            board = isolation.Board(player, "Opponent", width=5, height=5,
+                                    shuffle_moves=False)
+            if game.active_player == game._player_2:
+                board = isolation.Board("Opponent", player, width=5, height=5,
+                                        shuffle_moves=False)
+            board = type(board).decode(game.encode(), board._player_1, board._player_2)
+            depth = len(board.get_blank_spaces())
+            value = player._search(board, depth, float("-inf"), float("inf"), True)[0]
+
+            active_wins, move = solver.solve(game)
+            self.assertEqual(active_wins, value == float("inf"))
+            game.apply_move(move)
+            self.assertEqual(solver.solve(game)[0], not active_wins)
+
+    def test_search_agents(self):
+        """ The agents return the solver's move in a decided position. """
+        game = self.partitioned_games(1, seed=2)[0]
+        solver = endgame.EndgameSolver()
+        _, expected = solver.solve(game)
+        for agent_cls in (game_agent.MinimaxPlayer, game_agent.AlphaBetaPlayer):
+            player = agent_cls(score_fn=sample_players.improved_score,
+                               endgame=endgame.EndgameSolver())
+            players = ((player, "Opponent") if game.move_count % 2 == 0
+                       else ("Opponent", player))
+            board = isolation.Board.decode(game.encode(), *players)
+            self.assertEqual(player.get_move(board, lambda: 1000.), expected)
+            self.assertEqual(player.endgame.solved, 1)
+
+    def test_solve_timeout(self):
+        """ An agent whose endgame solve runs out of time plays the move of
+        its first search iteration. """
+
+        class TimeoutSolver(endgame.EndgameSolver):
+            def solve(self, game, check_timer=None):
+                raise game_agent.SearchTimeout()
+
+        game = self.partitioned_games(1, seed=7)[0]
+        player = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score,
+                                            endgame=TimeoutSolver())
+        players = ((player, "Opponent") if game.move_count % 2 == 0
+                   else ("Opponent", player))
+        board = isolation.Board.decode(game.encode(), *players, shuffle_moves=False)
+        player.time_left = lambda: float("inf")
+        expected = player.alphabeta(board, 1)
+        self.assertNotEqual(expected, board.get_legal_moves()[0])
+        self.assertEqual(player.get_move(board, lambda: 1000.), expected)
+
+
+class TranspositionTableTest(unittest.TestCase):
+    """Unit tests for the bounded-memory transposition table"""
+
+    def test_memory_budget(self):
+        """ The table never holds more entries than its budget allows. """
+        for max_bytes in (1000, 2**16, 10**6):
+            tt = transposition.TranspositionTable(max_bytes=max_bytes)
+            self.assertLessEqual(tt.num_entries * transposition.ENTRY_BYTES, max_bytes)
+            self.assertGreater(2 * tt.num_entries * transposition.ENTRY_BYTES, max_bytes)
+            for key in range(10 * tt.num_entries):
+                tt.store(key, 1, 0., transposition.EXACT, (0, 0))
+            self.assertEqual(len(tt), tt.num_entries)
+
+    def test_depth_preferred(self):
+        """ Deeper entries of the current search are not replaced. """
+        tt = transposition.TranspositionTable(
+            max_bytes=2 * transposition.ENTRY_BYTES, replacement="depth")
+        tt.store(0, 5, 1., transposition.EXACT, (0, 0))
+        tt.store(1, 3, 2., transposition.EXACT, (0, 1))
+        tt.store(2, 2, 3., transposition.EXACT, (0, 2))
+        self.assertIsNone(tt.lookup(2))
+        tt.store(2, 4, 3., transposition.EXACT, (0, 2))
+        self.assertEqual(tt.lookup(0).depth, 5)
+        self.assertIsNone(tt.lookup(1))
+        self.assertEqual(tt.lookup(2).move, (0, 2))
+        tt.store(0, 1, 1., transposition.LOWER, (1, 1))
+        self.assertEqual(tt.lookup(0).depth, 5)
+        tt.new_search()
+        tt.store(3, 1, 4., transposition.EXACT, (0, 3))
+        self.assertEqual(tt.lookup(3).depth, 1)
+        self.assertEqual(tt.stats.hits, 4)
+
+    def test_always_replace(self):
+        """ New entries always replace the oldest entry of the bucket. """
+        tt = transposition.TranspositionTable(
+            max_bytes=2 * transposition.ENTRY_BYTES, replacement="always")
+        tt.store(0, 5, 1., transposition.EXACT, (0, 0))
+        tt.store(1, 3, 2., transposition.EXACT, (0, 1))
+        tt.store(0, 1, 1., transposition.UPPER, (0, 0))
+        tt.store(2, 1, 3., transposition.EXACT, (0, 2))
+        self.assertIsNone(tt.lookup(1))
+        self.assertEqual(tt.lookup(0).depth, 1)
+        self.assertEqual(tt.lookup(2).depth, 1)
+
+    def test_search_with_table(self):
+        """ The agents find moves of the same value with a table. """
+        time_left = lambda: 1000.
+        rng = random.Random(4)
+        reference = game_agent.MinimaxPlayer(score_fn=sample_players.improved_score)
+        reference.time_left = time_left
+        for agent_cls in (game_agent.MinimaxPlayer, game_agent.AlphaBetaPlayer):
+            agent = agent_cls(score_fn=sample_players.improved_score,
+                              tt=transposition.TranspositionTable(2**20))
+            agent.time_left = time_left
+            for _ in range(3):
+                opening = []
+                game = isolation.Board(agent, "Player2")
+                for _ in range(4):
+                    move = rng.choice(sorted(game.get_legal_moves()))
+                    game.apply_move(move)
+                    opening.append(move)
+                ref_game = isolation.Board(reference, "Player2")
+                for move in opening:
+                    ref_game.apply_move(move)
+                if agent_cls is game_agent.MinimaxPlayer:
+                    move = agent.minimax(game, 3)
+                else:
+                    move = agent.alphabeta(game, 4)
+                depth = 3 if agent_cls is game_agent.MinimaxPlayer else 4
+                values = {}
+                for m in ref_game.get_legal_moves():
+                    ref_game.push_move(m)
+                    values[m] = reference._min_value(ref_game, depth - 1)
+                    ref_game.pop_move()
+                self.assertEqual(values[move], max(values.values()))
+            self.assertGreater(agent.tt.stats.probes, 0)
+
+
+class MoveOrderingTest(unittest.TestCase):
+    """Unit tests for the killer move, history and PV move ordering"""
+
+    def test_order(self):
+        """ PV, table and killer moves come first, then the history order. """
+        ordering = move_ordering.MoveOrdering()
+        ordering.start_iteration(3)
+        ordering.cutoff(1, 3, (0, 0))
+        ordering.cutoff(1, 1, (1, 1))
+        ordering.cutoff(3, 2, (2, 2))
+        ordering.cutoff(3, 1, (3, 3))
+        moves = [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4)]
+        self.assertEqual(ordering.order(moves[:], 1),
+                         [(1, 1), (0, 0), (2, 2), (3, 3), (4, 4)])
+        self.assertEqual(ordering.order(moves[:], 1, (4, 4)),
+                         [(4, 4), (1, 1), (0, 0), (2, 2), (3, 3)])
+        self.assertEqual(ordering.order(moves[:], 0), moves)
+
+        ordering.enter(0)
+        ordering.enter(1)
+        ordering.best_move(1, (2, 2))
+        ordering.best_move(0, (4, 4))
+        ordering.end_iteration()
+        self.assertEqual(ordering.pv, [(4, 4), (2, 2)])
+        ordering.start_iteration(3)
+        self.assertEqual(ordering.order(moves[:], 0)[0], (4, 4))
+
+        ordering.new_search()
+        self.assertEqual(ordering.pv, [])
+        self.assertEqual(ordering.history[1], {(0, 0): 4, (2, 2): 2})
+
+    def test_pv_only_on_pv_states(self):
+        """ The PV move of a ply is only searched first in the state of the
+        principal variation, not in its siblings. """
+        ordering = move_ordering.MoveOrdering()
+        ordering.pv = [(0, 0), (2, 2), (4, 4)]
+        ordering.history[1][(1, 1)] = 1
+        moves = [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4)]
+        ordering.start_iteration(3)
+        ordering.enter(0)
+        self.assertEqual(ordering.order(moves[:], 0)[0], (0, 0))
+        ordering.enter(1)
+        self.assertEqual(ordering.order(moves[:], 1)[0], (2, 2))
+        ordering.enter(2)
+        self.assertEqual(ordering.order(moves[:], 2)[0], (4, 4))
+        # A sibling of the PV state at ply 2, then the second child of the root
+        ordering.enter(2)
+        self.assertEqual(ordering.order(moves[:], 2), moves)
+        ordering.enter(1)
+        self.assertEqual(ordering.order(moves[:], 1)[0], (1, 1))
+        ordering.enter(2)
+        self.assertEqual(ordering.order(moves[:], 2), moves)
+
+        # A state below the root that was not reached with the PV move
+        ordering.start_iteration(3)
+        ordering.enter(0)
+        ordering.enter(1)
+        self.assertEqual(ordering.order(moves[:], 1)[0], (1, 1))
+
+    def test_search_value(self):
+        """ Alpha-beta with move ordering finds a move of the best minimax
+        value while searching fewer nodes. """
+        depth = 5
+        oracle = game_agent.MinimaxPlayer(score_fn=sample_players.improved_score)
+        oracle.time_left = lambda: float("inf")
+        for opening in [((2, 3), (4, 4)), ((0, 0), (3, 3)), ((6, 5), (1, 2))]:
+            nodes = []
+            for ordering in (None, move_ordering.MoveOrdering()):
+                player = game_agent.AlphaBetaPlayer(
+                    score_fn=sample_players.improved_score, ordering=ordering)
+                player.time_left = lambda: float("inf")
+                game = isolation.Board(player, "Player2", seed=3)
+                for move in opening:
+                    game.apply_move(move)
+                for d in range(1, depth + 1):
+                    move = player.alphabeta(game, d)
+                nodes.append(player.nodes_searched)
+
+                values = {}
+                oracle_game = isolation.Board(oracle, "Player2")
+                for m in opening:
+                    oracle_game.apply_move(m)
+                for m in oracle_game.get_legal_moves():
+                    oracle_game.push_move(m)
+                    values[m] = oracle._min_value(oracle_game, depth - 1)
+                    oracle_game.pop_move()
+                self.assertEqual(values[move], max(values.values()))
+            self.assertLess(nodes[1], nodes[0])
+
+
+class DeterministicMoveOrderTest(unittest.TestCase):
+    """Unit tests for seeded and unshuffled legal move generation"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def test_unshuffled(self):
+        """ Without shuffling both backends list moves by cell index. """
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls(self.player1, self.player2, shuffle_moves=False)
+            game.apply_move((3, 3))
+            game.apply_move((0, 0))
+            moves = game.get_legal_moves()
+            self.assertEqual(moves, [(2, 1), (4, 1), (1, 2), (5, 2),
+                                     (1, 4), (5, 4), (2, 5), (4, 5)])
+            self.assertEqual(moves, game.copy().get_legal_moves())
+
+    def test_seeded(self):
+        """ Boards with the same seed shuffle the moves the same way. """
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            orders = []
+            for _ in range(2):
+                game = board_cls(self.player1, self.player2, seed=5)
+                game.apply_move((3, 3))
+                game.apply_move((0, 0))
+                orders.append([game.get_legal_moves() for _ in range(10)] +
+                              [game.copy().get_legal_moves() for _ in range(10)])
+            self.assertEqual(orders[0], orders[1])
+
+    def test_play_seed(self):
+        """ Board.play reproduces a game between clock-independent agents. """
+        histories = []
+        for _ in range(2):
+            player1 = game_agent.MinimaxPlayer(
+                search_depth=2, score_fn=sample_players.improved_score)
+            player2 = game_agent.MinimaxPlayer(
+                search_depth=1, score_fn=sample_players.open_move_score)
+            game = isolation.Board(player1, player2)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            _, history, _ = game.play(time_limit=float("inf"), seed=7)
+            histories.append(history)
+        self.assertEqual(histories[0], histories[1])
+
+
+class RunawayPlayer():
+    """Player that never returns from get_move."""
+
+    def get_move(self, game, time_left):
+        while True:
+            pass
+
+
+class TimeControlTest(unittest.TestCase):
+    """Unit tests for the turn deadlines and the enforced time limit"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def test_deadline(self):
+        """ A deadline counts down the milliseconds left in the turn. """
+        deadline = isolation.Deadline(150)
+        left = deadline()
+        self.assertLessEqual(left, 150)
+        self.assertGreater(left, 100)
+        self.assertAlmostEqual(left + deadline.elapsed(), 150, delta=1)
+        self.assertEqual(deadline.stop_ns(10), deadline.end_ns - 10**7)
+        self.assertEqual(isolation.Deadline(float("inf"))(), float("inf"))
+
+    def test_agent_polls_deadline(self):
+        """ The agents stop at the threshold of a deadline without calling
+        it. """
+        player = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+        game = isolation.Board(player, "Player2")
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        deadline = isolation.Deadline(60)
+        self.assertIn(player.get_move(game, deadline), game.get_legal_moves())
+        self.assertEqual(player._stop_ns, deadline.stop_ns(player.TIMER_THRESHOLD))
+        self.assertGreaterEqual(deadline(), 0)
+        self.assertGreater(player.nodes_searched, 0)
+
+        player.time_left = lambda: 1000.
+        self.assertIsNone(player._stop_ns)
+
+    def test_enforced_timeout(self):
+        """ An agent that does not return loses on time without stalling the
+        game. """
+        runaway = RunawayPlayer()
+        opponent = sample_players.GreedyPlayer()
+        game = isolation.Board(runaway, opponent)
+        start = timeit.default_timer()
+        winner, history, termination = game.play(time_limit=50, enforce=True, grace=20)
+        self.assertLess(timeit.default_timer() - start, 1.)
+        self.assertIs(winner, opponent)
+        self.assertEqual(history, [])
+        self.assertEqual(termination, "timeout")
+        # The agent's thread is stopped
+        for thread in threading.enumerate():
+            if thread.name == "agent":
+                thread.join(1.)
+                self.assertFalse(thread.is_alive())
+
+    def test_enforced_game(self):
+        """ Enforcing the time limit does not change the outcome of a game
+        between agents that return in time. """
+        outcomes = []
+        for enforce in (False, True):
+            players = (sample_players.GreedyPlayer(), sample_players.GreedyPlayer())
+            game = isolation.Board(*players, seed=3)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            winner, history, termination = game.play(enforce=enforce)
+            outcomes.append((players.index(winner), history, termination))
+        self.assertEqual(outcomes[0], outcomes[1])
+
+
+class LowestMovePlayer():
+    """Player that plays its lowest legal move."""
+
+    def get_move(self, game, time_left):
+        legal_moves = game.get_legal_moves()
+        return min(legal_moves) if legal_moves else (-1, -1)
+
+
+class CrashingPlayer():
+    """Player that raises an exception instead of moving."""
+
+    def get_move(self, game, time_left):
+        raise RuntimeError("crashed")
+
+
+class ProcessPlayerTest(unittest.TestCase):
+    """Unit tests for the players running in worker processes"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def test_isolated_game(self):
+        """ Players in worker processes play the same game as in process. """
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            outcomes = []
+            for isolate in (False, True):
+                players = (LowestMovePlayer(), LowestMovePlayer())
+                game = board_cls(*players)
+                game.apply_move((2, 3))
+                game.apply_move((4, 4))
+                winner, history, termination = game.play(isolate=isolate)
+                outcomes.append((players.index(winner), history, termination))
+            self.assertEqual(outcomes[0], outcomes[1])
+
+    def test_crash_forfeits(self):
+        """ A player that crashes in its worker forfeits the game. """
+        crashing, opponent = CrashingPlayer(), LowestMovePlayer()
+        game = isolation.Board(opponent, crashing)
+        winner, history, termination = game.play(isolate=True)
+        self.assertIs(winner, opponent)
+        self.assertEqual(len(history), 1)
+        self.assertEqual(termination, "forfeit")
+
+        player = isolation.ProcessPlayer(CrashingPlayer())
+        self.assertIsNone(player.get_move(game, isolation.Deadline(100)))
+        self.assertEqual(player.error, "RuntimeError: crashed")
+        player.close()
+
+    def test_runaway_terminated(self):
+        """ A player that does not return is terminated with its worker. """
+        player = isolation.ProcessPlayer(RunawayPlayer(), grace=20)
+        game = isolation.Board("Player1", "Player2")
+        start = timeit.default_timer()
+        self.assertIsNone(player.get_move(game, isolation.Deadline(50)))
+        self.assertLess(timeit.default_timer() - start, 1.)
+        self.assertIsNone(player._process)
+
+        runaway, opponent = RunawayPlayer(), LowestMovePlayer()
+        game = isolation.Board(runaway, opponent)
+        winner, _, termination = game.play(time_limit=50, grace=20, isolate=True)
+        self.assertIs(winner, opponent)
+        self.assertEqual(termination, "timeout")
+
+    def test_stats_mirrored(self):
+        """ The search statistics of an isolated player reach its object in
+        the main process. """
+        player = game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score, instrument=True)
+        game = isolation.Board(player, LowestMovePlayer())
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        move_times = []
+        game.play(time_limit=50, move_times=move_times, isolate=True)
+        self.assertEqual(len(player.move_stats), len(move_times[::2]))
+        for stats, move_time in zip(player.move_stats, move_times[::2]):
+            self.assertAlmostEqual(stats.time_used, move_time, places=3)
+
+
+class PonderTest(unittest.TestCase):
+    """Unit tests for the search of the agents during the opponent's turn"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def make_agent(self, **kwargs):
+        return game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score, tt=transposition.TranspositionTable(),
+            ordering=move_ordering.MoveOrdering(), instrument=True, **kwargs)
+
+    def test_ponder_reused(self):
+        """ The results of pondering reach the search of the next move. """
+        agent = self.make_agent()
+        game = isolation.Board("Player1", agent)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        key = game.hash()
+        agent.ponder(game)
+        time.sleep(0.05)
+        reply = game.get_legal_moves()[0]
+        agent.stop_pondering(reply)
+        self.assertIsNone(agent._ponder_thread)
+        self.assertEqual(game.hash(), key)
+        self.assertGreater(len(agent.tt), 0)
+
+        game.apply_move(reply)
+        agent.tt.stats.reset()
+        move = agent.get_move(game, isolation.Deadline(50))
+        self.assertIn(move, game.get_legal_moves())
+        self.assertGreater(agent.stats.ponder_depth, 0)
+        self.assertIn(agent.stats.ponder_hit, (True, False))
+        self.assertGreater(agent.tt.stats.hits, 0)
+
+    def test_ponder_requires_table(self):
+        """ Agents without a transposition table do not ponder. """
+        agent = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+        game = isolation.Board("Player1", agent)
+        agent.ponder(game)
+        self.assertIsNone(agent._ponder_thread)
+        agent.stop_pondering((0, 0))
+        self.assertIsNone(agent._pondered)
+
+    def test_play_ponder(self):
+        """ Board.play() lets the agents ponder in process and in worker
+        processes, and stops them when the game ends. """
+        for isolate in (False, True):
+            agent = self.make_agent()
+            opponent = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+            game = isolation.Board(opponent, agent)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            winner, history, termination = game.play(time_limit=50, ponder=True,
+                                                     isolate=isolate)
+            self.assertIn(winner, (agent, opponent))
+            self.assertEqual(termination, "illegal move")
+            self.assertIsNone(agent._ponder_thread)
+            self.assertTrue(any(stats.ponder_depth > 0 for stats in agent.move_stats))
+
+        agent = self.make_agent()
+        opponent = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+        game = isolation.Board(opponent, agent)
+        game.play(time_limit=50)
+        self.assertTrue(all(stats.ponder_depth == 0 for stats in agent.move_stats))
+
+
+class SearchStatsTest(unittest.TestCase):
+    """Unit tests for the per-move search statistics of the agents"""
+
+    def test_minimax_stats(self):
+        """ A completed minimax search reports its depth and node count. """
+        player = game_agent.MinimaxPlayer(
+            search_depth=2, score_fn=sample_players.improved_score, instrument=True)
+        game = isolation.Board(player, "Player2")
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        player.get_move(game, lambda: float("inf"))
+        self.assertEqual(len(player.move_stats), 1)
+        stats = player.stats
+        self.assertEqual(stats.depth, 2)
+        self.assertEqual(stats.nodes, player.nodes_searched)
+        self.assertEqual(len(stats.iteration_times), 1)
+        self.assertFalse(stats.timed_out)
+        self.assertIsNone(stats.time_left)
+
+    def test_play_fills_stats(self):
+        """ Board.play records the time used and left for every move. """
+        player1 = game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score, instrument=True)
+        player2 = game_agent.MinimaxPlayer(
+            search_depth=1, score_fn=sample_players.open_move_score)
+        game = isolation.Board(player1, player2)
+        game.apply_move((2, 3))
+        game.apply_move((4, 4))
+        move_times = []
+        game.play(time_limit=150, move_times=move_times)
+        self.assertIsNone(player2.stats)
+        self.assertEqual(len(player1.move_stats), len(move_times[::2]))
+        for stats, move_time in zip(player1.move_stats, move_times[::2]):
+            self.assertAlmostEqual(stats.time_used, move_time, places=3)
+            self.assertGreaterEqual(stats.time_left, 0)
+            self.assertEqual(len(stats.iteration_times), stats.depth)
+            if stats.depth > 1:
+                self.assertGreater(stats.nodes, 0)
+        self.assertTrue(any(stats.cutoffs for stats in player1.move_stats))
+
+
+class MCTSTest(unittest.TestCase):
+    """Unit tests for the Monte Carlo tree search agent"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def rollout_budget(self, player, rollouts):
+        """ Return a time_left function that lets the player run a fixed
+        number of rollouts. """
+        calls = itertools.count()
+        return lambda: player.TIMER_THRESHOLD + rollouts - 1 - next(calls)
+
+    def test_board_unchanged(self):
+        """ The rollouts leave the board in its original state. """
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            player = game_agent.MCTSPlayer(seed=0)
+            game = board_cls(player, "Player2")
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            key, legal_moves = game.hash(), sorted(game.get_legal_moves())
+            move = player.get_move(game, self.rollout_budget(player, 300))
+            self.assertIn(move, legal_moves)
+            self.assertEqual(player.nodes_searched, 300)
+            self.assertEqual(game.hash(), key)
+            self.assertEqual(sorted(game.get_legal_moves()), legal_moves)
+
+    def test_winning_move(self):
+        """ The agent plays the move that leaves the opponent without moves
+        when every other move lets the opponent win at once. """
+        rng = random.Random(8)
+        for seed in range(5):
+            while True:
+                game = isolation.Board("Player1", "Player2", 5, 5)
+                moves = []
+                while game.get_legal_moves():
+                    legal_moves = sorted(game.get_legal_moves())
+                    winning = [move for move in legal_moves
+                               if not game.forecast_move(move).get_legal_moves()]
+                    if len(winning) == 1 and len(legal_moves) > 1 and all(
+                            any(not child.forecast_move(reply).get_legal_moves()
+                                for reply in child.get_legal_moves())
+                            for child in map(game.forecast_move, legal_moves)
+                            if child.get_legal_moves()):
+                        break
+                    moves.append(rng.choice(legal_moves))
+                    game.apply_move(moves[-1])
+                if game.get_legal_moves():
+                    break
+
+            player = game_agent.MCTSPlayer(seed=seed)
+            game = isolation.Board(*((player, "Opponent") if len(moves) % 2 == 0
+                                     else ("Opponent", player)), 5, 5)
+            for move in moves:
+                game.apply_move(move)
+            self.assertIn(player.get_move(game, self.rollout_budget(player, 500)),
+                          winning)
+
+    def test_tree_reuse(self):
+        """ The subtree of the opponent's reply is kept for the next move. """
+        for reuse_tree in (True, False):
+            player = game_agent.MCTSPlayer(seed=0, reuse_tree=reuse_tree)
+            game = isolation.Board(player, "Player2")
+            game.apply_move((3, 3))
+            game.apply_move((0, 0))
+            game.apply_move(player.get_move(game, self.rollout_budget(player, 500)))
+            if not reuse_tree:
+                self.assertIsNone(player.root)
+                continue
+            self.assertEqual(player.root.key, game.hash())
+            reply = max(player.root.children, key=lambda child: child.visits)
+            game.apply_move(reply.move)
+            self.assertIs(player._find_root(game), reply)
+
+            # The reply was a leaf on its first visit only
+            visits = reply.visits
+            self.assertGreater(visits, 1)
+            player.get_move(game, self.rollout_budget(player, 100))
+            self.assertEqual(reply.visits, visits + 100)
+            self.assertEqual(sum(child.visits for child in reply.children),
+                             visits - 1 + 100)
+
+
+@unittest.skipIf(batch_scores is None, "NumPy is not installed")
+class BatchScoresTest(unittest.TestCase):
+    """Unit tests for the vectorized heuristics"""
+
+    def setUp(self):
+        self.heuristics = [
+            (sample_players.open_move_score, batch_scores.batch_open_move_score),
+            (sample_players.improved_score, batch_scores.batch_improved_score),
+            (sample_players.center_score, batch_scores.batch_center_score)]
+
+    def test_matches_scalar_scores(self):
+        """ The batched scores of the children of random states (including
+        won and lost states) match the scalar heuristics. """
+        rng = random.Random(0)
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            for _ in range(20):
+                game = board_cls("Player1", "Player2", width=rng.randint(5, 8),
+                                 height=rng.randint(5, 8), shuffle_moves=False)
+                game.apply_move(rng.choice(game.get_legal_moves()))
+                game.apply_move(rng.choice(game.get_legal_moves()))
+                while game.get_legal_moves():
+                    moves = game.get_legal_moves()
+                    for player in (game.active_player, game.inactive_player):
+                        for score_fn, batch_fn in self.heuristics:
+                            expected = [score_fn(game.forecast_move(m), player)
+                                        for m in moves]
+                            self.assertEqual(batch_fn(game, moves, player), expected)
+                    game.apply_move(rng.choice(moves))
+
+    def test_features(self):
+        """ Features of states encoded directly match the scalar values. """
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        games = [game, game.forecast_move((1, 1)), game.forecast_move((4, 4))]
+        feats = batch_scores.features(batch_scores.encode(games, "Player1"))
+        self.assertEqual(feats.mobility.tolist(),
+                         [len(g.get_legal_moves("Player1")) for g in games])
+        self.assertEqual(feats.opp_mobility.tolist(),
+                         [len(g.get_legal_moves("Player2")) for g in games])
+        self.assertEqual(feats.center_distance.tolist(),
+                         [sample_players.center_score(g, "Player1") for g in games])
+
+    def test_frontier_values(self):
+        """ The values of the children searched one ply deeper in a batch
+        match a scalar search (including won and lost states). """
+        frontier_heuristics = [
+            (sample_players.open_move_score, batch_scores.frontier_open_move_score),
+            (sample_players.improved_score, batch_scores.frontier_improved_score),
+            (sample_players.center_score, batch_scores.frontier_center_score)]
+
+        def value(game, player, depth, score_fn):
+            if not game.get_legal_moves():
+                return game.utility(player)
+            if depth == 0:
+                return score_fn(game, player)
+            values = [value(game.forecast_move(m), player, depth - 1, score_fn)
+                      for m in game.get_legal_moves()]
+            return max(values) if game.active_player == player else min(values)
+
+        rng = random.Random(1)
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            for _ in range(10):
+                game = board_cls("Player1", "Player2", width=rng.randint(5, 8),
+                                 height=rng.randint(5, 8), shuffle_moves=False)
+                moves = game.get_legal_moves()
+                self.assertIsNone(batch_scores.frontier_improved_score(game, moves, "Player1"))
+                game.apply_move(rng.choice(moves))
+                game.apply_move(rng.choice(game.get_legal_moves()))
+                while game.get_legal_moves():
+                    moves = game.get_legal_moves()
+                    for player in (game.active_player, game.inactive_player):
+                        for score_fn, frontier_fn in frontier_heuristics:
+                            expected = [value(game.forecast_move(m), player, 1, score_fn)
+                                        for m in moves]
+                            self.assertEqual(frontier_fn(game, moves, player)[0], expected)
+                    game.apply_move(rng.choice(moves))
+
+    def test_search_agents(self):
+        """ Scoring the frontier in batches does not change the search. """
+        for depth in (3, 4):
+            results = []
+            for batch_fn in (None, batch_scores.frontier_improved_score):
+                player = game_agent.MinimaxPlayer(score_fn=sample_players.improved_score,
+                                                  batch_score_fn=batch_fn)
+                player.time_left = lambda: float("inf")
+                game = isolation.Board(player, "Player2", shuffle_moves=False)
+                game.apply_move((2, 3))
+                game.apply_move((4, 4))
+                results.append(player._search(game, depth, True))
+            self.assertEqual(results[0], results[1])
+
+        moves = []
+        for batch_fn in (None, batch_scores.batch_open_move_score):
+            player = sample_players.GreedyPlayer(batch_score_fn=batch_fn)
+            game = isolation.Board(player, "Player2", shuffle_moves=False)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            moves.append(player.get_move(game, None))
+        self.assertEqual(moves[0], moves[1])
+
+
+class OpeningBookTest(unittest.TestCase):
+    """Unit tests for the opening book"""
+
+    def setUp(self):
+        reload(game_agent)
+        fd, self.path = tempfile.mkstemp(suffix=".bin")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_build_and_lookup(self):
+        """ A saved book returns the searched move of every state in it. """
+        book = opening_book.build([1], depth=2, width=4, height=4, canonical=False)
+        self.assertEqual(len(book), len(opening_book.early_states(1, 4, 4)))
+        book.save(self.path)
+        self.assertEqual(os.path.getsize(self.path),
+                         opening_book.HEADER.size + 9 * len(book))
+
+        loaded = opening_book.OpeningBook.load(self.path)
+        for moves in opening_book.early_states(1, 4, 4):
+            key, expected = opening_book.search_state(
+                moves, 4, 4, 2, sample_players.improved_score)
+            game = isolation.Board("Player1", "Player2", width=4, height=4)
+            game.apply_move(moves[0])
+            self.assertEqual(loaded.lookup(game), expected)
+
+        game = isolation.Board("Player1", "Player2", width=4, height=4)
+        self.assertIsNone(loaded.lookup(game))
+        self.assertEqual(loaded.stats.hits, len(book))
+        self.assertEqual(loaded.stats.probes, len(book) + 1)
+
+    def test_canonical_book(self):
+        """ A canonical book holds one entry per class of equivalent states
+        and returns the equivalent move for every state of the class. """
+        book = opening_book.build([1, 2], depth=2, width=5, height=5)
+        raw_states = (opening_book.early_states(1, 5, 5) +
+                      opening_book.early_states(2, 5, 5))
+        self.assertTrue(book.canonical)
+        self.assertLess(3 * len(book), len(raw_states))
+        book.save(self.path)
+        loaded = opening_book.OpeningBook.load(self.path)
+        self.assertTrue(loaded.canonical)
+        for moves in raw_states:
+            game = isolation.Board("Player1", "Player2", width=5, height=5)
+            for move in moves:
+                game.apply_move(move)
+            self.assertIn(loaded.lookup(game), game.get_legal_moves())
+        self.assertEqual(loaded.stats.hits, len(raw_states))
+
+        # The searched states get the move found by their own search
+        for moves in (opening_book.early_states(1, 5, 5, canonical=True) +
+                      opening_book.early_states(2, 5, 5, canonical=True)):
+            game = isolation.Board("Player1", "Player2", width=5, height=5)
+            for move in moves:
+                game.apply_move(move)
+            _, expected = opening_book.search_state(
+                moves, 5, 5, 2, sample_players.improved_score)
+            self.assertEqual(loaded.lookup(game), expected)
+
+    def test_agent_uses_book(self):
+        """ AlphaBetaPlayer plays the book move without searching. """
+        book = opening_book.build([2], depth=2, width=5, height=5)
+        player = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score,
+                                            book=book)
+        game = isolation.Board(player, "Player2", width=5, height=5)
+        game.apply_move((0, 0))
+        game.apply_move((4, 4))
+        self.assertEqual(player.get_move(game, lambda: 1000.), book.lookup(game))
+        self.assertEqual(player.nodes_searched, 0)
+
+
+class SPRTTest(unittest.TestCase):
+    """Unit tests for the tournament early stopping statistics"""
+
+    def test_elo_conversions(self):
+        """ Win rates and Elo differences convert back and forth. """
+        for elo in (-300., -50., 0., 120., 400.):
+            self.assertAlmostEqual(sprt.elo_from_win_rate(sprt.win_rate_from_elo(elo)), elo)
+        self.assertAlmostEqual(sprt.win_rate_from_elo(0.), 0.5)
+        self.assertAlmostEqual(sprt.normal_quantile(0.975), 1.959964, places=5)
+
+    def test_elo_interval(self):
+        """ The confidence interval contains the estimate and narrows. """
+        elo, low, high = sprt.elo_interval(60, 40)
+        self.assertLess(low, elo)
+        self.assertLess(elo, high)
+        elo_more, low_more, high_more = sprt.elo_interval(600, 400)
+        self.assertAlmostEqual(elo, elo_more)
+        self.assertLess(high_more - low_more, high - low)
+
+    def test_verdicts(self):
+        """ Lopsided results stop the test early; even results do not. """
+        test = sprt.SPRT(elo0=0., elo1=100.)
+        self.assertEqual(test.status(20, 0), sprt.SPRT.H1)
+        self.assertEqual(test.status(0, 20), sprt.SPRT.H0)
+        self.assertIsNone(test.status(5, 5))
+        self.assertEqual(test.status(300, 300), sprt.SPRT.H0)
+
+    def test_schedule_seed(self):
+        """ The same seed schedules the same games whether each batch is played
+        before the next one is scheduled or not. """
+
+        class RecordingExecutor(tournament.SerialExecutor):
+            def __init__(self):
+                self.games = []
+
+            def submit(self, fn, *args):
+                self.games.append(args[0][3:])
+                return super().submit(fn, *args)
+
+        cpu_agents = [tournament.Agent(sample_players.RandomPlayer(), "Random")]
+        test_agents = [tournament.Agent(sample_players.RandomPlayer(), "Random_2")]
+        schedules = []
+        for batch_size in (1, 3):
+            executor = RecordingExecutor()
+            tournament.play_sprt(cpu_agents, test_agents, sprt.SPRT(elo0=0., elo1=100.), 6,
+                                 executor, batch_size=batch_size, rng=random.Random(3))
+            schedules.append(executor.games)
+        self.assertEqual(len(schedules[0]), 6)
+        self.assertEqual(schedules[0], schedules[1])
+
+
+class ResultsLogTest(unittest.TestCase):
+    """Unit tests for the append-only tournament results log"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_resume(self):
+        """ Records survive a restart and a truncated last line. """
+        log = results.ResultsLog(self.path)
+        log.write({"key": "a", "winner_seat": 0})
+        log.write({"key": "b", "winner_seat": 1})
+        log.close()
+        with open(self.path, "a") as f:
+            f.write('{"key": "c", "win')
+
+        self.assertRaises(RuntimeError, results.ResultsLog, self.path)
+        log = results.ResultsLog(self.path, resume=True)
+        self.assertIn("a", log)
+        self.assertNotIn("c", log)
+        self.assertEqual(log["b"]["winner_seat"], 1)
+        log.write({"key": "c", "winner_seat": 0})
+        log.close()
+        self.assertEqual([r["key"] for r in results.load_results(self.path)],
+                         ["a", "b", "c"])
+
+
 if __name__ == '__main__':
     unittest.main()
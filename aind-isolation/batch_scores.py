@@ -0,0 +1,279 @@
+"""This file contains a vectorized version of the heuristics in
+`sample_players.py` that scores many board states in one NumPy pass.
+
+The board states are encoded as a `BoardBatch` of arrays (one row per state)
+from which `features()` computes the mobility of both players and the
+distance of the player from the center of the board for every state at once.
+`encode_children()` builds the batch of all children of a state directly from
+the parent, so `GreedyPlayer` can score the children of a node without
+visiting them one at a time, and `encode_frontier()` the batch of all states
+two plies below a state, so `MinimaxPlayer` can search the last two plies of
+the tree with a single NumPy pass over the leaves:
+
+    player = MinimaxPlayer(score_fn=improved_score,
+                           batch_score_fn=frontier_improved_score)
+
+A batch of a few children costs more to build than scoring them one at a
+time; the frontier holds enough leaves (about 30 in the middle game) to pay
+for it.
+
+The scores are the same as those of the matching functions in
+`sample_players.py`, including +/-inf for won and lost states.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from isolation import Board, BitBoard
+from isolation.isolation import knight_neighbors
+
+# Caches of knight neighbor index arrays and of the squared distance of each
+# cell from the center of the board, keyed by board size
+_NEIGHBOR_TABLES = {}
+_CENTER_DISTANCES = {}
+
+# A batch of board states of the same size from the point of view of one
+# player. The open cells are stored with an extra column that is never open,
+# and the locations of the player and of the opponent (in that order) are
+# cell indices, or width * height if the player has not moved yet.
+BoardBatch = namedtuple("BoardBatch", ["width", "height", "open_cells",
+                                       "locations", "own_active"])
+
+Features = namedtuple("Features", ["mobility", "opp_mobility", "center_distance"])
+
+
+def neighbor_table(width, height):
+    """Return an array with one row per cell index of a board with the given
+    dimensions (plus a last row for players that have not moved) listing the
+    cells reachable with a knight move, padded with the index of the extra
+    closed column of `BoardBatch.open_cells`.
+    """
+    key = (width, height)
+    if key not in _NEIGHBOR_TABLES:
+        cells = width * height
+        table = np.full((cells + 1, 8), cells, dtype=np.intp)
+        for idx, neighbors in enumerate(knight_neighbors(width, height)):
+            table[idx, :len(neighbors)] = [neighbor for neighbor, _ in neighbors]
+        _NEIGHBOR_TABLES[key] = table
+    return _NEIGHBOR_TABLES[key]
+
+
+def center_distances(width, height):
+    """Return an array of the squared distance of each cell index of a board
+    with the given dimensions from the center of the board, as computed by
+    `sample_players.center_score` (plus NaN for players that have not moved).
+    """
+    key = (width, height)
+    if key not in _CENTER_DISTANCES:
+        cells = np.arange(width * height)
+        y, x = cells % height, cells // height
+        distances = (height / 2. - y)**2 + (width / 2. - x)**2
+        _CENTER_DISTANCES[key] = np.append(distances, np.nan)
+    return _CENTER_DISTANCES[key]
+
+
+def _open_cells(game):
+    """Return the boolean array of the open cells of a game, read from the
+    occupancy bitmask of a `BitBoard` or from the cell list of a `Board`.
+    """
+    cells = game.width * game.height
+    if isinstance(game, BitBoard):
+        occupied = game._occupied.to_bytes((cells + 7) // 8, "little")
+        bits = np.unpackbits(np.frombuffer(occupied, dtype=np.uint8), bitorder="little")
+        return bits[:cells] == 0
+    return np.fromiter(game._board_state[:cells], dtype=bool, count=cells) == 0
+
+
+def _locations(game, player):
+    """Return the cell indices of `player` and of its opponent in a game
+    (width * height for a player that has not moved yet).
+    """
+    if isinstance(game, BitBoard):
+        locs = game._locations[:]
+    else:
+        locs = [game._board_state[-1], game._board_state[-2]]
+    if player == game._player_2:
+        locs.reverse()
+    cells = game.width * game.height
+    return [cells if loc is Board.NOT_MOVED else loc for loc in locs]
+
+
+def encode(games, player):
+    """Encode a list of games on boards of the same size as a `BoardBatch`
+    from the point of view of `player`.
+    """
+    width, height = games[0].width, games[0].height
+    cells = width * height
+    open_cells = np.zeros((len(games), cells + 1), dtype=bool)
+    locations = np.empty((len(games), 2), dtype=np.intp)
+    own_active = np.empty(len(games), dtype=bool)
+
+    for row, game in enumerate(games):
+        if (game.width, game.height) != (width, height):
+            raise ValueError("All boards of a batch must have the same size.")
+        open_cells[row, :cells] = _open_cells(game)
+        locations[row] = _locations(game, player)
+        own_active[row] = player == game.active_player
+
+    return BoardBatch(width, height, open_cells, locations, own_active)
+
+
+def encode_children(game, moves, player):
+    """Encode the states reached by applying each of the moves to `game` as a
+    `BoardBatch` from the point of view of `player`, without applying them.
+    """
+    parent = encode([game], player)
+    cells = [r + c * game.height for r, c in moves]
+
+    open_cells = np.repeat(parent.open_cells, len(moves), axis=0)
+    open_cells[np.arange(len(moves)), cells] = False
+    locations = np.repeat(parent.locations, len(moves), axis=0)
+    locations[:, 0 if parent.own_active[0] else 1] = cells
+    own_active = np.repeat(~parent.own_active, len(moves))
+    return BoardBatch(game.width, game.height, open_cells, locations, own_active)
+
+
+def encode_frontier(game, moves, player):
+    """Encode the states reached by applying each of the moves to `game` and
+    then each legal reply of the opponent, without applying them.
+
+    Returns
+    -------
+    (`BoardBatch`, array) or None
+        The batch of the states from the point of view of `player`, grouped
+        by move in the order of `moves`, and the number of replies to each
+        move; None if a player has not moved yet.
+    """
+    width, height = game.width, game.height
+    cells = width * height
+    locations = _locations(game, player)
+    if cells in locations:
+        return None
+    own_active = player == game.active_player
+    mover, replier = (0, 1) if own_active else (1, 0)
+    count = len(moves)
+    rows = np.arange(count)
+
+    child_cells = np.fromiter((r + c * height for r, c in moves), dtype=np.intp, count=count)
+    open_cells = np.zeros((count, cells + 1), dtype=bool)
+    open_cells[:, :cells] = _open_cells(game)
+    open_cells[rows, child_cells] = False
+
+    replies = neighbor_table(width, height)[locations[replier]]
+    legal = open_cells[:, replies]
+    child_rows, slots = np.nonzero(legal)
+    reply_cells = replies[slots]
+
+    leaf_open = open_cells[child_rows]
+    leaf_open[np.arange(len(child_rows)), reply_cells] = False
+    leaf_locations = np.empty((len(child_rows), 2), dtype=np.intp)
+    leaf_locations[:, mover] = child_cells[child_rows]
+    leaf_locations[:, replier] = reply_cells
+    leaves = BoardBatch(width, height, leaf_open, leaf_locations,
+                        np.full(len(child_rows), own_active))
+    return leaves, legal.sum(axis=1)
+
+
+def frontier_values(scores_fn, game, moves, player):
+    """Return the minimax values for `player` of the states reached by
+    applying each of the moves to `game`, searched one ply deeper with the
+    vectorized heuristic `scores_fn` (e.g., `improved_scores`) at the leaves,
+    and the number of leaves; None if a player has not moved yet.
+    """
+    frontier = encode_frontier(game, moves, player)
+    if frontier is None:
+        return None
+    leaves, replies = frontier
+    # The opponent of the player to move in `game` replies to each move, and
+    # loses if it has no reply
+    player_replies = player != game.active_player
+    values = np.full(len(moves), -np.inf if player_replies else np.inf)
+    answered = replies > 0
+    if answered.any():
+        starts = np.concatenate(([0], np.cumsum(replies)[:-1]))[answered]
+        reduce = np.maximum if player_replies else np.minimum
+        values[answered] = reduce.reduceat(scores_fn(leaves), starts)
+    return values.tolist(), len(leaves.locations)
+
+
+def _mobility(batch):
+    """Return the number of legal moves of the player and of the opponent in
+    every state of the batch, as an array with one column per player.
+    """
+    cells = batch.width * batch.height
+    table = neighbor_table(batch.width, batch.height)
+    rows = np.arange(len(batch.locations))[:, None, None]
+    mobility = batch.open_cells[rows, table[batch.locations]].sum(axis=2)
+
+    # A player that has not moved yet can move to any open cell
+    not_moved = batch.locations == cells
+    if not_moved.any():
+        mobility = np.where(not_moved, batch.open_cells.sum(axis=1)[:, None], mobility)
+    return mobility
+
+
+def features(batch):
+    """Return the `Features` of every state of the batch: the number of
+    legal moves of the player and of the opponent, and the squared distance
+    of the player from the center of the board (NaN if the player has not
+    moved).
+    """
+    mobility = _mobility(batch)
+    distance = center_distances(batch.width, batch.height)[batch.locations[:, 0]]
+    return Features(mobility[:, 0], mobility[:, 1], distance)
+
+
+def _with_outcomes(batch, mobility, values):
+    """Replace the values of won and lost states by +inf and -inf."""
+    active = (~batch.own_active).astype(np.intp)
+    stuck = mobility[np.arange(len(active)), active] == 0
+    return np.where(stuck, np.where(batch.own_active, -np.inf, np.inf), values)
+
+
+def open_move_scores(batch):
+    """Vectorized `sample_players.open_move_score`."""
+    mobility = _mobility(batch)
+    return _with_outcomes(batch, mobility, mobility[:, 0].astype(float))
+
+
+def improved_scores(batch):
+    """Vectorized `sample_players.improved_score`."""
+    mobility = _mobility(batch)
+    return _with_outcomes(batch, mobility,
+                          (mobility[:, 0] - mobility[:, 1]).astype(float))
+
+
+def center_scores(batch):
+    """Vectorized `sample_players.center_score`."""
+    distance = center_distances(batch.width, batch.height)[batch.locations[:, 0]]
+    return _with_outcomes(batch, _mobility(batch), distance)
+
+
+def batch_open_move_score(game, moves, player):
+    """Return the `open_move_score` of the state reached by each move."""
+    return open_move_scores(encode_children(game, moves, player)).tolist()
+
+
+def batch_improved_score(game, moves, player):
+    """Return the `improved_score` of the state reached by each move."""
+    return improved_scores(encode_children(game, moves, player)).tolist()
+
+
+def batch_center_score(game, moves, player):
+    """Return the `center_score` of the state reached by each move."""
+    return center_scores(encode_children(game, moves, player)).tolist()
+
+
+def frontier_open_move_score(game, moves, player):
+    """`frontier_values` of the moves with `open_move_scores` at the leaves."""
+    return frontier_values(open_move_scores, game, moves, player)
+
+
+def frontier_improved_score(game, moves, player):
+    """`frontier_values` of the moves with `improved_scores` at the leaves."""
+    return frontier_values(improved_scores, game, moves, player)
+
+
+def frontier_center_score(game, moves, player):
+    """`frontier_values` of the moves with `center_scores` at the leaves."""
+    return frontier_values(center_scores, game, moves, player)
@@ -0,0 +1,823 @@
+"""Measure the performance of the game model and the search agents.
+
+Each benchmark is available as a subcommand, e.g.:
+
+    python benchmark.py board --depth 4 --positions 20
+
+All benchmarks use randomly generated mid-game positions so that the numbers
+reflect the states visited by the agents during a tournament.
+"""
+import argparse
+import json
+import random
+import time
+import timeit
+
+from isolation import Board, BitBoard, Deadline, ProcessPlayer
+from isolation.timer import call_with_deadline
+from sample_players import GreedyPlayer, open_move_score, improved_score, center_score
+from game_agent import MinimaxPlayer, AlphaBetaPlayer, MCTSPlayer
+from endgame import EndgameSolver, partition
+from move_ordering import MoveOrdering
+from opening_book import OpeningBook, build
+from results import load_results
+from transposition import TranspositionTable
+
+HEURISTICS = [("Open", open_move_score), ("Center", center_score),
+              ("Improved", improved_score)]
+
+BOARD_CLASSES = [("list", Board), ("bitboard", BitBoard)]
+
+
+def random_positions(num_positions, num_plies, seed=None):
+    """Return a list of random move sequences, each `num_plies` long, that can
+    be replayed on any board backend to reach the same set of positions.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        game = Board("Player1", "Player2", shuffle_moves=False)
+        moves = []
+        for _ in range(num_plies):
+            legal_moves = game.get_legal_moves()
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            game.apply_move(move)
+            moves.append(move)
+        if len(moves) == num_plies and game.get_legal_moves():
+            positions.append(moves)
+    return positions
+
+
+def load_positions(args):
+    """Return the move sequences of the benchmark positions, read from the
+    file given with --load or generated from the seed (and written to the
+    file given with --save).
+    """
+    if args.load:
+        with open(args.load) as f:
+            return json.load(f)
+    positions = random_positions(args.positions, args.plies, args.seed)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(positions, f)
+    return positions
+
+
+def make_board(board_cls, moves, player_1="Player1", player_2="Player2", **kwargs):
+    """Construct a board of type `board_cls` and replay the list of moves;
+    keyword arguments are passed to the board constructor.
+    """
+    game = board_cls(player_1, player_2, **kwargs)
+    for move in moves:
+        game.apply_move(move)
+    return game
+
+
+def perft(game, depth):
+    """Return the number of nodes in the full-width game tree rooted at `game`
+    searched to a fixed depth, using the same Board operations as the search
+    agents (legal move generation, forecast_move and the utility test).
+    """
+    if depth == 0 or game.utility(game.active_player):
+        return 1
+    return 1 + sum(perft(game.forecast_move(m), depth - 1)
+                   for m in game.get_legal_moves())
+
+
+def bench_board(args):
+    """Report the nodes per second of each board backend."""
+    positions = random_positions(args.positions, args.plies, args.seed)
+
+    print("{:^12}{:^12}{:^12}{:^14}".format(
+        "Backend", "Nodes", "Seconds", "Nodes/sec"))
+    for name, board_cls in BOARD_CLASSES:
+        games = [make_board(board_cls, moves) for moves in positions]
+        start = timeit.default_timer()
+        nodes = sum(perft(game, args.depth) for game in games)
+        elapsed = timeit.default_timer() - start
+        print("{:^12}{:^12}{:^12.3f}{:^14.0f}".format(
+            name, nodes, elapsed, nodes / elapsed))
+
+
+def bench_hash(args):
+    """Compare the cost of the incremental Zobrist hash to the string based
+    hash of the board state it replaces, and report the cost of maintaining
+    the Zobrist hash in push_move/pop_move.
+    """
+    positions = random_positions(args.positions, args.plies, args.seed)
+    games = [make_board(Board, moves) for moves in positions]
+    number = args.number
+
+    def time_per_call(fn):
+        elapsed = min(timeit.repeat(fn, number=number, repeat=3))
+        return 1e9 * elapsed / (number * len(games))
+
+    string_ns = time_per_call(
+        lambda: [str(game._board_state).__hash__() for game in games])
+    zobrist_ns = time_per_call(lambda: [game.hash() for game in games])
+    moves = [game.get_legal_moves()[0] for game in games]
+
+    def push_pop():
+        for game, move in zip(games, moves):
+            game.push_move(move)
+            game.pop_move()
+
+    def update_hash():
+        for game, move in zip(games, moves):
+            idx = move[0] + move[1] * game.height
+            game._update_hash(0, game._board_state[-1], idx)
+            game._update_hash(0, game._board_state[-1], idx)
+
+    push_pop_ns = time_per_call(push_pop)
+    update_ns = time_per_call(update_hash) / 2
+
+    print("{:<32}{:>12}".format("Operation", "ns/call"))
+    print("{:<32}{:>12.0f}".format("str(_board_state) hash", string_ns))
+    print("{:<32}{:>12.0f}".format("Zobrist hash()", zobrist_ns))
+    print("{:<32}{:>12.0f}".format("push_move + pop_move", push_pop_ns))
+    print("{:<32}{:>12.0f}".format("  of which hash updates", 2 * update_ns))
+
+
+def search_to_depth(agent, game, depth):
+    """Run the search of `agent` on `game` to a fixed depth without a time
+    limit, using iterative deepening for alpha-beta agents.
+    """
+    agent.time_left = lambda: float("inf")
+    if agent.tt is not None:
+        agent.tt.new_search()
+    if isinstance(agent, AlphaBetaPlayer):
+        if agent.ordering is not None:
+            agent.ordering.new_search()
+        for d in range(1, depth + 1):
+            agent.alphabeta(game, d)
+    else:
+        agent.minimax(game, depth)
+
+
+def bench_tt(args):
+    """Compare the fixed-depth search of the tournament agents with and
+    without a transposition table.
+    """
+    positions = random_positions(args.positions, args.plies, args.seed)
+
+    print("{:<14}{:^8}{:>12}{:>10}{:>12}{:>10}{:>10}".format(
+        "Agent", "Table", "Nodes", "Seconds", "Nodes/sec", "Hit rate", "Speedup"))
+    for agent_cls, prefix, depth in [(MinimaxPlayer, "MM", args.minimax_depth),
+                                     (AlphaBetaPlayer, "AB", args.alphabeta_depth)]:
+        for name, score_fn in HEURISTICS:
+            baseline = None
+            for replacement in [None, "depth", "always"]:
+                tt = None
+                if replacement is not None:
+                    tt = TranspositionTable(args.tt_bytes, replacement=replacement)
+                agent = agent_cls(score_fn=score_fn, tt=tt)
+                games = [make_board(Board, moves, *(
+                    (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)),
+                    seed=args.seed) for moves in positions]
+                start = timeit.default_timer()
+                for game in games:
+                    search_to_depth(agent, game, depth)
+                elapsed = timeit.default_timer() - start
+                baseline = baseline or elapsed
+                print("{:<14}{:^8}{:>12}{:>10.3f}{:>12.0f}{:>10}{:>10.2f}".format(
+                    "{}_{}".format(prefix, name), replacement or "-",
+                    agent.nodes_searched, elapsed, agent.nodes_searched / elapsed,
+                    "{:.1%}".format(tt.stats.hit_rate) if tt else "-",
+                    baseline / elapsed))
+
+
+def bench_ordering(args):
+    """Compare the number of nodes searched by alpha-beta agents at a fixed
+    depth with and without move ordering, on saved or seeded positions.
+
+    The moves are shuffled by boards seeded from --seed, so every
+    configuration searches the same states in the same (random) order when
+    it does not reorder them.
+    """
+    positions = load_positions(args)
+    configs = [("-", False, False), ("TT", True, False),
+               ("ordering", False, True), ("TT+ordering", True, True)]
+
+    print("{:<14}{:<14}{:>12}{:>10}{:>12}{:>10}".format(
+        "Agent", "Ordering", "Nodes", "Seconds", "Nodes/sec", "Reduction"))
+    for name, score_fn in HEURISTICS:
+        baseline = None
+        for config, use_tt, use_ordering in configs:
+            agent = AlphaBetaPlayer(
+                score_fn=score_fn,
+                tt=TranspositionTable(args.tt_bytes) if use_tt else None,
+                ordering=MoveOrdering() if use_ordering else None)
+            games = [make_board(Board, moves, *(
+                (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)),
+                seed=args.seed) for moves in positions]
+            start = timeit.default_timer()
+            for game in games:
+                search_to_depth(agent, game, args.depth)
+            elapsed = timeit.default_timer() - start
+            baseline = baseline or agent.nodes_searched
+            print("{:<14}{:<14}{:>12}{:>10.3f}{:>12.0f}{:>10.1%}".format(
+                "AB_" + name, config, agent.nodes_searched, elapsed,
+                agent.nodes_searched / elapsed, 1 - agent.nodes_searched / baseline))
+
+
+def bench_parallel(args):
+    """Compare the depth reached within the time limit of a move by the
+    single-process alpha-beta search and by the parallel root search.
+    """
+    from parallel_search import ParallelAlphaBetaPlayer
+
+    positions = load_positions(args)
+    time_millis = lambda: 1000 * timeit.default_timer()
+
+    print("{:<10}{:<12}{:>8}{:>12}{:>10}{:>12}".format(
+        "Heuristic", "Search", "Workers", "Nodes/move", "Depth", "Extra depth"))
+    for name, score_fn in HEURISTICS:
+        agents = [("serial", AlphaBetaPlayer(score_fn=score_fn, instrument=True))]
+        parallel = ParallelAlphaBetaPlayer(workers=args.workers, score_fn=score_fn,
+                                           instrument=True)
+        parallel.start()
+        agents.append(("parallel", parallel))
+        try:
+            depths = []
+            for search, agent in agents:
+                for moves in positions:
+                    game = make_board(Board, moves, *(
+                        (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)),
+                        seed=args.seed)
+                    move_start = time_millis()
+                    agent.get_move(game, lambda: args.time_limit - (time_millis() - move_start))
+                moves = agent.move_stats
+                depths.append(sum(stats.depth for stats in moves) / len(moves))
+                print("{:<10}{:<12}{:>8}{:>12.0f}{:>10.2f}{:>12}".format(
+                    name, search, getattr(agent, "workers", 1),
+                    sum(stats.nodes for stats in moves) / len(moves), depths[-1],
+                    "{:+.2f}".format(depths[-1] - depths[0]) if len(depths) > 1 else "-"))
+        finally:
+            parallel.close()
+
+
+def partitioned_positions(num_positions, min_cells, max_cells, seed=None):
+    """Return a list of move sequences of games between greedy players (from
+    random openings) that lead to a state in which the players are
+    partitioned, with at least `min_cells` open cells in the two regions and
+    at most `max_cells` in each of them.
+    """
+    rng = random.Random(seed)
+    players = [GreedyPlayer(improved_score), GreedyPlayer(improved_score)]
+    positions = []
+    while len(positions) < num_positions:
+        game = Board(players[0], players[1], seed=rng.getrandbits(32))
+        moves = random_positions(1, 2, rng.getrandbits(32))[0]
+        for move in moves:
+            game.apply_move(move)
+        while game.get_legal_moves():
+            regions = partition(game)
+            if regions is not None:
+                sizes = [bin(region).count("1") for _, region in regions]
+                if sum(sizes) >= min_cells and max(sizes) <= max_cells:
+                    positions.append(moves)
+                break
+            move = game.active_player.get_move(game, None)
+            game.apply_move(move)
+            moves.append(move)
+    return positions
+
+
+def bench_endgame(args):
+    """Compare the time needed to prove the outcome of partitioned endgames
+    with the endgame solver and with an alpha-beta search to the end of the
+    game.
+    """
+    positions = partitioned_positions(args.positions, args.min_cells, args.max_cells,
+                                      args.seed)
+
+    print("{:<14}{:>10}{:>12}{:>12}{:>10}".format(
+        "Search", "Solved", "Mean ms", "Max ms", "Speedup"))
+    times = []
+    for search in ("alpha-beta", "solver"):
+        solver = EndgameSolver(max_cells=args.max_cells, min_depth=1)
+        agent = AlphaBetaPlayer(score_fn=improved_score,
+                                endgame=solver if search == "solver" else None)
+        elapsed = []
+        for moves in positions:
+            game = make_board(Board, moves, *(
+                (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)),
+                shuffle_moves=False)
+            start = timeit.default_timer()
+            search_to_depth(agent, game, len(game.get_blank_spaces()))
+            elapsed.append(1000 * (timeit.default_timer() - start))
+        times.append(sum(elapsed))
+        print("{:<14}{:>10}{:>12.2f}{:>12.2f}{:>10.2f}".format(
+            search, solver.solved if search == "solver" else "-",
+            sum(elapsed) / len(elapsed), max(elapsed), times[0] / times[-1]))
+
+
+def bench_book(args):
+    """Play alpha-beta agents with and without an opening book against the
+    same opponent from random openings, and report the hit rate of the book
+    and the search time it saves per game.
+    """
+    if args.book:
+        book = OpeningBook.load(args.book)
+    else:
+        start = timeit.default_timer()
+        book = build([2, 3], args.depth)
+        print("Built a book of {} states in {:.1f}s".format(
+            len(book), timeit.default_timer() - start))
+
+    rng = random.Random(args.seed)
+    openings = [random_positions(1, 2, rng.getrandbits(32))[0] for _ in range(args.games)]
+    time_millis = lambda: 1000 * timeit.default_timer()
+
+    print("{:<10}{:>8}{:>12}{:>14}{:>14}".format(
+        "Agent", "Games", "Book moves", "Hit rate", "ms/game"))
+    for name, agent_book in [("AB", None), ("AB_Book", book)]:
+        total_time = 0.
+        book.stats.reset()
+        for idx, opening in enumerate(openings):
+            agent = AlphaBetaPlayer(score_fn=improved_score, book=agent_book)
+            opponent = AlphaBetaPlayer(score_fn=improved_score)
+            players = (agent, opponent) if idx % 2 == 0 else (opponent, agent)
+            game = make_board(Board, opening, *players, seed=idx)
+            move_times = []
+            game.play(time_limit=args.time_limit, move_times=move_times)
+            total_time += sum(move_times[idx % 2::2])
+        print("{:<10}{:>8}{:>12.2f}{:>14.1%}{:>14.0f}".format(
+            name, len(openings), book.stats.hits / len(openings) if agent_book else 0.,
+            book.stats.hit_rate if agent_book else 0., total_time / len(openings)))
+
+
+def game_states(histories):
+    """Yield (ply, raw key, canonical key) for every state of the games
+    given as lists of moves.
+    """
+    for moves in histories:
+        game = Board("Player1", "Player2")
+        for ply, move in enumerate(moves):
+            yield ply, game.hash(), game.canonical()[0]
+            if move not in game.get_legal_moves():
+                break
+            game.apply_move(move)
+
+
+def print_state_counts(histories, max_ply):
+    """Print the number of distinct raw and canonical states of the games
+    given as lists of moves, by ply.
+    """
+    raw_keys, canonical_keys = {}, {}
+    for ply, raw, canonical in game_states(histories):
+        bucket = min(ply, max_ply)
+        raw_keys.setdefault(bucket, set()).add(raw)
+        canonical_keys.setdefault(bucket, set()).add(canonical)
+
+    print("{} games".format(len(histories)))
+    print("{:<8}{:>10}{:>12}{:>10}".format("Ply", "Raw", "Canonical", "Shrink"))
+    for bucket in sorted(raw_keys):
+        print("{:<8}{:>10}{:>12}{:>10.2f}".format(
+            "{}{}".format(bucket, "+" if bucket == max_ply else ""),
+            len(raw_keys[bucket]), len(canonical_keys[bucket]),
+            len(raw_keys[bucket]) / len(canonical_keys[bucket])))
+    total_raw = sum(len(keys) for keys in raw_keys.values())
+    total_canonical = sum(len(keys) for keys in canonical_keys.values())
+    print("{:<8}{:>10}{:>12}{:>10.2f}".format(
+        "All", total_raw, total_canonical, total_raw / total_canonical))
+
+
+def bench_symmetry(args):
+    """Count the distinct states of tournament games with and without
+    symmetry canonicalization, and compare the alpha-beta search with a
+    transposition table keyed on the raw and on the canonical states.
+    """
+    if args.results:
+        records = load_results(args.results)
+        histories = [[tuple(m) for m in record["opening"] + record["history"]]
+                     for record in records]
+    else:
+        rng = random.Random(args.seed)
+        histories = []
+        for idx in range(args.games):
+            opening = random_positions(1, 2, rng.getrandbits(32))[0]
+            players = (AlphaBetaPlayer(score_fn=improved_score),
+                       AlphaBetaPlayer(score_fn=improved_score))
+            game = make_board(Board, opening, *players, seed=idx)
+            _, history, _ = game.play(time_limit=args.time_limit)
+            histories.append(opening + [tuple(m) for m in history])
+
+    if histories:
+        print_state_counts(histories, args.max_ply)
+
+    if not args.depth:
+        return
+    positions = random_positions(args.positions, args.plies, args.seed)
+    print()
+    print("{:<10}{:>12}{:>10}{:>10}{:>12}".format(
+        "Symmetry", "Nodes", "Seconds", "Hit rate", "Entries"))
+    for symmetry in [0] + args.symmetry:
+        tt = TranspositionTable(args.tt_bytes)
+        agent = AlphaBetaPlayer(score_fn=improved_score, tt=tt, symmetry=symmetry)
+        start = timeit.default_timer()
+        for moves in positions:
+            game = make_board(Board, moves, *(
+                (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)),
+                seed=args.seed)
+            search_to_depth(agent, game, args.depth)
+        elapsed = timeit.default_timer() - start
+        print("{:<10}{:>12}{:>10.3f}{:>10}{:>12}".format(
+            symmetry or "-", agent.nodes_searched, elapsed,
+            "{:.1%}".format(tt.stats.hit_rate), len(tt)))
+
+
+def bench_mcts(args):
+    """Report the rollouts per second of the MCTS agent on each board
+    backend, and play it with and without tree reuse against an alpha-beta
+    agent with the same time limit.
+    """
+    positions = random_positions(args.positions, args.plies, args.seed)
+    time_millis = lambda: 1000 * timeit.default_timer()
+
+    print("{:^12}{:^12}{:^12}{:^14}".format(
+        "Backend", "Rollouts", "Seconds", "Rollouts/sec"))
+    for name, board_cls in BOARD_CLASSES:
+        agent = MCTSPlayer(seed=args.seed, reuse_tree=False)
+        start = timeit.default_timer()
+        for moves in positions:
+            game = make_board(board_cls, moves, *(
+                (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)))
+            move_start = time_millis()
+            agent.get_move(game, lambda: args.time_limit - (time_millis() - move_start))
+        elapsed = timeit.default_timer() - start
+        print("{:^12}{:^12}{:^12.3f}{:^14.0f}".format(
+            name, agent.nodes_searched, elapsed, agent.nodes_searched / elapsed))
+
+    if not args.games:
+        return
+    rng = random.Random(args.seed)
+    openings = [random_positions(1, 2, rng.getrandbits(32))[0] for _ in range(args.games)]
+    print()
+    print("{:<14}{:>8}{:>8}{:>16}".format("Agent", "Won", "Lost", "Rollouts/sec"))
+    for name, reuse_tree in [("MCTS", True), ("MCTS_NoReuse", False)]:
+        agent = MCTSPlayer(seed=args.seed, reuse_tree=reuse_tree, instrument=True)
+        wins = 0
+        for idx, opening in enumerate(openings):
+            opponent = AlphaBetaPlayer(score_fn=improved_score)
+            players = (agent, opponent) if idx % 2 == 0 else (opponent, agent)
+            game = make_board(Board, opening, *players, seed=idx)
+            winner, _, _ = game.play(time_limit=args.time_limit)
+            wins += winner == agent
+        time_used = sum(stats.time_used for stats in agent.move_stats)
+        print("{:<14}{:>8}{:>8}{:>16.0f}".format(
+            name, wins, len(openings) - wins,
+            1000. * agent.nodes_searched / time_used if time_used else 0.))
+
+
+def bench_timer(args):
+    """Compare the `time_left()` function built by `Board.play()` around
+    `timeit.default_timer` with the `perf_counter_ns` deadline: the cost of a
+    time check, the nodes per second and timeout margin of an alpha-beta
+    agent, and the overhead of enforcing the time limit in a thread.
+    """
+    def lambda_clock(time_limit):
+        time_millis = lambda: 1000 * timeit.default_timer()
+        move_start = time_millis()
+        return lambda: time_limit - (time_millis() - move_start)
+
+    number = 10**6
+    deadline = Deadline(float(10**9))
+    time_left = lambda_clock(float(10**9))
+    stop_ns = deadline.stop_ns(10.)
+    print("{:<28}{:>10}".format("Time check", "ns/call"))
+    for name, stmt, env in [
+            ("lambda: time_left() < t", "time_left() < 10.", {"time_left": time_left}),
+            ("Deadline: time_left() < t", "time_left() < 10.", {"time_left": deadline}),
+            ("Deadline: poll stop_ns", "perf_counter_ns() >= stop_ns",
+             {"perf_counter_ns": time.perf_counter_ns, "stop_ns": stop_ns})]:
+        elapsed = timeit.timeit(stmt, globals=env, number=number)
+        print("{:<28}{:>10.0f}".format(name, 1e9 * elapsed / number))
+
+    positions = random_positions(args.positions, args.plies, args.seed)
+    print()
+    print("{:<10}{:>12}{:>12}{:>16}{:>16}".format(
+        "Clock", "Nodes", "Nodes/sec", "Min left (ms)", "Mean left (ms)"))
+    for name, make_clock in [("lambda", lambda_clock), ("deadline", Deadline)]:
+        agent = AlphaBetaPlayer(score_fn=improved_score, timeout=args.timeout)
+        margins, used = [], 0.
+        for moves in positions:
+            game = make_board(Board, moves, *(
+                (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)))
+            start = timeit.default_timer()
+            clock = make_clock(args.time_limit)
+            agent.get_move(game, clock)
+            margins.append(clock())
+            used += timeit.default_timer() - start
+        print("{:<10}{:>12}{:>12.0f}{:>16.3f}{:>16.3f}".format(
+            name, agent.nodes_searched, agent.nodes_searched / used,
+            min(margins), sum(margins) / len(margins)))
+
+    number = 1000
+    noop = lambda: None
+    start = timeit.default_timer()
+    for _ in range(number):
+        noop()
+    direct = timeit.default_timer() - start
+    start = timeit.default_timer()
+    for _ in range(number):
+        call_with_deadline(noop, (), Deadline(args.time_limit), 0.)
+    enforced = timeit.default_timer() - start
+    print()
+    print("Enforced turn overhead: {:.1f} us per move".format(
+        1e6 * (enforced - direct) / number))
+
+
+class FirstMovePlayer(object):
+    """Player that returns its first legal move without searching."""
+
+    def get_move(self, game, time_left):
+        legal_moves = game.get_legal_moves()
+        return legal_moves[0] if legal_moves else (-1, -1)
+
+
+def bench_process(args):
+    """Measure the per-move overhead of running a player in a worker process
+    (`isolation.ProcessPlayer`) and the time it takes from the search of an
+    alpha-beta agent.
+    """
+    positions = random_positions(args.positions, args.plies, args.seed)
+
+    print("{:<10}{:<10}{:>14}".format("Backend", "Player", "us/move"))
+    for name, board_cls in BOARD_CLASSES:
+        games = [make_board(board_cls, moves) for moves in positions]
+        for mode in ("direct", "process"):
+            player = FirstMovePlayer()
+            if mode == "process":
+                player = ProcessPlayer(player)
+                player.start()
+            start = timeit.default_timer()
+            for _ in range(args.number):
+                for game in games:
+                    # Board.play() gives a copy to the players of its process
+                    player.get_move(game if mode == "process" else game.copy(),
+                                    Deadline(args.time_limit))
+            elapsed = timeit.default_timer() - start
+            if mode == "process":
+                player.close()
+            print("{:<10}{:<10}{:>14.1f}".format(
+                name, mode, 1e6 * elapsed / (args.number * len(games))))
+
+    print()
+    print("{:<10}{:>12}{:>16}".format("Player", "Nodes", "Mean left (ms)"))
+    for mode in ("direct", "process"):
+        agent = AlphaBetaPlayer(score_fn=improved_score, instrument=True)
+        player = ProcessPlayer(agent) if mode == "process" else agent
+        margins = []
+        for moves in positions:
+            game = make_board(Board, moves, *(
+                (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)))
+            deadline = Deadline(args.time_limit)
+            player.get_move(game if mode == "process" else game.copy(), deadline)
+            margins.append(deadline())
+        if mode == "process":
+            player.close()
+        print("{:<10}{:>12}{:>16.3f}".format(
+            mode, sum(stats.nodes for stats in agent.move_stats),
+            sum(margins) / len(margins)))
+
+
+def bench_ponder(args):
+    """Play an alpha-beta agent with a transposition table against one
+    without (which cannot ponder) with pondering off, on in the process of
+    the game and on in worker processes, and report the search depth of both
+    agents and the prediction rate of the pondering searches.
+    """
+    rng = random.Random(args.seed)
+    openings = [random_positions(1, 2, rng.getrandbits(32))[0] for _ in range(args.games)]
+    print("{:<10}{:>6}{:>6}{:>8}{:>10}{:>12}{:>10}".format(
+        "Mode", "Won", "Lost", "Depth", "Ponder", "Predicted", "Opp depth"))
+    for mode, play_options in [("off", {}), ("thread", {"ponder": True}),
+                               ("process", {"ponder": True, "isolate": True})]:
+        wins = 0
+        stats, opponent_stats = [], []
+        for idx, opening in enumerate(openings):
+            agent = AlphaBetaPlayer(score_fn=improved_score, tt=TranspositionTable(),
+                                    ordering=MoveOrdering(), instrument=True)
+            opponent = AlphaBetaPlayer(score_fn=improved_score, instrument=True)
+            players = (agent, opponent) if idx % 2 == 0 else (opponent, agent)
+            game = make_board(Board, opening, *players, seed=idx)
+            winner, _, _ = game.play(time_limit=args.time_limit, **play_options)
+            wins += winner == agent
+            stats.extend(agent.move_stats)
+            opponent_stats.extend(opponent.move_stats)
+        pondered = [s for s in stats if s.ponder_hit is not None]
+        print("{:<10}{:>6}{:>6}{:>8.2f}{:>10.2f}{:>12.1%}{:>10.2f}".format(
+            mode, wins, len(openings) - wins,
+            sum(s.depth for s in stats) / max(len(stats), 1),
+            sum(s.ponder_depth for s in pondered) / max(len(pondered), 1),
+            sum(s.ponder_hit for s in pondered) / max(len(pondered), 1),
+            sum(s.depth for s in opponent_stats) / max(len(opponent_stats), 1)))
+
+
+def bench_batch(args):
+    """Compare scoring the leaves below the children of a state one at a time
+    with the heuristics of `sample_players.py` to scoring the whole frontier
+    in one NumPy pass, and the fixed-depth minimax search using each of them
+    (the alpha-beta agent does not score in batches).
+    """
+    import batch_scores
+
+    positions = random_positions(args.positions, args.plies, args.seed)
+    frontier_heuristics = [batch_scores.frontier_open_move_score,
+                           batch_scores.frontier_center_score,
+                           batch_scores.frontier_improved_score]
+
+    print("{:<10}{:>16}{:>16}{:>12}{:>12}{:>10}".format(
+        "Heuristic", "Scalar us/leaf", "Batch us/leaf", "MM scalar", "MM batch",
+        "Speedup"))
+    for (name, score_fn), frontier_fn in zip(HEURISTICS, frontier_heuristics):
+        games = [make_board(Board, moves) for moves in positions]
+        children = [game.get_legal_moves() for game in games]
+        num_leaves = sum(frontier_fn(game, moves, game.active_player)[1]
+                         for game, moves in zip(games, children))
+
+        def scalar():
+            for game, moves in zip(games, children):
+                for move in moves:
+                    game.push_move(move)
+                    for reply in game.get_legal_moves():
+                        game.push_move(reply)
+                        score_fn(game, game.inactive_player)
+                        game.pop_move()
+                    game.pop_move()
+
+        def batch():
+            for game, moves in zip(games, children):
+                frontier_fn(game, moves, game.active_player)
+
+        times = [1e6 * min(timeit.repeat(fn, number=args.number, repeat=3)) /
+                 (args.number * num_leaves) for fn in (scalar, batch)]
+
+        search_times = []
+        for kwargs in [{}, {"batch_score_fn": frontier_fn}]:
+            agent = MinimaxPlayer(score_fn=score_fn, **kwargs)
+            games = [make_board(Board, moves, *(
+                (agent, "Opponent") if len(moves) % 2 == 0 else ("Opponent", agent)),
+                shuffle_moves=False) for moves in positions]
+            start = timeit.default_timer()
+            for game in games:
+                search_to_depth(agent, game, args.depth)
+            search_times.append(timeit.default_timer() - start)
+
+        print("{:<10}{:>16.2f}{:>16.2f}{:>11.3f}s{:>11.3f}s{:>10.2f}".format(
+            name, times[0], times[1], search_times[0], search_times[1],
+            search_times[0] / search_times[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="benchmark")
+    subparsers.required = True
+
+    board_parser = subparsers.add_parser(
+        "board", help="nodes per second of each board backend")
+    board_parser.add_argument("--depth", type=int, default=4)
+    board_parser.add_argument("--positions", type=int, default=20)
+    board_parser.add_argument("--plies", type=int, default=6)
+    board_parser.add_argument("--seed", type=int, default=0)
+    board_parser.set_defaults(run=bench_board)
+
+    hash_parser = subparsers.add_parser(
+        "hash", help="cost of the Zobrist hash vs the string hash")
+    hash_parser.add_argument("--positions", type=int, default=100)
+    hash_parser.add_argument("--plies", type=int, default=10)
+    hash_parser.add_argument("--number", type=int, default=1000)
+    hash_parser.add_argument("--seed", type=int, default=0)
+    hash_parser.set_defaults(run=bench_hash)
+
+    tt_parser = subparsers.add_parser(
+        "tt", help="fixed-depth search with and without a transposition table")
+    tt_parser.add_argument("--positions", type=int, default=10)
+    tt_parser.add_argument("--plies", type=int, default=4)
+    tt_parser.add_argument("--minimax-depth", type=int, default=4)
+    tt_parser.add_argument("--alphabeta-depth", type=int, default=6)
+    tt_parser.add_argument("--tt-bytes", type=int, default=16 * 2**20)
+    tt_parser.add_argument("--seed", type=int, default=0)
+    tt_parser.set_defaults(run=bench_tt)
+
+    ordering_parser = subparsers.add_parser(
+        "ordering", help="alpha-beta nodes at a fixed depth with move ordering")
+    ordering_parser.add_argument("--positions", type=int, default=20)
+    ordering_parser.add_argument("--plies", type=int, default=6)
+    ordering_parser.add_argument("--depth", type=int, default=7)
+    ordering_parser.add_argument("--tt-bytes", type=int, default=16 * 2**20)
+    ordering_parser.add_argument("--seed", type=int, default=0)
+    ordering_parser.add_argument("--save", metavar="FILE",
+                                 help="write the generated positions to FILE")
+    ordering_parser.add_argument("--load", metavar="FILE",
+                                 help="read the positions from FILE")
+    ordering_parser.set_defaults(run=bench_ordering)
+
+    parallel_parser = subparsers.add_parser(
+        "parallel", help="depth reached by the parallel root search")
+    parallel_parser.add_argument("--positions", type=int, default=20)
+    parallel_parser.add_argument("--plies", type=int, default=6)
+    parallel_parser.add_argument("--time-limit", type=float, default=150.)
+    parallel_parser.add_argument("--workers", type=int, default=0)
+    parallel_parser.add_argument("--seed", type=int, default=0)
+    parallel_parser.add_argument("--save", metavar="FILE")
+    parallel_parser.add_argument("--load", metavar="FILE")
+    parallel_parser.set_defaults(run=bench_parallel)
+
+    endgame_parser = subparsers.add_parser(
+        "endgame", help="time to prove partitioned endgames")
+    endgame_parser.add_argument("--positions", type=int, default=20)
+    endgame_parser.add_argument("--min-cells", type=int, default=16)
+    endgame_parser.add_argument("--max-cells", type=int, default=20)
+    endgame_parser.add_argument("--seed", type=int, default=0)
+    endgame_parser.set_defaults(run=bench_endgame)
+
+    book_parser = subparsers.add_parser(
+        "book", help="hit rate and time saved by an opening book")
+    book_parser.add_argument("--book", metavar="FILE",
+                             help="book built by opening_book.py (default: build "
+                                  "a book for 2 and 3 plies)")
+    book_parser.add_argument("--depth", type=int, default=6,
+                             help="search depth of the book built when no "
+                                  "--book is given")
+    book_parser.add_argument("--games", type=int, default=10)
+    book_parser.add_argument("--time-limit", type=float, default=150.)
+    book_parser.add_argument("--seed", type=int, default=0)
+    book_parser.set_defaults(run=bench_book)
+
+    symmetry_parser = subparsers.add_parser(
+        "symmetry", help="states and search nodes saved by symmetry canonicalization")
+    symmetry_parser.add_argument("--results", metavar="FILE",
+                                 help="count the states of the games of a "
+                                      "tournament results log (default: play "
+                                      "--games games)")
+    symmetry_parser.add_argument("--games", type=int, default=20)
+    symmetry_parser.add_argument("--time-limit", type=float, default=150.)
+    symmetry_parser.add_argument("--max-ply", type=int, default=10)
+    symmetry_parser.add_argument("--depth", type=int, default=6,
+                                 help="search depth of the table comparison "
+                                      "(0 to skip it)")
+    symmetry_parser.add_argument("--symmetry", type=int, nargs="+", default=[2, 4, 8],
+                                 help="canonicalize the states with at most "
+                                      "these numbers of moves played")
+    symmetry_parser.add_argument("--positions", type=int, default=10)
+    symmetry_parser.add_argument("--plies", type=int, default=2)
+    symmetry_parser.add_argument("--tt-bytes", type=int, default=16 * 2**20)
+    symmetry_parser.add_argument("--seed", type=int, default=0)
+    symmetry_parser.set_defaults(run=bench_symmetry)
+
+    mcts_parser = subparsers.add_parser(
+        "mcts", help="rollouts per second and strength of the MCTS agent")
+    mcts_parser.add_argument("--positions", type=int, default=20)
+    mcts_parser.add_argument("--plies", type=int, default=6)
+    mcts_parser.add_argument("--time-limit", type=float, default=150.)
+    mcts_parser.add_argument("--games", type=int, default=20,
+                             help="number of games against AB_Improved (0 to "
+                                  "skip them)")
+    mcts_parser.add_argument("--seed", type=int, default=0)
+    mcts_parser.set_defaults(run=bench_mcts)
+
+    timer_parser = subparsers.add_parser(
+        "timer", help="cost of the time checks and of enforced time limits")
+    timer_parser.add_argument("--positions", type=int, default=20)
+    timer_parser.add_argument("--plies", type=int, default=6)
+    timer_parser.add_argument("--time-limit", type=float, default=150.)
+    timer_parser.add_argument("--timeout", type=float, default=10.,
+                              help="timeout threshold of the agent")
+    timer_parser.add_argument("--seed", type=int, default=0)
+    timer_parser.set_defaults(run=bench_timer)
+
+    process_parser = subparsers.add_parser(
+        "process", help="per-move overhead of players in worker processes")
+    process_parser.add_argument("--positions", type=int, default=20)
+    process_parser.add_argument("--plies", type=int, default=6)
+    process_parser.add_argument("--number", type=int, default=100)
+    process_parser.add_argument("--time-limit", type=float, default=150.)
+    process_parser.add_argument("--seed", type=int, default=0)
+    process_parser.set_defaults(run=bench_process)
+
+    ponder_parser = subparsers.add_parser(
+        "ponder", help="search depth and strength of an agent that ponders")
+    ponder_parser.add_argument("--games", type=int, default=20)
+    ponder_parser.add_argument("--time-limit", type=float, default=150.)
+    ponder_parser.add_argument("--seed", type=int, default=0)
+    ponder_parser.set_defaults(run=bench_ponder)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="scalar vs NumPy batched evaluation of the heuristics")
+    batch_parser.add_argument("--positions", type=int, default=20)
+    batch_parser.add_argument("--plies", type=int, default=6)
+    batch_parser.add_argument("--depth", type=int, default=4)
+    batch_parser.add_argument("--number", type=int, default=20)
+    batch_parser.add_argument("--seed", type=int, default=0)
+    batch_parser.set_defaults(run=bench_batch)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -59,12 +59,17 @@ class CustomPlayer:
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    book : `opening_book.OpeningBook` (optional)
+        An opening book consulted before searching; the book move is played
+        without a search when the state is in the book.
     """
 
-    def __init__(self, data=None, timeout=1.):
+    def __init__(self, data=None, timeout=1., book=None):
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.book = book
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +98,12 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
+        self.time_left = time_left
+
+        if self.book is not None:
+            book_move = self.book.lookup(game)
+            if book_move is not None:
+                return book_move
+
         # OPTIONAL: Finish this function!
         raise NotImplementedError
@@ -0,0 +1,184 @@
+"""This file contains an exact solver for the endgames of Isolation in which
+the two players can no longer interfere with each other.
+
+Once no open cell can be reached by both players (a "partition"), each
+player is confined to a separate region of the board and the game is decided
+by the length of the longest knight path available to each player in its own
+region: the active player wins if and only if its longest path is strictly
+longer than the opponent's, since it runs out of moves first on a tie.
+
+The regions are found with a flood fill over knight moves, and the longest
+paths by a depth-first search memoized on (cell, open cells of the region)
+and pruned with the bound given by the colors of the cells (a knight always
+moves to a cell of the other color).
+"""
+from isolation import Board
+from isolation.bitboard import knight_masks
+
+# Cache of the masks of the cells with an even (row + column) keyed by board
+# size
+_EVEN_CELLS = {}
+
+
+def even_cells(width, height):
+    """Return the bitmask of the cells of a board with the given dimensions
+    whose row and column add up to an even number.
+    """
+    key = (width, height)
+    if key not in _EVEN_CELLS:
+        _EVEN_CELLS[key] = sum(1 << idx for idx in range(width * height)
+                               if (idx % height + idx // height) % 2 == 0)
+    return _EVEN_CELLS[key]
+
+
+def reachable(masks, loc, open_cells):
+    """Return the bitmask of the open cells that can be reached from the cell
+    index `loc` with any number of knight moves through open cells.
+    """
+    region = 0
+    frontier = masks[loc] & open_cells
+    while frontier:
+        region |= frontier
+        step = 0
+        while frontier:
+            bit = frontier & -frontier
+            step |= masks[bit.bit_length() - 1]
+            frontier ^= bit
+        frontier = step & open_cells & ~region
+    return region
+
+
+def partition(game):
+    """Return the regions of the player 1 and player 2 if the players are
+    partitioned, or None if an open cell can be reached by both of them (or
+    if a player has not moved yet).
+
+    Returns
+    -------
+    ((int, int), (int, int)) or None
+        The cell index and the bitmask of the region of each player.
+    """
+    width, height, occupied, loc_1, loc_2, _ = game.encode()
+    if loc_1 is Board.NOT_MOVED or loc_2 is Board.NOT_MOVED:
+        return None
+    masks = knight_masks(width, height)
+    open_cells = ~occupied & ((1 << (width * height)) - 1)
+    region_1 = reachable(masks, loc_1, open_cells)
+    region_2 = reachable(masks, loc_2, open_cells)
+    if region_1 & region_2:
+        return None
+    return (loc_1, region_1), (loc_2, region_2)
+
+
+class EndgameSolver(object):
+    """Solve the partitioned endgames of a board size exactly.
+
+    The longest paths found are memoized across calls, so a player should
+    keep a single solver for the whole game.
+
+    Parameters
+    ----------
+    max_cells : int (optional)
+        The largest region for which the longest path is computed; positions
+        with a larger region are left to the search.
+
+    min_depth : int (optional)
+        The search agents only try to solve states searched to at least this
+        remaining depth, where the cost of the partition test is small
+        compared to the search it can save.
+
+    max_entries : int (optional)
+        The memo is cleared when it grows larger than this number of entries.
+    """
+
+    def __init__(self, max_cells=20, min_depth=3, max_entries=2**20):
+        self.max_cells = max_cells
+        self.min_depth = min_depth
+        self.max_entries = max_entries
+        self.solved = 0
+        self._memo = {}
+        self._size = None
+
+    def solve(self, game, check_timer=None):
+        """Solve the current state of a game if the players are partitioned.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The game state to solve.
+
+        check_timer : callable (optional)
+            A function called regularly during long solves, which can raise
+            an exception to abort the solve when the time is up.
+
+        Returns
+        -------
+        (bool, (int, int)) or None
+            Whether the active player wins and the first move of a winning
+            path if it wins, or of its longest path if it loses ((-1, -1) if
+            it has no legal moves), or None if the players are not
+            partitioned or a region is too large.
+        """
+        regions = partition(game)
+        if regions is None:
+            return None
+        if any(bin(region).count("1") > self.max_cells for _, region in regions):
+            return None
+
+        if self._size != (game.width, game.height) or len(self._memo) > self.max_entries:
+            self._memo = {}
+            self._size = (game.width, game.height)
+        self._masks = knight_masks(game.width, game.height)
+        self._even = even_cells(game.width, game.height)
+        self._check_timer = check_timer
+        self._calls = 0
+
+        active = game.move_count & 1
+        (loc, region), (opp_loc, opp_region) = regions[active], regions[1 - active]
+        moves = self._masks[loc] & region
+        self.solved += 1
+        if not moves:
+            return False, (-1, -1)
+        # Any move wins against an opponent that cannot move
+        opp_length = self._longest(opp_loc, opp_region) if opp_region else 0
+
+        # Stop at the first path longer than the opponent's, which decides
+        # the game; a losing player plays its longest path
+        length, move = 0, (-1, -1)
+        while moves and length <= opp_length:
+            bit = moves & -moves
+            idx = bit.bit_length() - 1
+            path = 1 + self._longest(idx, region & ~bit)
+            if path > length:
+                length, move = path, (idx % game.height, idx // game.height)
+            moves ^= bit
+        return length > opp_length, move
+
+    def _longest(self, loc, open_cells):
+        """Return the number of moves of the longest knight path from the
+        cell index `loc` through the open cells.
+        """
+        key = (loc, open_cells)
+        memo = self._memo
+        if key in memo:
+            return memo[key]
+
+        self._calls += 1
+        if self._check_timer is not None and not self._calls & 1023:
+            self._check_timer()
+
+        # The path alternates between cells of the other color than `loc`
+        # and cells of the same color
+        same = self._even if self._even >> loc & 1 else ~self._even
+        same_count = bin(open_cells & same).count("1")
+        other_count = bin(open_cells & ~same).count("1")
+        bound = min(2 * other_count, 2 * same_count + 1)
+
+        best = 0
+        moves = self._masks[loc] & open_cells
+        while moves and best < bound:
+            bit = moves & -moves
+            best = max(best, 1 + self._longest(bit.bit_length() - 1, open_cells & ~bit))
+            moves ^= bit
+        memo[key] = best
+        return best
@@ -2,8 +2,15 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
+import math
 import random
+import threading
 from operator import add
+from time import perf_counter_ns
+
+from isolation import Deadline
+
+from transposition import EXACT, LOWER, UPPER, SEAT_KEY
 
 
 class SearchTimeout(Exception):
@@ -91,11 +98,84 @@ def custom_score_3(game, player):
     raise NotImplementedError
 
 
+class SearchStats(object):
+    """Statistics of the search for a single move, collected by the agents
+    created with `instrument=True`.
+
+    Attributes
+    ----------
+    nodes : int
+        The number of states visited by the search.
+
+    cutoffs : int
+        The number of states whose remaining moves were pruned by alpha-beta
+        search.
+
+    depth : int
+        The depth of the deepest completed search (0 if no search completed).
+
+    iteration_times : list<float>
+        The number of milliseconds used by each completed search (i.e., each
+        pass of iterative deepening).
+
+    timed_out : bool
+        True if the last search was aborted because the timer expired.
+
+    time_used : float or None
+        The number of milliseconds used by the agent for the move, measured
+        by `isolation.Board.play()` (None if the move was not requested by
+        `play()`).
+
+    time_left : float or None
+        The number of milliseconds left on the clock when the move was
+        returned, i.e., the margin left by the timeout threshold, measured
+        by `isolation.Board.play()`.
+
+    ponder_depth : int
+        The depth of the deepest search completed while pondering during the
+        turn of the opponent before the move (0 if the player did not ponder).
+
+    ponder_hit : bool or None
+        Whether the opponent played the reply predicted by pondering (None if
+        the player did not ponder or the search predicted no reply).
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.depth = 0
+        self.iteration_times = []
+        self.timed_out = False
+        self.time_used = None
+        self.time_left = None
+        self.ponder_depth = 0
+        self.ponder_hit = None
+
+    def as_dict(self):
+        """Return the statistics as a dictionary of JSON serializable values."""
+        return {"nodes": self.nodes, "cutoffs": self.cutoffs, "depth": self.depth,
+                "iteration_times": self.iteration_times, "timed_out": self.timed_out,
+                "time_used": self.time_used, "time_left": self.time_left,
+                "ponder_depth": self.ponder_depth, "ponder_hit": self.ponder_hit}
+
+    def __repr__(self):
+        return ("SearchStats(nodes={}, cutoffs={}, depth={}, timed_out={}, "
+                "time_used={}, time_left={})").format(
+                    self.nodes, self.cutoffs, self.depth, self.timed_out,
+                    self.time_used, self.time_left)
+
+
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
     constructed or tested directly.
 
-    ********************  DO NOT MODIFY THIS CLASS  ********************
+    The constructor takes the configuration shared by the minimax and
+    alpha-beta agents: besides the depth, score function and timeout of the
+    original project, the optional search enhancements below. They are all
+    off by default, in which case the agents search like plain minimax and
+    alpha-beta. The options used by a single agent (e.g., the move ordering
+    of `AlphaBetaPlayer`) are parameters of that agent and documented with
+    it.
 
     Parameters
     ----------
@@ -112,20 +192,231 @@ class IsolationPlayer:
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    tt : `transposition.TranspositionTable` (optional)
+        A transposition table used to reuse the results of searching states
+        that were already visited. The stored scores are specific to this
+        player, so each player needs its own table.
+
+    instrument : bool (optional)
+        If True, a `SearchStats` object is created for every move: the
+        statistics of the current (or last) move are available as `stats`,
+        and the list of the statistics of every move as `move_stats`.
+
+    endgame : `endgame.EndgameSolver` (optional)
+        A solver used to return the exact value of the states in which the
+        players are confined to separate regions of the board, instead of
+        searching them.
+
+    symmetry : int (optional)
+        The states with at most this many moves played are stored in the
+        transposition table under their canonical form (see
+        `isolation.Board.canonical()`), so that the states equivalent under a
+        rotation or reflection of the board share their entries. Equivalent
+        states become rare as the board fills up, while the cost of the
+        canonical form does not, so only the early states are worth it. Only
+        valid with a score function that is invariant under the symmetries of
+        the board (e.g., `sample_players.improved_score`, but not
+        `sample_players.center_score`, whose center is offset by half a cell).
     """
-    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.):
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., tt=None,
+                 instrument=False, endgame=None, symmetry=0):
         self.search_depth = search_depth
         self.score = score_fn
-        self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.time_left = None
+        self.tt = tt
+        self.endgame = endgame
+        self.symmetry = symmetry
+        self._root_depth = 0
+        self.nodes_searched = 0
+        self.cutoffs = 0
+        self.stats = None
+        self.move_stats = [] if instrument else None
+        self._tt_salt = 0
+
+    @property
+    def time_left(self):
+        """The function returning the number of milliseconds left in the
+        current turn.
+        """
+        return self._time_left
+
+    @time_left.setter
+    def time_left(self, time_left):
+        self._time_left = time_left
+        # A deadline can be polled by comparing the clock to the time at
+        # which the search must stop, without calling time_left()
+        self._stop_ns = (time_left.stop_ns(self.TIMER_THRESHOLD)
+                         if isinstance(time_left, Deadline) else None)
+
+    def _time_up(self):
+        """Return True if the time left is below the threshold."""
+        if self._stop_ns is not None:
+            return perf_counter_ns() >= self._stop_ns
+        return self.time_left() < self.TIMER_THRESHOLD
+
+    def _stats_start(self):
+        """Start collecting the statistics of a new move if the player is
+        instrumented; call after setting `self.time_left`.
+        """
+        if self.move_stats is None:
+            return
+        self.stats = SearchStats()
+        self.move_stats.append(self.stats)
+        self._stats_base = (self.nodes_searched, self.cutoffs)
+        self._stats_clock = self.time_left()
+
+    def _stats_iteration(self, depth):
+        """Record the completion of a search to the given depth."""
+        if self.stats is None:
+            return
+        clock = self.time_left()
+        self.stats.depth = depth
+        self.stats.iteration_times.append(self._stats_clock - clock)
+        self._stats_clock = clock
+
+    def _stats_end(self, timed_out):
+        """Finish collecting the statistics of the current move."""
+        if self.stats is None:
+            return
+        self.stats.nodes = self.nodes_searched - self._stats_base[0]
+        self.stats.cutoffs = self.cutoffs - self._stats_base[1]
+        self.stats.timed_out = timed_out
+
+    def _tt_start(self, game):
+        """Prepare the transposition table for a search rooted at `game`,
+        where this player is the active player.
+        """
+        is_player_2 = (game.move_count % 2 == 1) == (game.active_player == self)
+        self._tt_salt = SEAT_KEY if is_player_2 else 0
+
+    def _tt_key(self, game):
+        """Return the transposition table key of the current state and the
+        symmetry mapping the moves of the state to the moves of the stored
+        entry (0, the identity, unless the state is canonicalized).
+        """
+        # The number of moves played is the same for all the equivalent
+        # states, so they are either all canonicalized or none of them
+        if game.move_count <= self.symmetry:
+            key, symmetry = game.canonical()
+            return key ^ self._tt_salt, symmetry
+        return game.hash() ^ self._tt_salt, 0
+
+    def _tt_lookup(self, game, depth, alpha, beta):
+        """Probe the transposition table for the current state.
+
+        Returns
+        -------
+        (float or None, float, float, (int, int) or None)
+            The stored score if it settles the value of the state within the
+            (alpha, beta) window (or None), the window narrowed by the stored
+            bound, and the stored best move (or None).
+        """
+        key, symmetry = self._tt_key(game)
+        entry = self.tt.lookup(key)
+        if entry is None:
+            return None, alpha, beta, None
+        move = entry.move
+        if symmetry:
+            move = game.transform_move(move, symmetry, inverse=True)
+        if entry.depth >= depth:
+            if entry.bound == EXACT:
+                return entry.score, alpha, beta, move
+            if entry.bound == LOWER:
+                alpha = max(alpha, entry.score)
+            else:
+                beta = min(beta, entry.score)
+            if alpha >= beta:
+                return entry.score, alpha, beta, move
+        return None, alpha, beta, move
+
+    def _tt_store(self, game, depth, value, alpha, beta, move):
+        """Store the result of searching the current state with the window
+        (alpha, beta) in the transposition table.
+        """
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        key, symmetry = self._tt_key(game)
+        if symmetry:
+            move = game.transform_move(move, symmetry)
+        self.tt.store(key, depth, value, bound, move)
+
+    def _check_timer(self):
+        """Raise SearchTimeout if the time left is below the threshold."""
+        if self._time_up():
+            raise SearchTimeout()
+
+    def _solve_endgame(self, game, depth):
+        """Return the exact value of the current state and the best move for
+        the active player if the endgame solver can decide it, or None.
+        """
+        if self.endgame is None or depth < self.endgame.min_depth:
+            return None
+        result = self.endgame.solve(game, self._check_timer)
+        if result is None:
+            return None
+        active_wins, move = result
+        return (float("inf") if active_wins == (game.active_player == self)
+                else float("-inf")), move
+
+    @staticmethod
+    def _order_moves(legal_moves, first_move):
+        """Move `first_move` (e.g., the best move stored in the transposition
+        table) to the front of the list of legal moves.
+        """
+        if first_move is not None and first_move in legal_moves:
+            legal_moves.remove(first_move)
+            legal_moves.insert(0, first_move)
+        return legal_moves
 
 
 class MinimaxPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    batch_score_fn : callable (optional)
+        A function `fn(game, moves, player)` returning the minimax values of
+        the states reached by applying each move to `game`, searched one ply
+        deeper with the heuristic at the leaves, and the number of leaves; or
+        None if it cannot score the state (e.g.,
+        `batch_scores.frontier_improved_score`). If given, the whole frontier
+        below the states two plies above the search horizon is scored in one
+        call instead of visiting the leaves one at a time with `score_fn`.
+
+    The other parameters are the same as for `IsolationPlayer`.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., tt=None,
+                 instrument=False, endgame=None, symmetry=0, batch_score_fn=None):
+        super().__init__(search_depth=search_depth, score_fn=score_fn, timeout=timeout,
+                         tt=tt, instrument=instrument, endgame=endgame, symmetry=symmetry)
+        self.batch_score = batch_score_fn
+
+    def _batch_values(self, game, legal_moves, depth):
+        """Return the values of the children of the current state if they are
+        one ply above the search horizon and a batch score function is set,
+        or None if they have to be searched one at a time.
+        """
+        if depth != 2 or self.batch_score is None:
+            return None
+        # The endgame solver would replace the heuristic at the children
+        if self.endgame is not None and self.endgame.min_depth <= 1:
+            return None
+        result = self.batch_score(game, legal_moves, self)
+        if result is None:
+            return None
+        values, leaves = result
+        self.nodes_searched += len(legal_moves) + leaves
+        return values
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -159,14 +450,21 @@ class MinimaxPlayer(IsolationPlayer):
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         best_move = (-1, -1)
+        if self.tt is not None:
+            self.tt.new_search()
+        self._stats_start()
+        timed_out = False
 
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            return self.minimax(game, self.search_depth)
+            best_move = self.minimax(game, self.search_depth)
+            self._stats_iteration(self.search_depth)
 
         except SearchTimeout:
-            pass  # Handle any actions required after timeout as needed
+            timed_out = True  # Handle any actions required after timeout as needed
+
+        self._stats_end(timed_out)
 
         # Return the best move from the last completed search iteration
         return best_move
@@ -213,16 +511,107 @@ class MinimaxPlayer(IsolationPlayer):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
-        # TODO: finish this function!
-        raise NotImplementedError
+        if self.tt is not None:
+            self._tt_start(game)
+        return self._search(game, depth, True)[1]
+
+    def _max_value(self, game, depth):
+        """Return the minimax value of a state where this player is active.
+
+        Child states are visited in-place with `game.push_move()` and
+        `game.pop_move()`, so the board is unchanged when this returns.
+        """
+        return self._search(game, depth, True)[0]
+
+    def _min_value(self, game, depth):
+        """Return the minimax value of a state where the opponent is active.
+        """
+        return self._search(game, depth, False)[0]
+
+    def _search(self, game, depth, maximizing):
+        """Return the minimax value of the current state and the best move for
+        the active player, (-1, -1) if the state has no legal moves.
+        """
+        # Inlined _time_up(): this check runs at every node
+        if self._stop_ns is not None:
+            if perf_counter_ns() >= self._stop_ns:
+                raise SearchTimeout()
+        elif self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+        self.nodes_searched += 1
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return game.utility(self), (-1, -1)
+        if depth <= 0:
+            return self.score(game, self), (-1, -1)
+        solved = self._solve_endgame(game, depth)
+        if solved is not None:
+            return solved
+
+        if self.tt is not None:
+            inf = float("inf")
+            score, _, _, tt_move = self._tt_lookup(game, depth, -inf, inf)
+            if score is not None:
+                return score, tt_move
+            legal_moves = self._order_moves(legal_moves, tt_move)
+
+        best_value = float("-inf") if maximizing else float("inf")
+        best_move = legal_moves[0]
+        batch_values = self._batch_values(game, legal_moves, depth)
+        for idx, move in enumerate(legal_moves):
+            if batch_values is not None:
+                value = batch_values[idx]
+            else:
+                game.push_move(move)
+                try:
+                    value = self._search(game, depth - 1, not maximizing)[0]
+                finally:
+                    game.pop_move()
+            if (value > best_value) if maximizing else (value < best_value):
+                best_value, best_move = value, move
+
+        if self.tt is not None:
+            self._tt_store(game, depth, best_value, float("-inf"), float("inf"), best_move)
+        return best_value, best_move
 
 
 class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    A player with a transposition table can also ponder: `ponder()` searches
+    the state in which the opponent is to move in a background thread, so
+    that the results for every reply of the opponent are in the table when
+    its move arrives, and `stop_pondering()` ends that search (see the
+    `ponder` option of `isolation.Board.play()`).
+
+    Parameters
+    ----------
+    ordering : `move_ordering.MoveOrdering` (optional)
+        The principal variation, killer move and history tables used to
+        choose the order in which moves are searched. Each player needs its
+        own instance.
+
+    book : `opening_book.OpeningBook` (optional)
+        An opening book consulted before searching; the book move is played
+        without a search when the state is in the book.
+
+    The other parameters are the same as for `IsolationPlayer`.
     """
 
+    _ponder_thread = None
+    # (depth, hit) of the pondering before the next move, or None
+    _pondered = None
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., tt=None,
+                 instrument=False, endgame=None, symmetry=0, ordering=None, book=None):
+        super().__init__(search_depth=search_depth, score_fn=score_fn, timeout=timeout,
+                         tt=tt, instrument=instrument, endgame=endgame, symmetry=symmetry)
+        self.ordering = ordering
+        self.book = book
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -253,10 +642,55 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
+        self.stop_pondering()
         self.time_left = time_left
+        self._stats_start()
+        pondered, self._pondered = self._pondered, None
+        if pondered is not None and self.stats is not None:
+            self.stats.ponder_depth, self.stats.ponder_hit = pondered
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            self._stats_end(timed_out=False)
+            return (-1, -1)
+        best_move = legal_moves[0]
+        # The entries stored while pondering belong to this search
+        if self.tt is not None and pondered is None:
+            self.tt.new_search()
+        if self.ordering is not None:
+            self.ordering.new_search()
+        timed_out = False
+
+        try:
+            # A state of the opening book needs no search
+            if self.book is not None:
+                book_move = self.book.lookup(game)
+                if book_move is not None:
+                    self._stats_end(timed_out=False)
+                    return book_move
+
+            # Iterative deepening: keep the result of the deepest completed
+            # search; searching deeper than the number of open cells cannot
+            # change the outcome
+            depth = 1
+            while depth <= len(game.get_blank_spaces()):
+                best_move = self.alphabeta(game, depth)
+                self._stats_iteration(depth)
+                if depth == 1 and self.endgame is not None:
+                    # A solved endgame needs no deeper search; solving it
+                    # after the first iteration leaves a move to fall back
+                    # on if the solve runs out of time
+                    solved = self.endgame.solve(game, self._check_timer)
+                    if solved is not None:
+                        best_move = solved[1]
+                        break
+                depth += 1
+
+        except SearchTimeout:
+            timed_out = True
 
-        # TODO: finish this function!
-        raise NotImplementedError
+        self._stats_end(timed_out)
+        return best_move
 
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
@@ -306,5 +740,357 @@ class AlphaBetaPlayer(IsolationPlayer):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
-        # TODO: finish this function!
-        raise NotImplementedError
+        if self.tt is not None:
+            self._tt_start(game)
+        if self.ordering is None:
+            return self._search(game, depth, alpha, beta, True)[1]
+
+        self._root_depth = depth
+        self.ordering.start_iteration(depth)
+        best_move = self._search(game, depth, alpha, beta, True)[1]
+        self.ordering.end_iteration()
+        return best_move
+
+    def ponder(self, game):
+        """Start searching the current state of `game`, in which the opponent
+        is active, in a background thread until `stop_pondering()` is called.
+
+        The search runs iterative deepening without a time limit and fills the
+        transposition table, so the search for the next move finds the values
+        of the states after the reply of the opponent, whichever it is, as
+        well as the best move from them. Players without a transposition
+        table do not ponder. The board must not be modified until the search
+        is stopped.
+        """
+        self.stop_pondering()
+        if self.tt is None or not game.get_legal_moves():
+            return
+        self.time_left = Deadline(float("inf"))
+        self._ponder_depth = 0
+        self._ponder_move = None
+        self._ponder_thread = threading.Thread(
+            target=self._ponder, args=(game,), name="ponder", daemon=True)
+        self._ponder_thread.start()
+
+    def stop_pondering(self, move=None):
+        """Stop the search started by `ponder()`, if any, and wait for it.
+
+        Parameters
+        ----------
+        move : (int, int) (optional)
+            The move played by the opponent, which the next call to
+            `get_move()` is for, or None if the game ended or was aborted.
+        """
+        thread = self._ponder_thread
+        if thread is None:
+            return
+        # The search raises SearchTimeout at its next timer check
+        self._stop_ns = 0
+        thread.join()
+        self._ponder_thread = None
+        if move is not None:
+            hit = None if self._ponder_move is None else tuple(move) == self._ponder_move
+            self._pondered = (self._ponder_depth, hit)
+
+    def _ponder(self, game):
+        """Run the iterative deepening search of `ponder()`, recording the
+        reply predicted by the deepest completed search.
+        """
+        self._tt_start(game)
+        self.tt.new_search()
+        ordering = self.ordering
+        if ordering is not None:
+            ordering.new_search()
+            # The history tables are indexed by the parity of the ply, and the
+            # opponent is active at the root of this search
+            ordering.history.reverse()
+        try:
+            depth = 1
+            while depth <= len(game.get_blank_spaces()):
+                if ordering is not None:
+                    self._root_depth = depth
+                    ordering.start_iteration(depth)
+                move = self._search(game, depth, float("-inf"), float("inf"), False)[1]
+                if ordering is not None:
+                    ordering.end_iteration()
+                self._ponder_depth, self._ponder_move = depth, move
+                depth += 1
+        except SearchTimeout:
+            pass
+        finally:
+            if ordering is not None:
+                ordering.history.reverse()
+
+    def _max_value(self, game, depth, alpha, beta):
+        """Return the alpha-beta value of a state where this player is active.
+
+        Child states are visited in-place with `game.push_move()` and
+        `game.pop_move()`, so the board is unchanged when this returns.
+        """
+        return self._search(game, depth, alpha, beta, True)[0]
+
+    def _min_value(self, game, depth, alpha, beta):
+        """Return the alpha-beta value of a state where the opponent is active.
+        """
+        return self._search(game, depth, alpha, beta, False)[0]
+
+    def _search(self, game, depth, alpha, beta, maximizing):
+        """Return the (fail-soft) alpha-beta value of the current state and the
+        best move for the active player, (-1, -1) if the state has no legal
+        moves.
+        """
+        # Inlined _time_up(): this check runs at every node
+        if self._stop_ns is not None:
+            if perf_counter_ns() >= self._stop_ns:
+                raise SearchTimeout()
+        elif self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+        self.nodes_searched += 1
+        ordering = self.ordering
+        if ordering is not None:
+            ply = self._root_depth - depth
+            ordering.enter(ply)
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return game.utility(self), (-1, -1)
+        if depth <= 0:
+            return self.score(game, self), (-1, -1)
+        solved = self._solve_endgame(game, depth)
+        if solved is not None:
+            return solved
+
+        alpha_orig, beta_orig = alpha, beta
+        tt_move = None
+        if self.tt is not None:
+            score, alpha, beta, tt_move = self._tt_lookup(game, depth, alpha, beta)
+            if score is not None:
+                return score, tt_move
+        if ordering is not None:
+            legal_moves = ordering.order(legal_moves, ply, tt_move)
+        else:
+            legal_moves = self._order_moves(legal_moves, tt_move)
+
+        best_move = legal_moves[0]
+        if maximizing:
+            best_value = float("-inf")
+            for move in legal_moves:
+                game.push_move(move)
+                try:
+                    value = self._search(game, depth - 1, alpha, beta, False)[0]
+                finally:
+                    game.pop_move()
+                if value > best_value:
+                    best_value, best_move = value, move
+                    if ordering is not None:
+                        ordering.best_move(ply, move)
+                if best_value >= beta:
+                    self.cutoffs += 1
+                    if ordering is not None:
+                        ordering.cutoff(ply, depth, move)
+                    break
+                alpha = max(alpha, best_value)
+        else:
+            best_value = float("inf")
+            for move in legal_moves:
+                game.push_move(move)
+                try:
+                    value = self._search(game, depth - 1, alpha, beta, True)[0]
+                finally:
+                    game.pop_move()
+                if value < best_value:
+                    best_value, best_move = value, move
+                    if ordering is not None:
+                        ordering.best_move(ply, move)
+                if best_value <= alpha:
+                    self.cutoffs += 1
+                    if ordering is not None:
+                        ordering.cutoff(ply, depth, move)
+                    break
+                beta = min(beta, best_value)
+
+        if self.tt is not None:
+            self._tt_store(game, depth, best_value, alpha_orig, beta_orig, best_move)
+        return best_value, best_move
+
+
+class MCTSNode(object):
+    """A state of the search tree of `MCTSPlayer`.
+
+    Attributes
+    ----------
+    move : (int, int) or None
+        The move leading to the state from its parent (None at the root).
+
+    key : int
+        The Zobrist hash of the state, used to find the state of the next
+        turn in the tree.
+
+    untried : list<(int, int)>
+        The legal moves of the state that have no child node yet.
+
+    children : list<MCTSNode>
+        The child nodes of the moves already expanded.
+
+    visits : int
+        The number of rollouts that went through the state.
+
+    wins : int
+        The number of these rollouts won by the player who made `move`.
+    """
+    __slots__ = ("move", "key", "untried", "children", "visits", "wins")
+
+    def __init__(self, move, key, untried):
+        self.move = move
+        self.key = key
+        self.untried = untried
+        self.children = []
+        self.visits = 0
+        self.wins = 0
+
+
+class MCTSPlayer(IsolationPlayer):
+    """Game-playing agent that chooses a move using Monte Carlo tree search
+    with the UCT selection rule and uniformly random rollouts.
+
+    Each iteration walks down the tree from the current state, choosing the
+    child maximizing
+
+        wins / visits + exploration * sqrt(ln(parent visits) / visits)
+
+    until it reaches a state with unexpanded moves, expands one of them,
+    plays random moves to the end of the game and updates the win counts of
+    the states on the path. The moves are played in place on the board with
+    `push_move()` and undone with `pop_move()`, so no board is ever copied.
+
+    The subtree of the state reached after the opponent's reply is kept
+    from one move to the next. For this agent `nodes_searched` (and the
+    `nodes` of its `SearchStats`) counts rollouts.
+
+    Parameters
+    ----------
+    exploration : float (optional)
+        The exploration constant of UCT; larger values spread the rollouts
+        more evenly over the moves.
+
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted.
+
+    instrument : bool (optional)
+        Collect the statistics of every move (see `IsolationPlayer`).
+
+    reuse_tree : bool (optional)
+        If False, the search starts from an empty tree on every move.
+
+    seed : int (optional)
+        Seed of the random numbers of the rollouts; by default the agent
+        draws from the global random number generator, which tournament.py
+        seeds for every game.
+    """
+
+    def __init__(self, exploration=math.sqrt(2), timeout=10., instrument=False,
+                 reuse_tree=True, seed=None):
+        super().__init__(timeout=timeout, instrument=instrument)
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.root = None
+        self._rng = random.Random(seed) if seed is not None else None
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.time_left = time_left
+        self._stats_start()
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            self.root = None
+            self._stats_end(timed_out=False)
+            return (-1, -1)
+
+        root = self._find_root(game)
+        while not self._time_up():
+            self._iterate(game, root)
+            self.nodes_searched += 1
+
+        if not root.children:
+            self.root = None
+            self._stats_end(timed_out=True)
+            return legal_moves[0]
+        best = max(root.children, key=lambda child: child.visits)
+        self.root = best if self.reuse_tree else None
+        self._stats_end(timed_out=False)
+        return best.move
+
+    def _find_root(self, game):
+        """Return the node of the current state in the tree kept from the
+        previous move, or a new tree if the state is not in it.
+        """
+        key = game.hash()
+        if self.root is not None:
+            for child in self.root.children:
+                if child.key == key:
+                    return child
+        return MCTSNode(None, key, game.get_legal_moves())
+
+    def _iterate(self, game, root):
+        """Run one selection, expansion, rollout and backpropagation pass
+        from the root state `game`, leaving `game` unchanged.
+        """
+        rng = self._rng or random
+        node, path = root, [root]
+        while not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            exploration = self.exploration
+            node = max(node.children, key=lambda child: (
+                child.wins / child.visits +
+                exploration * math.sqrt(log_visits / child.visits)))
+            game.push_move(node.move)
+            path.append(node)
+
+        if node.untried:
+            untried = node.untried
+            idx = int(rng.random() * len(untried))
+            untried[idx], untried[-1] = untried[-1], untried[idx]
+            move = untried.pop()
+            game.push_move(move)
+            child = MCTSNode(move, game.hash(), game.get_legal_moves())
+            node.children.append(child)
+            path.append(child)
+
+        # Random playout: the player to move when no legal moves remain loses
+        plies = 0
+        moves = game.get_legal_moves()
+        while moves:
+            game.push_move(moves[int(rng.random() * len(moves))])
+            plies += 1
+            moves = game.get_legal_moves()
+        for _ in range(plies + len(path) - 1):
+            game.pop_move()
+
+        # The player who made the move of the node at depth d (from the root)
+        # is the active player at depth d - 1, and the loser is the active
+        # player at depth len(path) - 1 + plies
+        loser_parity = (len(path) - 1 + plies) & 1
+        for depth, node in enumerate(path):
+            node.visits += 1
+            if (depth - 1) & 1 != loser_parity:
+                node.wins += 1
@@ -0,0 +1,346 @@
+"""
+This file contains the `BitBoard` class, an alternate backend for the
+`isolation.Board` game model that stores the occupied cells of the board as a
+single integer bitmask instead of a list of cell values.
+
+Bit `i` of the occupancy mask corresponds to the same cell index used by
+`Board` (i.e., `row + column * height`), and a precomputed table of knight
+move masks for every cell turns move generation, move application and the
+terminal state test into a handful of integer operations.
+"""
+import random
+
+from .isolation import Board, knight_neighbors, zobrist_keys
+
+# Cache of knight move masks keyed by board size; shared by every BitBoard
+# instance with the same (width, height)
+_KNIGHT_MASKS = {}
+
+# Cache of (row, column) coordinate tuples for every cell index
+_COORDINATES = {}
+
+
+def knight_masks(width, height):
+    """Return a list holding, for each cell index of a board with the given
+    dimensions, the bitmask of cells reachable from that cell with a single
+    L-shaped (knight) move.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    Returns
+    -------
+    list<int>
+        The knight move mask for every cell index on the board.
+    """
+    key = (width, height)
+    if key not in _KNIGHT_MASKS:
+        _KNIGHT_MASKS[key] = [sum(1 << neighbor for neighbor, _ in neighbors)
+                              for neighbors in knight_neighbors(width, height)]
+    return _KNIGHT_MASKS[key]
+
+
+def coordinates(width, height):
+    """Return a list mapping each cell index of a board with the given
+    dimensions to its (row, column) coordinate pair.
+    """
+    key = (width, height)
+    if key not in _COORDINATES:
+        _COORDINATES[key] = [(idx % height, idx // height)
+                             for idx in range(width * height)]
+    return _COORDINATES[key]
+
+
+class BitBoard(Board):
+    """Implement the `isolation.Board` model for the game Isolation using an
+    integer bitmask to track the blocked cells of the board.
+
+    A `BitBoard` can be used anywhere a `Board` is expected; all of the public
+    methods of `Board` behave the same way, including the (optionally seeded)
+    random order of the moves returned by `get_legal_moves()`.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+
+    shuffle_moves : bool (optional)
+        If False, `get_legal_moves()` returns the moves in a fixed order
+        instead of shuffling them.
+
+    seed : int (optional)
+        A seed for a random number generator owned by the board (and shared
+        with its copies) that is used to shuffle the legal moves. If None,
+        the moves are shuffled with the global `random` module.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7,
+                 shuffle_moves=True, seed=None):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self.shuffle_moves = shuffle_moves
+        self._rng = random.Random(seed) if seed is not None else None
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        # Bit i is set when cell index i has been occupied by either player;
+        # the player locations are stored as cell indices (player 1 first)
+        self._occupied = 0
+        self._locations = [Board.NOT_MOVED, Board.NOT_MOVED]
+        self._full_mask = (1 << (width * height)) - 1
+        self._masks = knight_masks(width, height)
+        self._coordinates = coordinates(width, height)
+        self._undo_stack = []
+        self._zobrist = zobrist_keys(width, height)
+        self._hash = 0
+
+    @property
+    def _board_state(self):
+        """The board state in the list format used by `isolation.Board`."""
+        state = [Board.BLANK] * (self.width * self.height + 3)
+        occupied = self._occupied
+        while occupied:
+            bit = occupied & -occupied
+            state[bit.bit_length() - 1] = 1
+            occupied ^= bit
+        state[-1] = self._locations[0]
+        state[-2] = self._locations[1]
+        state[-3] = self.move_count & 1
+        return state
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = BitBoard(self._player_1, self._player_2,
+                             width=self.width, height=self.height,
+                             shuffle_moves=self.shuffle_moves)
+        new_board._rng = self._rng
+        new_board.move_count = self.move_count
+        new_board._active_player = self._active_player
+        new_board._inactive_player = self._inactive_player
+        new_board._occupied = self._occupied
+        new_board._locations = self._locations[:]
+        new_board._hash = self._hash
+        return new_board
+
+    def encode(self):
+        """Return a compact encoding of the current game state (see
+        `isolation.Board.encode()`).
+        """
+        return (self.width, self.height, self._occupied, self._locations[0],
+                self._locations[1], self.move_count)
+
+    def _set_state(self, occupied, loc_1, loc_2, move_count):
+        """Replace the state of a new board by the state described by the
+        fields of an encoding.
+        """
+        self._occupied = occupied
+        self._locations = [loc_1, loc_2]
+        self.move_count = move_count
+        if move_count & 1:
+            self._active_player, self._inactive_player = self._player_2, self._player_1
+        self._hash = self._state_hash(occupied, (loc_1, loc_2), move_count)
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._occupied >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        return self.__coordinates_of(~self._occupied & self._full_mask)
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        idx = self._locations[self.__player_slot(player)]
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._coordinates[idx]
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        loc = self._locations[self.__player_slot(player)]
+        valid_moves = self.__coordinates_of(self.__move_mask(loc))
+        # Like `Board`, the first move of a player is not shuffled
+        if self.shuffle_moves and loc != Board.NOT_MOVED:
+            (self._rng or random).shuffle(valid_moves)
+        return valid_moves
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        slot = int(self._active_player == self._player_2)
+        self._update_hash(slot, self._locations[slot], idx)
+        self._locations[slot] = idx
+        self._occupied |= 1 << idx
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def push_move(self, move):
+        """Apply a move in-place, like `apply_move()`, and record the
+        information needed to restore the current state with `pop_move()`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        self._undo_stack.append(
+            self._locations[int(self._active_player == self._player_2)])
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the last move applied with `push_move()`, restoring the board
+        to exactly the state it was in before that move.
+        """
+        if not self._undo_stack:
+            raise RuntimeError("There is no pushed move to undo.")
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        slot = int(self._active_player == self._player_2)
+        idx = self._locations[slot]
+        self._occupied ^= 1 << idx
+        self._locations[slot] = self._undo_stack.pop()
+        self._update_hash(slot, self._locations[slot], idx)
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        return player == self._inactive_player and not self.__active_can_move()
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        return player == self._active_player and not self.__active_can_move()
+
+    def utility(self, player):
+        r"""Returns the utility of the current game state from the perspective
+        of the specified player.
+
+                    /  +infinity,   "player" wins
+        utility =  |   -infinity,   "player" loses
+                    \          0,    otherwise
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the utility for the active player on the board.
+
+        Returns
+        ----------
+        float
+            The utility value of the current game state for the specified
+            player. The game has a utility of +inf if the player has won,
+            a value of -inf if the player has lost, and a value of 0
+            otherwise.
+        """
+        if not self.__active_can_move():
+
+            if player == self._inactive_player:
+                return float("inf")
+
+            if player == self._active_player:
+                return float("-inf")
+
+        return 0.
+
+    def __player_slot(self, player):
+        """Return the index of the specified player in `self._locations`."""
+        if player == self._player_1:
+            return 0
+        elif player == self._player_2:
+            return 1
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def __move_mask(self, loc):
+        """Return the bitmask of open cells reachable from the cell index
+        `loc` (or every open cell if the player has not moved).
+        """
+        if loc == Board.NOT_MOVED:
+            return ~self._occupied & self._full_mask
+        return self._masks[loc] & ~self._occupied
+
+    def __active_can_move(self):
+        """Test whether the active player has at least one legal move."""
+        loc = self._locations[int(self._active_player == self._player_2)]
+        if loc == Board.NOT_MOVED:
+            return self._occupied != self._full_mask
+        return bool(self._masks[loc] & ~self._occupied)
+
+    def __coordinates_of(self, mask):
+        """Return the (row, column) pairs of the cells set in `mask` in
+        increasing cell index order.
+        """
+        coords = self._coordinates
+        cells = []
+        while mask:
+            bit = mask & -mask
+            cells.append(coords[bit.bit_length() - 1])
+            mask ^= bit
+        return cells
@@ -8,11 +8,178 @@ remain compatible with the defaults provided, and none of your changes will
 be available to project reviewers.
 """
 import random
-import timeit
+import sys
+from collections import namedtuple
 from copy import copy
 
+from .timer import Deadline, call_with_deadline
+from .worker import ProcessPlayer
+
 TIME_LIMIT_MILLIS = 150
 
+# Number of milliseconds past the time limit after which Board.play()
+# interrupts a player when the time limit is enforced
+TIMEOUT_GRACE_MILLIS = 50
+
+# Number of seconds a thread may hold the interpreter lock while a player
+# ponders in the process of Board.play(); the default of Python (5 ms) can
+# delay the timer checks of the active player past its timeout threshold
+PONDER_SWITCH_INTERVAL = 0.0005
+
+# Seed of the Zobrist key tables; keeping it fixed makes the hash of a game
+# state identical across runs and processes (e.g., for on-disk caches)
+ZOBRIST_SEED = 0x15013A7E
+
+ZobristKeys = namedtuple("ZobristKeys", ["blocked", "locations", "side"])
+
+# Tables of a symmetry of the board indexed by the bytes of a bitmask of cell
+# indices (byte i holding the cells 8 * i to 8 * i + 7): the XOR of the blocked
+# keys of the images of the cells, and the bitmask of the images; plus the
+# location keys of the image of each cell
+SymmetryKeys = namedtuple("SymmetryKeys", ["blocked", "cells", "locations"])
+
+# Cache of knight move adjacency lists keyed by board size; shared by every
+# board instance with the same (width, height)
+_KNIGHT_NEIGHBORS = {}
+
+# Cache of Zobrist key tables keyed by board size; shared by every board
+# instance with the same (width, height)
+_ZOBRIST_KEYS = {}
+
+# Caches of the symmetries of the board and of the Zobrist keys of the
+# transformed states, keyed by board size
+_SYMMETRIES = {}
+_SYMMETRY_KEYS = {}
+
+
+def zobrist_keys(width, height):
+    """Return the table of random 64-bit keys used to hash the states of a
+    board with the given dimensions.
+
+    The hash of a state is the XOR of the `blocked` key of every occupied
+    cell, the `locations[0]` and `locations[1]` keys of the cells holding
+    player 1 and player 2, and the `side` key when player 2 is active.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    Returns
+    -------
+    ZobristKeys
+        The Zobrist key table for the board size.
+    """
+    key = (width, height)
+    if key not in _ZOBRIST_KEYS:
+        rng = random.Random(ZOBRIST_SEED)
+        size = width * height
+        blocked = [rng.getrandbits(64) for _ in range(size)]
+        locations = ([rng.getrandbits(64) for _ in range(size)],
+                     [rng.getrandbits(64) for _ in range(size)])
+        _ZOBRIST_KEYS[key] = ZobristKeys(blocked, locations, rng.getrandbits(64))
+    return _ZOBRIST_KEYS[key]
+
+
+def knight_neighbors(width, height):
+    """Return the knight move adjacency lists of a board with the given
+    dimensions.
+
+    The table is built once per board size. Entry `idx` lists a pair
+    (neighbor_idx, (row, column)) for each cell that can be reached from the
+    cell index `idx` with a single L-shaped move, in increasing cell index
+    order, so the move generator only has to filter the pairs against the
+    occupied cells.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    Returns
+    -------
+    list<list<(int, (int, int))>>
+        The adjacency list of every cell index on the board.
+    """
+    key = (width, height)
+    if key not in _KNIGHT_NEIGHBORS:
+        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                      (1, -2), (1, 2), (2, -1), (2, 1)]
+        neighbors = []
+        for idx in range(width * height):
+            r, c = idx % height, idx // height
+            neighbors.append(sorted(
+                ((r + dr) + (c + dc) * height, (r + dr, c + dc))
+                for dr, dc in directions
+                if 0 <= r + dr < height and 0 <= c + dc < width))
+        _KNIGHT_NEIGHBORS[key] = neighbors
+    return _KNIGHT_NEIGHBORS[key]
+
+
+def symmetries(width, height):
+    """Return the symmetries of a board with the given dimensions that
+    preserve knight moves: the 8 rotations and reflections of a square board,
+    or the 4 reflections (including the identity and the half turn) of a
+    rectangular board.
+
+    Returns
+    -------
+    list<list<int>>
+        For each symmetry, starting with the identity, the list mapping each
+        cell index to the index of its image.
+    """
+    key = (width, height)
+    if key not in _SYMMETRIES:
+        w, h = width - 1, height - 1
+        maps = [lambda r, c: (r, c), lambda r, c: (r, w - c),
+                lambda r, c: (h - r, c), lambda r, c: (h - r, w - c)]
+        if width == height:
+            maps += [lambda r, c: (c, r), lambda r, c: (c, w - r),
+                     lambda r, c: (w - c, r), lambda r, c: (w - c, w - r)]
+        _SYMMETRIES[key] = [[r + c * height for r, c in
+                             (fn(idx % height, idx // height) for idx in range(width * height))]
+                            for fn in maps]
+    return _SYMMETRIES[key]
+
+
+def symmetry_keys(width, height):
+    """Return the tables used to hash the images of the states of a board
+    with the given dimensions under each of its symmetries, a byte of the
+    bitmask of the occupied cells at a time.
+
+    Returns
+    -------
+    list<SymmetryKeys>
+        The tables of each symmetry, in the order of `symmetries()`.
+    """
+    key = (width, height)
+    if key not in _SYMMETRY_KEYS:
+        keys = zobrist_keys(width, height)
+        num_cells = width * height
+        tables = []
+        for perm in symmetries(width, height):
+            blocked, cells = [], []
+            for start in range(0, num_cells, 8):
+                blocked_table, cells_table = [0] * 256, [0] * 256
+                for byte in range(1, 256):
+                    low = (byte & -byte).bit_length() - 1
+                    rest = byte & (byte - 1)
+                    if start + low < num_cells:
+                        blocked_table[byte] = blocked_table[rest] ^ keys.blocked[perm[start + low]]
+                        cells_table[byte] = cells_table[rest] | 1 << perm[start + low]
+                blocked.append(blocked_table)
+                cells.append(cells_table)
+            tables.append(SymmetryKeys(
+                blocked, cells, tuple([table[idx] for idx in perm] for table in keys.locations)))
+        _SYMMETRY_KEYS[key] = tables
+    return _SYMMETRY_KEYS[key]
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -33,14 +200,26 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    shuffle_moves : bool (optional)
+        If False, `get_legal_moves()` returns the moves in a fixed order
+        instead of shuffling them.
+
+    seed : int (optional)
+        A seed for a random number generator owned by the board (and shared
+        with its copies) that is used to shuffle the legal moves. If None,
+        the moves are shuffled with the global `random` module.
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    def __init__(self, player_1, player_2, width=7, height=7,
+                 shuffle_moves=True, seed=None):
         self.width = width
         self.height = height
         self.move_count = 0
+        self.shuffle_moves = shuffle_moves
+        self._rng = random.Random(seed) if seed is not None else None
         self._player_1 = player_1
         self._player_2 = player_2
         self._active_player = player_1
@@ -52,8 +231,65 @@ class Board(object):
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Records of the moves applied with push_move() that can be undone
+        # with pop_move(); copies of the board start with an empty history
+        self._undo_stack = []
+
+        # Zobrist hash of the current state, updated by every move
+        self._zobrist = zobrist_keys(width, height)
+        self._hash = 0
+
+        self._neighbors = knight_neighbors(width, height)
+
     def hash(self):
-        return str(self._board_state).__hash__()
+        """Return the 64-bit Zobrist hash of the current game state, covering
+        the blocked cells, both player locations and the player to move.
+        """
+        return self._hash
+
+    def canonical(self):
+        """Return the key of the canonical representative of the current
+        state under the symmetries of the board, and the symmetry that maps
+        the current state to it.
+
+        Every state that is equivalent to the current state under a rotation
+        or reflection of the board has the same canonical key, so caches of
+        search results can share one entry between them. The canonical key
+        is the smallest Zobrist hash among the images of the state.
+
+        Returns
+        -------
+        (int, int)
+            The canonical key, and the index of the symmetry in
+            `symmetries(width, height)` to use with `transform_move()`.
+        """
+        _, _, occupied, loc_1, loc_2, move_count = self.encode()
+        occupied_bytes = occupied.to_bytes((self.width * self.height + 7) // 8, "little")
+        side = zobrist_keys(self.width, self.height).side if move_count & 1 else 0
+
+        all_keys = symmetry_keys(self.width, self.height)
+        best_key, best_symmetry = None, 0
+        for symmetry, keys in enumerate(all_keys):
+            h = side
+            for table, byte in zip(keys.blocked, occupied_bytes):
+                h ^= table[byte]
+            for table, loc in zip(keys.locations, (loc_1, loc_2)):
+                if loc is not Board.NOT_MOVED:
+                    h ^= table[loc]
+            if best_key is None or h < best_key:
+                best_key, best_symmetry = h, symmetry
+        return best_key, best_symmetry
+
+    def transform_move(self, move, symmetry, inverse=False):
+        """Return the image of a move under one of the symmetries of the
+        board (see `canonical()`), or its preimage if `inverse` is True.
+        """
+        if move is None or move == (-1, -1):
+            return move
+        perm = symmetries(self.width, self.height)[symmetry]
+        idx = move[0] + move[1] * self.height
+        idx = perm.index(idx) if inverse else perm[idx]
+        return (idx % self.height, idx // self.height)
 
     @property
     def active_player(self):
@@ -92,13 +328,71 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
+        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height,
+                          shuffle_moves=self.shuffle_moves)
+        new_board._rng = self._rng
         new_board.move_count = self.move_count
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._hash = self._hash
         return new_board
 
+    def encode(self):
+        """Return a compact encoding of the current game state that can be
+        sent to another process and turned back into a board with `decode()`.
+
+        Returns
+        -------
+        (int, int, int, int or None, int or None, int)
+            The width and height of the board, a bitmask of the occupied cell
+            indices, the cell indices of player 1 and player 2 (None if the
+            player has not moved) and the number of moves played.
+        """
+        state = self._board_state
+        occupied = 0
+        for idx in range(self.width * self.height):
+            if state[idx] != Board.BLANK:
+                occupied |= 1 << idx
+        return (self.width, self.height, occupied, state[-1], state[-2], self.move_count)
+
+    @classmethod
+    def decode(cls, encoding, player_1, player_2, **kwargs):
+        """Return a board in the state described by an encoding returned by
+        `encode()`, with the given players. Keyword arguments are passed to
+        the board constructor.
+        """
+        width, height, occupied, loc_1, loc_2, move_count = encoding
+        board = cls(player_1, player_2, width=width, height=height, **kwargs)
+        board._set_state(occupied, loc_1, loc_2, move_count)
+        return board
+
+    def _set_state(self, occupied, loc_1, loc_2, move_count):
+        """Replace the state of a new board by the state described by the
+        fields of an encoding.
+        """
+        state = self._board_state
+        for idx in range(self.width * self.height):
+            state[idx] = occupied >> idx & 1
+        state[-1], state[-2], state[-3] = loc_1, loc_2, move_count & 1
+        self.move_count = move_count
+        if move_count & 1:
+            self._active_player, self._inactive_player = self._player_2, self._player_1
+        self._hash = self._state_hash(occupied, (loc_1, loc_2), move_count)
+
+    def _state_hash(self, occupied, locations, move_count):
+        """Compute the Zobrist hash of a state from scratch."""
+        keys = self._zobrist
+        h = keys.side if move_count & 1 else 0
+        for slot, loc in enumerate(locations):
+            if loc is not Board.NOT_MOVED:
+                h ^= keys.locations[slot][loc]
+        while occupied:
+            bit = occupied & -occupied
+            h ^= keys.blocked[bit.bit_length() - 1]
+            occupied ^= bit
+        return h
+
     def forecast_move(self, move):
         """Return a deep copy of the current game with an input move applied to
         advance the game one ply.
@@ -188,7 +482,12 @@ class Board(object):
         """
         if player is None:
             player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+        if player == self._player_1:
+            return self.__get_moves(self._board_state[-1])
+        elif player == self._player_2:
+            return self.__get_moves(self._board_state[-2])
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -201,12 +500,58 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        self._update_hash(last_move_idx - 1, self._board_state[-last_move_idx], idx)
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
+    def push_move(self, move):
+        """Apply a move in-place, like `apply_move()`, and record the
+        information needed to restore the current state with `pop_move()`.
+
+        Searching with push_move()/pop_move() pairs avoids the copy of the
+        board made for every child state by `forecast_move()`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        last_move_idx = int(self.active_player == self._player_2) + 1
+        self._undo_stack.append(self._board_state[-last_move_idx])
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the last move applied with `push_move()`, restoring the board
+        to exactly the state it was in before that move.
+        """
+        if not self._undo_stack:
+            raise RuntimeError("There is no pushed move to undo.")
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        self._board_state[-3] ^= 1
+        last_move_idx = int(self.active_player == self._player_2) + 1
+        idx = self._board_state[-last_move_idx]
+        self._board_state[idx] = Board.BLANK
+        self._board_state[-last_move_idx] = self._undo_stack.pop()
+        self._update_hash(last_move_idx - 1, self._board_state[-last_move_idx], idx)
+
+    def _update_hash(self, slot, from_idx, to_idx):
+        """Toggle the Zobrist hash between the states before and after the
+        player in `slot` (0 for player 1, 1 for player 2) moves from the cell
+        index `from_idx` (None if the player has not moved) to the open cell
+        index `to_idx`. The update is its own inverse.
+        """
+        keys = self._zobrist
+        locations = keys.locations[slot]
+        h = self._hash ^ keys.blocked[to_idx] ^ locations[to_idx] ^ keys.side
+        if from_idx is not Board.NOT_MOVED:
+            h ^= locations[from_idx]
+        self._hash = h
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
         return player == self._inactive_player and not self.get_legal_moves(self._active_player)
@@ -247,19 +592,18 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
+    def __get_moves(self, idx):
         """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
+        knight in chess) from the cell index `idx`.
         """
-        if loc == Board.NOT_MOVED:
+        if idx == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
+        board_state = self._board_state
+        valid_moves = [move for neighbor, move in self._neighbors[idx]
+                       if board_state[neighbor] == Board.BLANK]
+        if self.shuffle_moves:
+            (self._rng or random).shuffle(valid_moves)
         return valid_moves
 
     def print_board(self):
@@ -295,7 +639,8 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, seed=None, move_times=None,
+             enforce=False, grace=TIMEOUT_GRACE_MILLIS, isolate=False, ponder=False):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -305,6 +650,54 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        seed : int (optional)
+            If not None, reseed the random number generator the board uses to
+            shuffle legal moves. Games between players that only draw random
+            numbers through the board (and do not depend on the clock) are
+            then reproducible.
+
+        move_times : list (optional)
+            If not None, the number of milliseconds used by the active player
+            on each turn (including the final turn that ends the game) is
+            appended to this list.
+
+            The time is also recorded in the search statistics of players
+            with a `stats` attribute that is not None after their move (see
+            `game_agent.SearchStats`), whose `time_used` and `time_left`
+            attributes are set after each turn.
+
+        enforce : bool (optional)
+            If True, the players choose their moves in a separate thread, and
+            a player that has not returned `grace` milliseconds after its time
+            limit loses the game by timeout without waiting for its move; a
+            `timer.TurnTimeout` exception is raised in its thread to stop it.
+            Otherwise, the time limit is only checked after the player
+            returns.
+
+        grace : numeric (optional)
+            The number of milliseconds past the time limit after which an
+            enforced turn is interrupted.
+
+        isolate : bool (optional)
+            If True, each player runs in its own worker process for the whole
+            game (see `worker.ProcessPlayer`): the players receive a board
+            rebuilt from `encode()`, a player that overruns its time limit by
+            `grace` milliseconds is terminated (whether or not `enforce` is
+            set), and a player that crashes forfeits the game.
+
+        ponder : bool (optional)
+            If True, the players with `ponder(game)` and `stop_pondering(move)`
+            methods (see `game_agent.AlphaBetaPlayer`) search during the turn
+            of their opponent: `ponder()` receives a copy of the board before
+            each move of the opponent, and `stop_pondering()` the move of the
+            opponent once it is returned (None if it returned no move or the
+            game was aborted). A player pondering in the process of the game
+            shares the CPU with its opponent (the interpreter switches threads
+            every `PONDER_SWITCH_INTERVAL` seconds meanwhile), and players in
+            worker processes share the CPUs of the machine, so leave this off
+            when measuring the strength of agents under equal time limits
+            unless each worker has its own CPU.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -312,31 +705,77 @@ class Board(object):
             move history, and a string indicating the reason for losing
             (e.g., timeout or invalid move).
         """
-        move_history = []
+        if seed is not None:
+            self._rng = random.Random(seed)
 
-        time_millis = lambda: 1000 * timeit.default_timer()
-
-        while True:
-
-            legal_player_moves = self.get_legal_moves()
-            game_copy = self.copy()
-
-            move_start = time_millis()
-            time_left = lambda : time_limit - (time_millis() - move_start)
-            curr_move = self._active_player.get_move(game_copy, time_left)
-            move_end = time_left()
-
-            if curr_move is None:
-                curr_move = Board.NOT_MOVED
-
-            if move_end < 0:
-                return self._inactive_player, move_history, "timeout"
-
-            if curr_move not in legal_player_moves:
-                if len(legal_player_moves) > 0:
-                    return self._inactive_player, move_history, "forfeit"
-                return self._inactive_player, move_history, "illegal move"
-
-            move_history.append(list(curr_move))
-
-            self.apply_move(curr_move)
+        move_history = []
+        workers = {}
+        if isolate:
+            workers = {player: ProcessPlayer(player, grace)
+                       for player in (self._player_1, self._player_2)}
+
+        ponderer = None
+        switch_interval = sys.getswitchinterval()
+        if ponder and not isolate:
+            sys.setswitchinterval(min(switch_interval, PONDER_SWITCH_INTERVAL))
+        try:
+            while True:
+
+                legal_player_moves = self.get_legal_moves()
+                # The worker processes rebuild the board from its encoding
+                worker = workers.get(self._active_player) if workers else None
+                game_copy = self.copy() if worker is None else None
+
+                # The inactive player searches until the active player moves
+                if ponder:
+                    ponderer = workers.get(self._inactive_player, self._inactive_player)
+                    if not hasattr(ponderer, "stop_pondering"):
+                        ponderer = None
+                    elif ponderer is self._inactive_player:
+                        ponderer.ponder(self.copy())
+                    else:
+                        ponderer.ponder(self)
+
+                # The players receive the deadline as their time_left() function
+                time_left = Deadline(time_limit)
+                if worker is not None:
+                    returned, curr_move = True, worker.get_move(self, time_left)
+                elif enforce:
+                    returned, curr_move = call_with_deadline(
+                        self._active_player.get_move, (game_copy, time_left), time_left, grace)
+                else:
+                    returned, curr_move = True, self._active_player.get_move(game_copy, time_left)
+                move_end = time_left()
+                move_time = time_left.elapsed()
+                if ponderer is not None:
+                    ponderer.stop_pondering(curr_move)
+                    ponderer = None
+
+                if move_times is not None:
+                    move_times.append(move_time)
+
+                stats = getattr(self._active_player, "stats", None)
+                if stats is not None:
+                    stats.time_used = move_time
+                    stats.time_left = move_end
+
+                if curr_move is None:
+                    curr_move = Board.NOT_MOVED
+
+                if move_end < 0 or not returned:
+                    return self._inactive_player, move_history, "timeout"
+
+                if curr_move not in legal_player_moves:
+                    if len(legal_player_moves) > 0:
+                        return self._inactive_player, move_history, "forfeit"
+                    return self._inactive_player, move_history, "illegal move"
+
+                move_history.append(list(curr_move))
+
+                self.apply_move(curr_move)
+        finally:
+            if ponderer is not None:
+                ponderer.stop_pondering()
+            sys.setswitchinterval(switch_interval)
+            for worker in workers.values():
+                worker.close()
@@ -0,0 +1,112 @@
+"""
+This file contains the time control of `Board.play()`: the deadline of each
+turn on the `time.perf_counter_ns` clock, which the agents receive as their
+`time_left()` function, and the optional hard enforcement of the time limit
+that interrupts an agent that does not return in time.
+"""
+import ctypes
+import threading
+
+from time import perf_counter_ns
+
+
+class TurnTimeout(BaseException):
+    """Raised in the thread of an agent that ran past its time limit when the
+    time limit is enforced. It derives from BaseException so that the
+    `except Exception` clauses of the agent do not swallow it.
+    """
+    pass
+
+
+class Deadline(object):
+    """The time limit of a turn.
+
+    Calling the deadline returns the number of milliseconds left in the turn,
+    so it can be passed to the agents as their `time_left()` function. Agents
+    that check the time at every node can instead compute the clock value at
+    which they must stop once with `stop_ns()` and compare it to
+    `time.perf_counter_ns()`, which avoids a Python function call per check.
+
+    Parameters
+    ----------
+    time_limit : numeric
+        The number of milliseconds allowed for the turn (may be infinite).
+    """
+    __slots__ = ("start_ns", "end_ns")
+
+    def __init__(self, time_limit):
+        self.start_ns = perf_counter_ns()
+        if time_limit == float("inf"):
+            self.end_ns = time_limit
+        else:
+            self.end_ns = self.start_ns + int(time_limit * 1e6)
+
+    @classmethod
+    def until(cls, end_ns):
+        """Return a deadline starting now and ending at the given
+        `time.perf_counter_ns()` value, e.g., the end of a turn received from
+        another process (the clock is system-wide).
+        """
+        deadline = cls(0)
+        deadline.end_ns = end_ns
+        return deadline
+
+    def __call__(self):
+        return (self.end_ns - perf_counter_ns()) * 1e-6
+
+    def elapsed(self):
+        """Return the number of milliseconds since the start of the turn."""
+        return (perf_counter_ns() - self.start_ns) * 1e-6
+
+    def stop_ns(self, threshold):
+        """Return the `time.perf_counter_ns()` value at which `threshold`
+        milliseconds are left in the turn.
+        """
+        return self.end_ns - int(threshold * 1e6)
+
+
+def interrupt(thread, exc_type=TurnTimeout):
+    """Raise an exception asynchronously in another thread; the exception is
+    raised the next time the thread executes Python bytecode.
+    """
+    count = ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread.ident), ctypes.py_object(exc_type))
+    if count > 1:
+        # Only one thread can have this identifier; undo the request
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread.ident), None)
+        count = 0
+    return count == 1
+
+
+def call_with_deadline(fn, args, deadline, grace):
+    """Call `fn(*args)` in a separate thread and wait for it until `grace`
+    milliseconds after the deadline.
+
+    Returns
+    -------
+    (bool, object)
+        True and the return value of the call if it returned in time, or
+        False and None if it did not, in which case `TurnTimeout` is raised
+        in the thread to stop it. Exceptions raised by the call are raised
+        again in the calling thread.
+    """
+    outcome = []
+
+    def target():
+        try:
+            outcome.append((True, fn(*args)))
+        except TurnTimeout:
+            pass
+        except BaseException as e:
+            outcome.append((False, e))
+
+    thread = threading.Thread(target=target, name="agent", daemon=True)
+    thread.start()
+    thread.join(max(0., deadline() + grace) / 1000.)
+    if not outcome:
+        interrupt(thread)
+        return False, None
+    returned, value = outcome[0]
+    if not returned:
+        raise value
+    return True, value
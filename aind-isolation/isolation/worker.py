@@ -0,0 +1,179 @@
+"""
+This file contains `ProcessPlayer`, a proxy that runs a player in a
+long-lived worker process, so that the memory and CPU use of the player
+cannot affect the timing of its opponent and a crash of the player only
+forfeits its game.
+
+The state of the game is sent to the worker over a pipe in the compact form
+returned by `Board.encode()` along with the end of the turn on the
+system-wide `time.perf_counter_ns` clock, and the worker replies with the
+move and the search statistics of the player (see `game_agent.SearchStats`),
+if it collects them. The requests to start and stop pondering (see
+`isolation.Board.play()`) get no reply.
+"""
+import multiprocessing
+
+from .timer import Deadline
+
+# Name of the opponent on the boards rebuilt by the worker process
+OPPONENT = "Opponent"
+
+
+def rebuild(board_cls, encoding, player, active):
+    """Return the board of an encoded state, with `player` as the active
+    player if `active` is True and as the inactive player otherwise.
+    """
+    if (encoding[5] % 2 == 0) == active:
+        return board_cls.decode(encoding, player, OPPONENT)
+    return board_cls.decode(encoding, OPPONENT, player)
+
+
+def serve(conn, player):
+    """Answer the requests received on `conn` for `player` until the pipe is
+    closed or None is received: ("move", board class, encoding, end of the
+    turn), ("ponder", board class, encoding) and ("stop", move).
+    """
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        command, args = request[0], request[1:]
+        if command == "ponder":
+            player.ponder(rebuild(*args[:2], player, active=False))
+            continue
+        if command == "stop":
+            player.stop_pondering(*args)
+            continue
+        board_cls, encoding, end_ns = args
+        game = rebuild(board_cls, encoding, player, active=True)
+        try:
+            move = player.get_move(game, Deadline.until(end_ns))
+        except Exception as e:
+            conn.send((None, None, "{}: {}".format(type(e).__name__, e)))
+        else:
+            conn.send((move, getattr(player, "stats", None), None))
+    if hasattr(player, "stop_pondering"):
+        player.stop_pondering()
+    conn.close()
+
+
+class ProcessPlayer(object):
+    """Proxy running a player in a worker process.
+
+    The worker is started on the first move (or by calling `start()`) and
+    keeps its copy of the player, and thus any state the player keeps from
+    one move to the next, until `close()` is called.
+
+    A player that has not replied `grace` milliseconds after its time limit
+    is stopped by terminating the worker (a new worker is started for its
+    next move), and a player that raises an exception or whose worker exits
+    returns no move; `error` describes the last failure.
+
+    Parameters
+    ----------
+    player : object
+        The player, which must have a `get_move(game, time_left)` method.
+
+    grace : float (optional)
+        The number of milliseconds past the time limit after which the
+        worker is terminated.
+    """
+
+    def __init__(self, player, grace=50.):
+        self.player = player
+        self.grace = grace
+        self.error = None
+        self._process = None
+        self._conn = None
+
+    def __getstate__(self):
+        # The worker belongs to the process that started it
+        state = self.__dict__.copy()
+        state["_process"] = state["_conn"] = None
+        return state
+
+    def start(self):
+        """Start the worker process."""
+        if self._process is None:
+            self._conn, child_conn = multiprocessing.Pipe()
+            self._process = multiprocessing.Process(
+                target=serve, args=(child_conn, self.player), daemon=True)
+            self._process.start()
+            child_conn.close()
+
+    def close(self, terminate=False):
+        """Stop the worker process, killing it if `terminate` is True."""
+        if self._process is None:
+            return
+        if not terminate:
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(1.)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._conn.close()
+        self._process = self._conn = None
+
+    def get_move(self, game, time_left):
+        """Return the move of the player in the worker process, or None if
+        the player failed to reply in time or at all.
+        """
+        self.start()
+        try:
+            if isinstance(time_left, Deadline):
+                end_ns = time_left.end_ns
+            else:
+                end_ns = Deadline(time_left()).end_ns
+            self._conn.send(("move", type(game), game.encode(), end_ns))
+            timeout = time_left() + self.grace
+            if timeout == float("inf"):
+                timeout = None
+            else:
+                timeout = max(0., timeout) / 1000.
+            if not self._conn.poll(timeout):
+                self.error = "no reply within the time limit"
+                self.close(terminate=True)
+                return None
+            move, stats, error = self._conn.recv()
+        except (EOFError, OSError):
+            self.error = "the worker process exited"
+            self.close(terminate=True)
+            return None
+
+        self.error = error
+        # Mirror the statistics of the move in the player of this process
+        if stats is not None:
+            self.player.stats = stats
+            if getattr(self.player, "move_stats", None) is not None:
+                self.player.move_stats.append(stats)
+        return move
+
+    def ponder(self, game):
+        """Start pondering on the state of `game` in the worker process, if
+        the player can ponder (see `isolation.Board.play()`).
+        """
+        if not hasattr(self.player, "ponder"):
+            return
+        self.start()
+        try:
+            self._conn.send(("ponder", type(game), game.encode()))
+        except OSError:
+            # The next move request finds the worker gone
+            pass
+
+    def stop_pondering(self, move=None):
+        """Stop pondering in the worker process, with the move played by the
+        opponent if any.
+        """
+        if self._process is None or not hasattr(self.player, "stop_pondering"):
+            return
+        try:
+            self._conn.send(("stop", move))
+        except OSError:
+            pass
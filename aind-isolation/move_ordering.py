@@ -0,0 +1,135 @@
+"""This file contains the move ordering heuristics used by `AlphaBetaPlayer`
+to search the most promising moves first, which lets alpha-beta pruning cut
+off more of the game tree at the same depth.
+
+Moves are searched in this order:
+
+    1. the move of the principal variation (PV) found by the previous pass
+       of iterative deepening, in the states of that variation: the root and
+       the first child searched in each of them, while it is the PV move
+    2. the best move stored in the transposition table, if any
+    3. the killer moves of the ply: the last moves that caused a cutoff in
+       another state at the same distance from the root
+    4. every other move, by decreasing history score: the sum over the
+       cutoffs each move caused (in any state, for the same player) of the
+       square of the remaining depth
+"""
+
+
+class MoveOrdering(object):
+    """Principal variation, killer move and history tables of a player.
+
+    The tables are kept across the passes of iterative deepening and, for
+    the history table, across the moves of a game, so each player needs its
+    own instance.
+
+    Parameters
+    ----------
+    num_killers : int (optional)
+        The number of killer moves kept for each ply.
+
+    history_decay : int (optional)
+        The history scores are divided by this factor before the search for
+        each new move, so that recent cutoffs weigh more than old ones.
+    """
+
+    def __init__(self, num_killers=2, history_decay=2):
+        self.num_killers = num_killers
+        self.history_decay = history_decay
+        self.pv = []
+        self.killers = []
+        self.history = [{}, {}]
+        self._lines = []
+        self._follow_pv = False
+        self._pv_ply = 0
+        self._pv_child = False
+
+    def clear(self):
+        """Forget the principal variation, killer moves and history scores."""
+        self.pv = []
+        self.killers = []
+        self.history = [{}, {}]
+
+    def new_search(self):
+        """Prepare the tables for the search of a new move; call once before
+        the first pass of iterative deepening.
+        """
+        self.pv = []
+        self.killers = []
+        for history in self.history:
+            for move in list(history):
+                history[move] //= self.history_decay
+                if not history[move]:
+                    del history[move]
+
+    def start_iteration(self, depth):
+        """Prepare the tables for a search of the root to the given depth."""
+        while len(self.killers) <= depth:
+            self.killers.append([])
+        while len(self._lines) <= depth + 1:
+            self._lines.append([])
+        # The root is the first state of the principal variation
+        self._follow_pv = bool(self.pv)
+        self._pv_ply = 0
+        self._pv_child = False
+
+    def end_iteration(self):
+        """Keep the principal variation of the completed search for the next
+        pass of iterative deepening.
+        """
+        self.pv = self._lines[0]
+
+    def enter(self, ply):
+        """Start the search of a state `ply` moves from the root."""
+        self._lines[ply] = []
+        if self._follow_pv and ply:
+            # Only the first child searched in a state of the principal
+            # variation, reached with the PV move, is in the variation; any
+            # other state means the search has left it for good
+            if ply == self._pv_ply + 1 and self._pv_child:
+                self._pv_ply = ply
+                self._pv_child = False
+            else:
+                self._follow_pv = False
+
+    def order(self, legal_moves, ply, tt_move=None):
+        """Sort the legal moves of a state `ply` moves from the root in the
+        order in which they should be searched.
+        """
+        history = self.history[ply & 1]
+        legal_moves.sort(key=lambda move: history.get(move, 0), reverse=True)
+
+        first_moves = list(self.killers[ply])
+        if tt_move is not None:
+            first_moves.insert(0, tt_move)
+        if self._follow_pv and ply == self._pv_ply:
+            if ply < len(self.pv) and self.pv[ply] in legal_moves:
+                first_moves.insert(0, self.pv[ply])
+                self._pv_child = True
+            else:
+                self._follow_pv = False
+
+        for move in reversed(first_moves):
+            if move in legal_moves:
+                legal_moves.remove(move)
+                legal_moves.insert(0, move)
+        return legal_moves
+
+    def best_move(self, ply, move):
+        """Record `move` as the best move found so far in the state `ply`
+        moves from the root, followed by the variation found below it.
+        """
+        self._lines[ply] = [move] + self._lines[ply + 1]
+
+    def cutoff(self, ply, depth, move):
+        """Record that `move` caused a cutoff in a state `ply` moves from the
+        root searched to the given remaining depth.
+        """
+        killers = self.killers[ply]
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[self.num_killers:]
+
+        history = self.history[ply & 1]
+        history[move] = history.get(move, 0) + depth * depth
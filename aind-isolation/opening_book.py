@@ -0,0 +1,242 @@
+"""This file contains an opening book for the search agents: the best move
+found by a deep offline search for each early-game state, stored in a compact
+binary file and looked up with a binary search before the agents search.
+
+Build a book for the states in which the agents take over from the random
+opening of tournament.py (two plies), e.g.:
+
+    python opening_book.py book.bin --plies 2 3 --depth 8 --workers 4
+
+and give it to an agent:
+
+    player = AlphaBetaPlayer(book=OpeningBook.load("book.bin"))
+
+The book file holds a header (magic, board size, number of entries and
+flags), the sorted 64-bit Zobrist hashes of the states and the cell index of
+the best move of each state, i.e., 9 bytes per state.
+
+A canonical book (the default of `build()`) is keyed on the canonical form of
+the states (see `isolation.Board.canonical()`) and stores its moves in the
+frame of the canonical state, so a single entry covers all the states that
+are equivalent under a rotation or reflection of the board.
+"""
+import argparse
+import struct
+import timeit
+
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
+from isolation import Board
+from game_agent import AlphaBetaPlayer
+from move_ordering import MoveOrdering
+from sample_players import improved_score
+from transposition import TranspositionTable
+
+BOOK_MAGIC = b"ISOBOOK2"
+HEADER = struct.Struct("<8sHHIB")
+
+# Header flags
+CANONICAL = 1
+
+
+class BookStats(object):
+    """Counters describing the use of an opening book."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def hit_rate(self):
+        """The fraction of probes that found a move in the book."""
+        return self.hits / self.probes if self.probes else 0.
+
+    def __repr__(self):
+        return "BookStats(probes={}, hits={}, hit_rate={:.3f})".format(
+            self.probes, self.hits, self.hit_rate)
+
+
+class OpeningBook(object):
+    """An immutable table of the best moves of early-game states.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board of the book.
+
+    height : int
+        The number of rows of the board of the book.
+
+    entries : dict (optional)
+        The book moves, mapping the key of a state to a move.
+
+    canonical : bool (optional)
+        Whether the book is keyed on the canonical form of the states, with
+        the moves in the frame of the canonical state.
+    """
+
+    def __init__(self, width, height, entries=None, canonical=False):
+        self.width = width
+        self.height = height
+        self.canonical = canonical
+        self.stats = BookStats()
+        entries = entries or {}
+        self._keys = array("Q", sorted(entries))
+        self._moves = array("B", [entries[key][0] + entries[key][1] * height
+                                  for key in self._keys])
+
+    def __len__(self):
+        return len(self._keys)
+
+    def key(self, game):
+        """Return the key of the state of a game in the book and the symmetry
+        mapping the moves of the game to the moves of the book.
+        """
+        if self.canonical:
+            return game.canonical()
+        return game.hash(), 0
+
+    def lookup(self, game):
+        """Return the book move of the current state of a game, or None if
+        the state is not in the book.
+        """
+        self.stats.probes += 1
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        key, symmetry = self.key(game)
+        idx = bisect_left(self._keys, key)
+        if idx == len(self._keys) or self._keys[idx] != key:
+            return None
+        cell = self._moves[idx]
+        move = game.transform_move((cell % self.height, cell // self.height),
+                                   symmetry, inverse=True)
+        if not game.move_is_legal(move):
+            return None
+        self.stats.hits += 1
+        return move
+
+    def save(self, path):
+        """Write the book to a file."""
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(BOOK_MAGIC, self.width, self.height, len(self),
+                                CANONICAL if self.canonical else 0))
+            self._keys.tofile(f)
+            self._moves.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """Read a book written by `save()`."""
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size or not header.startswith(BOOK_MAGIC):
+                raise ValueError("{} is not an opening book.".format(path))
+            _, width, height, count, flags = HEADER.unpack(header)
+            book = cls(width, height, canonical=bool(flags & CANONICAL))
+            book._keys.fromfile(f, count)
+            book._moves.fromfile(f, count)
+        return book
+
+
+def early_states(plies, width=7, height=7, canonical=False):
+    """Return the list of the move sequences leading to every distinct state
+    after the given number of plies, one sequence per state (or per class of
+    states equivalent under the symmetries of the board if `canonical` is
+    True).
+    """
+    states = {}
+    game = Board("Player1", "Player2", width=width, height=height, shuffle_moves=False)
+
+    def visit(moves):
+        if len(moves) == plies:
+            key = game.canonical()[0] if canonical else game.hash()
+            states.setdefault(key, list(moves))
+            return
+        for move in game.get_legal_moves():
+            game.push_move(move)
+            moves.append(move)
+            visit(moves)
+            moves.pop()
+            game.pop_move()
+
+    visit([])
+    return list(states.values())
+
+
+def search_state(moves, width, height, depth, score_fn, canonical=False):
+    """Return the book key of the state reached by the moves and the best
+    move found by an iterative deepening alpha-beta search to the given depth
+    (in the frame of the canonical state if `canonical` is True).
+    """
+    player = AlphaBetaPlayer(score_fn=score_fn, tt=TranspositionTable(),
+                             ordering=MoveOrdering())
+    players = (player, "Opponent") if len(moves) % 2 == 0 else ("Opponent", player)
+    game = Board(*players, width=width, height=height, shuffle_moves=False)
+    for move in moves:
+        game.apply_move(move)
+
+    player.time_left = lambda: float("inf")
+    player.ordering.new_search()
+    player.tt.new_search()
+    best_move = None
+    for d in range(1, min(depth, len(game.get_blank_spaces())) + 1):
+        best_move = player.alphabeta(game, d)
+    if not canonical:
+        return game.hash(), best_move
+    key, symmetry = game.canonical()
+    return key, game.transform_move(best_move, symmetry)
+
+
+def build(plies, depth, width=7, height=7, score_fn=improved_score, workers=1,
+          canonical=True):
+    """Search every state after each number of plies in `plies` and return
+    the resulting `OpeningBook`.
+
+    If `canonical` is True, only one state of each class of states that are
+    equivalent under the symmetries of the board is searched; the score
+    function must then be invariant under these symmetries.
+    """
+    states = [moves for ply in plies
+              for moves in early_states(ply, width, height, canonical)]
+    args = [(moves, width, height, depth, score_fn, canonical) for moves in states]
+    if workers == 1:
+        results = [search_state(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as executor:
+            results = list(executor.map(search_state, *zip(*args), chunksize=16))
+    return OpeningBook(width, height, {key: move for key, move in results
+                                       if move not in (None, (-1, -1))},
+                       canonical=canonical)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book.")
+    parser.add_argument("output", help="path of the book file")
+    parser.add_argument("--plies", type=int, nargs="+", default=[2, 3],
+                        help="build the book for the states after these "
+                             "numbers of plies")
+    parser.add_argument("--depth", type=int, default=8,
+                        help="search depth of each state")
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes (0: one per CPU)")
+    parser.add_argument("--no-canonical", dest="canonical", action="store_false",
+                        help="key the book on the raw states instead of their "
+                             "canonical form")
+    args = parser.parse_args()
+
+    start = timeit.default_timer()
+    book = build(args.plies, args.depth, args.width, args.height, workers=args.workers,
+                 canonical=args.canonical)
+    book.save(args.output)
+    print("Wrote {} states to {} in {:.1f}s".format(
+        len(book), args.output, timeit.default_timer() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""This file contains `ParallelAlphaBetaPlayer`, an alpha-beta search agent
+that splits the moves of the root state across a pool of worker processes.
+
+Each worker runs iterative deepening over its share of the root moves until
+a deadline on the system-wide monotonic clock (derived from `time_left()` and
+`TIMER_THRESHOLD` when the move is requested), and reports the best move of
+its share for every depth it completed. The agent returns the best move of
+the deepest search completed by every worker, so the move always comes from a
+search of all root moves to the same depth.
+
+The game state is sent to the workers in the compact form returned by
+`isolation.Board.encode()` and rebuilt as an `isolation.BitBoard`; each
+worker keeps its own search agent (and transposition table and move ordering
+tables, if the player uses them) from one move to the next.
+"""
+import os
+import timeit
+
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from isolation import BitBoard
+from isolation.worker import rebuild
+from game_agent import AlphaBetaPlayer, SearchTimeout, custom_score
+from move_ordering import MoveOrdering
+from transposition import TranspositionTable
+
+# Search agents of the current worker process, keyed by their configuration
+_WORKER_PLAYERS = {}
+
+
+def _worker_player(config):
+    """Return the search agent of the worker process for a configuration."""
+    if config not in _WORKER_PLAYERS:
+        score_fn, use_tt, use_ordering = config
+        _WORKER_PLAYERS[config] = AlphaBetaPlayer(
+            score_fn=score_fn, timeout=0.,
+            tt=TranspositionTable() if use_tt else None,
+            ordering=MoveOrdering() if use_ordering else None)
+    return _WORKER_PLAYERS[config]
+
+
+def _search_root_moves(player, game, moves, depth):
+    """Return the alpha-beta value and the best of the root moves `moves`
+    searched to the given depth.
+    """
+    ordering = player.ordering
+    if ordering is not None:
+        player._root_depth = depth
+        ordering.start_iteration(depth)
+        ordering.enter(0)
+
+    best_value, best_move = float("-inf"), moves[0]
+    for move in moves:
+        game.push_move(move)
+        try:
+            value = player._search(game, depth - 1, best_value, float("inf"), False)[0]
+        finally:
+            game.pop_move()
+        if value > best_value:
+            best_value, best_move = value, move
+            if ordering is not None:
+                ordering.best_move(0, move)
+
+    if ordering is not None:
+        ordering.end_iteration()
+    return best_value, best_move
+
+
+def search_worker(encoding, moves, config, deadline, max_depth):
+    """Run iterative deepening over a share of the root moves of a state in a
+    worker process.
+
+    Parameters
+    ----------
+    encoding : tuple
+        The state to search, as returned by `isolation.Board.encode()`.
+
+    moves : list<(int, int)>
+        The root moves to search.
+
+    config : (callable, bool, bool)
+        The score function of the agent and whether it uses a transposition
+        table and move ordering.
+
+    deadline : float
+        The `timeit.default_timer()` time at which the search is aborted.
+
+    max_depth : int
+        The maximum search depth.
+
+    Returns
+    -------
+    (list<(float, (int, int))>, int)
+        The value and the best move of the share for each completed depth
+        (starting from depth 1), and the number of nodes searched.
+    """
+    player = _worker_player(config)
+    # The opponent must be an object of its own for `get_opponent()`
+    game = rebuild(BitBoard, encoding, player, active=True)
+    player.time_left = lambda: 1000. * (deadline - timeit.default_timer())
+    if player.tt is not None:
+        player.tt.new_search()
+        player._tt_start(game)
+    if player.ordering is not None:
+        player.ordering.new_search()
+
+    nodes_start = player.nodes_searched
+    results = []
+    try:
+        for depth in range(1, max_depth + 1):
+            results.append(_search_root_moves(player, game, moves, depth))
+    except SearchTimeout:
+        pass
+    return results, player.nodes_searched - nodes_start
+
+
+def _noop():
+    """Task used to start the worker processes of the pool."""
+    return os.getpid()
+
+
+class ParallelAlphaBetaPlayer(AlphaBetaPlayer):
+    """Game-playing agent that chooses a move using iterative deepening
+    alpha-beta search, with the root moves split across a pool of worker
+    processes.
+
+    The pool is started on the first move (or by calling `start()` before
+    the game, which is recommended since starting processes takes longer
+    than a typical turn) and should be stopped with `close()`.
+
+    Parameters
+    ----------
+    workers : int (optional)
+        The number of worker processes; 0 to use one per available CPU.
+
+    ipc_margin : float (optional)
+        Time (in milliseconds) reserved for sending the results of the
+        workers back to the agent; the workers stop searching this long
+        before the agent's own timeout threshold.
+
+    The other parameters are the same as for `AlphaBetaPlayer`; the score
+    function must be a module-level function so that it can be sent to the
+    workers. The `tt` and `ordering` objects of the agent itself are not used;
+    if given, each worker uses a table of its own.
+    """
+
+    def __init__(self, workers=0, ipc_margin=5., search_depth=3, score_fn=custom_score,
+                 timeout=10., tt=None, instrument=False, ordering=None):
+        super().__init__(search_depth=search_depth, score_fn=score_fn, timeout=timeout,
+                         tt=tt, instrument=instrument, ordering=ordering)
+        if not workers:
+            workers = (len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity")
+                       else os.cpu_count() or 1)
+        self.workers = workers
+        self.ipc_margin = ipc_margin
+        self._executor = None
+
+    def __getstate__(self):
+        # The process pool cannot be sent to another process; a copy of the
+        # agent starts its own pool
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        return state
+
+    def start(self):
+        """Start the worker processes."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            for future in [self._executor.submit(_noop) for _ in range(self.workers)]:
+                future.result()
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.time_left = time_left
+        self._stats_start()
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            self._stats_end(timed_out=False)
+            return (-1, -1)
+        best_move = legal_moves[0]
+        self.start()
+
+        budget = time_left() - self.TIMER_THRESHOLD - self.ipc_margin
+        deadline = timeit.default_timer() + budget / 1000.
+        config = (self.score, self.tt is not None, self.ordering is not None)
+        shares = [legal_moves[i::self.workers] for i in range(self.workers)]
+        futures = [self._executor.submit(search_worker, game.encode(), share, config,
+                                         deadline, len(game.get_blank_spaces()))
+                   for share in shares if share]
+
+        done, _ = wait(futures, timeout=max(0., time_left() - self.TIMER_THRESHOLD) / 1000.)
+        depth = 0
+        if len(done) == len(futures):
+            results = [future.result() for future in futures]
+            depth = min(len(share_results) for share_results, _ in results)
+            if depth:
+                _, best_move = max((share_results[depth - 1] for share_results, _ in results),
+                                   key=lambda result: result[0])
+            self.nodes_searched += sum(nodes for _, nodes in results)
+
+        if self.stats is not None:
+            self.stats.depth = depth
+        self._stats_end(timed_out=depth < len(game.get_blank_spaces()))
+        return best_move
@@ -0,0 +1,87 @@
+"""This file contains the append-only log of finished games written by
+tournament.py. Each line of the log is a JSON record of one game, so the log
+can be read back to resume an interrupted tournament or to analyse the games
+offline, e.g.:
+
+    from results import load_results
+    games = load_results("results.jsonl")
+"""
+import json
+import os
+import threading
+
+
+def load_results(path):
+    """Return the list of game records stored in a results log, ignoring a
+    truncated last line left by an interrupted run.
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return records
+
+
+class ResultsLog(object):
+    """Append-only JSONL log of the games of a tournament.
+
+    Each record holds:
+
+        key         -- the identifier of the game within the tournament
+        agents      -- the names of the agents in seat order (player 1 first)
+        opening     -- the opening moves applied before the agents took over
+        seed        -- the seed of the game's random numbers
+        winner      -- the name of the winning agent
+        winner_seat -- 0 if player 1 won, 1 if player 2 won
+        termination -- the reason the game ended (e.g., "forfeit")
+        history     -- the moves played by the agents, from `Board.play`
+        move_times  -- the milliseconds used by the active agent on each turn
+
+    Parameters
+    ----------
+    path : str
+        The path of the log file.
+
+    resume : bool (optional)
+        If True, load the records already in the log so that their games can
+        be skipped; otherwise the log must not exist yet.
+    """
+
+    def __init__(self, path, resume=False):
+        if not resume and os.path.exists(path) and os.path.getsize(path):
+            raise RuntimeError(("Results file {} already exists; use --resume " +
+                                "to continue the tournament it records.").format(path))
+        self.path = path
+        self.records = {}
+        if resume and os.path.exists(path):
+            self.records = {record["key"]: record for record in load_results(path)}
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+
+        # start on a new line if an interrupted run left a partial record
+        if self._file.tell():
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    def write(self, record):
+        """Append a game record to the log and flush it to disk."""
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.records[record["key"]] = record
+
+    def close(self):
+        self._file.close()
+
@@ -165,10 +165,15 @@ class RandomPlayer():
 class GreedyPlayer():
     """Player that chooses next move to maximize heuristic score. This is
     equivalent to a minimax search agent with a search depth of one.
+
+    If `batch_score_fn` is given (e.g., `batch_scores.batch_open_move_score`),
+    the successors of the current state are scored together with it instead
+    of one at a time with `score_fn`.
     """
 
-    def __init__(self, score_fn=open_move_score):
+    def __init__(self, score_fn=open_move_score, batch_score_fn=None):
         self.score = score_fn
+        self.batch_score = batch_score_fn
 
     def get_move(self, game, time_left):
         """Select the move from the available legal moves with the highest
@@ -195,7 +200,15 @@ class GreedyPlayer():
         legal_moves = game.get_legal_moves()
         if not legal_moves:
             return (-1, -1)
-        _, move = max([(self.score(game.forecast_move(m), self), m) for m in legal_moves])
+        if self.batch_score is not None:
+            scored_moves = list(zip(self.batch_score(game, legal_moves, self), legal_moves))
+        else:
+            scored_moves = []
+            for m in legal_moves:
+                game.push_move(m)
+                scored_moves.append((self.score(game, self), m))
+                game.pop_move()
+        _, move = max(scored_moves)
         return move
 
 
@@ -0,0 +1,127 @@
+"""This file contains the statistics used by tournament.py to stop a pairing
+between two agents as soon as the games played so far decide which agent is
+stronger: a sequential probability ratio test (SPRT) on the win rate, and an
+Elo difference estimate with its confidence interval.
+
+Isolation games cannot be drawn, so each game is a Bernoulli trial whose
+success probability (the win rate of the test agent) is related to the Elo
+difference between the agents by the logistic model
+
+    win_rate = 1 / (1 + 10 ** (-elo / 400))
+"""
+import math
+
+
+def win_rate_from_elo(elo):
+    """Return the expected win rate of an agent `elo` points stronger than
+    its opponent.
+    """
+    return 1. / (1. + 10 ** (-elo / 400.))
+
+
+def elo_from_win_rate(win_rate):
+    """Return the Elo difference corresponding to a win rate; +/-inf for a
+    win rate of 1 or 0.
+    """
+    if win_rate <= 0.:
+        return float("-inf")
+    if win_rate >= 1.:
+        return float("inf")
+    return -400. * math.log10(1. / win_rate - 1.)
+
+
+def normal_quantile(p):
+    """Return the quantile function of the standard normal distribution,
+    computed by bisection on math.erf.
+    """
+    lo, hi = -10., 10.
+    for _ in range(100):
+        mid = (lo + hi) / 2.
+        if 0.5 * (1. + math.erf(mid / math.sqrt(2.))) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2.
+
+
+def elo_interval(wins, losses, confidence=0.95):
+    """Estimate the Elo difference between two agents from the results of
+    their games.
+
+    Parameters
+    ----------
+    wins : int
+        The number of games won by the test agent.
+
+    losses : int
+        The number of games lost by the test agent.
+
+    confidence : float (optional)
+        The confidence level of the interval.
+
+    Returns
+    -------
+    (float, float, float)
+        The estimated Elo difference and the lower and upper bounds of its
+        confidence interval, computed from the Wilson score interval of the
+        win rate.
+    """
+    games = wins + losses
+    if not games:
+        return 0., float("-inf"), float("inf")
+    z = normal_quantile(0.5 + confidence / 2.)
+    p = wins / games
+    center = (p + z * z / (2 * games)) / (1 + z * z / games)
+    margin = (z * math.sqrt(p * (1 - p) / games + z * z / (4 * games * games)) /
+              (1 + z * z / games))
+    return (elo_from_win_rate(p), elo_from_win_rate(center - margin),
+            elo_from_win_rate(center + margin))
+
+
+class SPRT(object):
+    """Sequential probability ratio test of the hypothesis H1 that the test
+    agent is `elo1` points stronger than its opponent against the hypothesis
+    H0 that it is only `elo0` points stronger.
+
+    Parameters
+    ----------
+    elo0 : float (optional)
+        The Elo difference under the null hypothesis.
+
+    elo1 : float (optional)
+        The Elo difference under the alternative hypothesis.
+
+    alpha : float (optional)
+        The probability of accepting H1 when H0 is true.
+
+    beta : float (optional)
+        The probability of accepting H0 when H1 is true.
+    """
+    H0 = "H0"
+    H1 = "H1"
+
+    def __init__(self, elo0=0., elo1=100., alpha=0.05, beta=0.05):
+        if elo0 >= elo1:
+            raise ValueError("elo0 must be lower than elo1.")
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+        p0, p1 = win_rate_from_elo(elo0), win_rate_from_elo(elo1)
+        self._win_llr = math.log(p1 / p0)
+        self._loss_llr = math.log((1. - p1) / (1. - p0))
+
+    def llr(self, wins, losses):
+        """Return the log-likelihood ratio of H1 to H0 given the results."""
+        return wins * self._win_llr + losses * self._loss_llr
+
+    def status(self, wins, losses):
+        """Return SPRT.H1 or SPRT.H0 if the results accept that hypothesis,
+        or None if more games are needed to reach a verdict.
+        """
+        llr = self.llr(wins, losses)
+        if llr >= self.upper:
+            return SPRT.H1
+        if llr <= self.lower:
+            return SPRT.H0
+        return None
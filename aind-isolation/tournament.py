@@ -11,20 +11,33 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
 import itertools
+import multiprocessing
+import os
 import random
+import timeit
 import warnings
 
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 from isolation import Board
+from results import ResultsLog
+from sprt import SPRT, elo_interval
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
-from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
-                        custom_score_2, custom_score_3)
+from game_agent import (IsolationPlayer, MinimaxPlayer, AlphaBetaPlayer, MCTSPlayer,
+                        custom_score, custom_score_2, custom_score_3)
+from transposition import TranspositionTable
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+SPRT_MAX_GAMES = 400  # maximum number of games of a pairing in SPRT mode
+
+# Upper edges (in milliseconds) of the bins of the histogram of the time left
+# on the clock when the instrumented agents return their moves
+MARGIN_BINS = [0, 5, 10, 20, 50]
 
 DESCRIPTION = """
 This script evaluates the performance of the custom_score evaluation
@@ -36,31 +49,250 @@ game_agent.py.
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# A game of the tournament: the two players and their names, the two opening
+# moves applied before the players take over, the seed of the game's random
+# numbers and a key identifying the game in the results log
+Game = namedtuple("Game", ["player_1", "player_2", "names", "opening", "seed", "key"])
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
-    """Compare the test agents to the cpu agent in "fair" matches.
 
-    "Fair" matches use random starting locations and force the agents to
-    play as both first and second player to control for advantages resulting
-    from choosing better opening moves or having first initiative to move.
+class SerialExecutor(object):
+    """Stand-in for a process pool that plays each game in the current
+    process when its result is first requested.
+    """
+
+    class LazyResult(object):
+
+        def __init__(self, fn, args):
+            self._call = (fn, args)
+            self._callbacks = []
+
+        def add_done_callback(self, fn):
+            self._callbacks.append(fn)
+
+        def exception(self):
+            return None
+
+        def result(self):
+            if self._call is not None:
+                fn, args = self._call
+                self._value, self._call = fn(*args), None
+                for callback in self._callbacks:
+                    callback(self)
+            return self._value
+
+    def submit(self, fn, *args):
+        return SerialExecutor.LazyResult(fn, args)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def _pin_worker(counter, cpus):
+    """Process pool initializer that pins each worker to its own CPU so that
+    the workers do not compete for cores and distort each other's timing.
+    """
+    with counter.get_lock():
+        idx = counter.value
+        counter.value += 1
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpus[idx % len(cpus)]})
+
+
+def available_cpus():
+    """Return the list of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def make_executor(workers):
+    """Return an executor that plays the tournament games: the games are
+    played in the current process if `workers` is 1, or shared across a pool
+    of `workers` processes (one per available CPU if `workers` is 0).
+    """
+    cpus = available_cpus()
+    if workers == 0:
+        workers = len(cpus)
+    if workers == 1:
+        return SerialExecutor()
+    if workers > len(cpus):
+        warnings.warn(("{} workers share {} CPUs; agents will lose search time " +
+                       "to each other and may time out.").format(workers, len(cpus)))
+    return ProcessPoolExecutor(max_workers=workers, initializer=_pin_worker,
+                               initargs=(multiprocessing.Value("i", 0), cpus))
+
+
+class RecordedResult(object):
+    """The result of a game read back from the results log."""
+
+    def __init__(self, record):
+        self._value = (record["winner_seat"], record["termination"],
+                       record["history"], record["move_times"],
+                       record.get("search_stats", [None, None]))
+
+    def result(self):
+        return self._value
+
+
+def play_game(game, time_limit, enforce=False, isolate=False, ponder=False):
+    """Play a game of the tournament and return the index of the winner (0 for
+    player 1, 1 for player 2), the reason the game ended, the move history,
+    the time used by the active player on each turn and the search statistics
+    of each player's moves (None for players that are not instrumented).
+
+    The global random number generator is seeded from the game so that
+    players drawing from it (e.g., RandomPlayer) play the same way in every
+    process. If `enforce` is True, a player that overruns its time limit is
+    interrupted, if `isolate` is True, each player runs in its own worker
+    process, and if `ponder` is True, the players that can ponder search
+    during the turn of their opponent (see `isolation.Board.play()`).
+    """
+    random.seed(game.seed)
+    players = (game.player_1, game.player_2)
+    for player in players:
+        if getattr(player, "move_stats", None) is not None:
+            player.move_stats = []
+    board = Board(game.player_1, game.player_2, seed=game.seed)
+    for move in game.opening:
+        board.apply_move(move)
+    move_times = []
+    winner, history, termination = board.play(time_limit=time_limit,
+                                              move_times=move_times, enforce=enforce,
+                                              isolate=isolate, ponder=ponder)
+    search_stats = [None if getattr(player, "move_stats", None) is None
+                    else [stats.as_dict() for stats in player.move_stats]
+                    for player in players]
+    return int(winner == game.player_2), termination, history, move_times, search_stats
+
+
+def game_record(game, result):
+    """Return the results log record of a finished game."""
+    seat, termination, history, move_times, search_stats = result
+    record = {"key": game.key, "agents": list(game.names),
+              "opening": [list(move) for move in game.opening], "seed": game.seed,
+              "winner": game.names[seat], "winner_seat": seat,
+              "termination": termination, "history": history,
+              "move_times": [round(t, 3) for t in move_times]}
+    if any(stats is not None for stats in search_stats):
+        record["search_stats"] = search_stats
+    return record
+
+
+class SearchSummary(object):
+    """Aggregate the search statistics of the instrumented agents over the
+    games of a tournament.
     """
-    timeout_count = 0
-    forfeit_count = 0
-    for _ in range(num_matches):
 
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
+    def __init__(self):
+        self.moves = defaultdict(list)
+
+    def add(self, game, result):
+        """Add the statistics of both players of a finished game."""
+        for name, stats in zip(game.names, result[4]):
+            if stats:
+                self.moves[name].extend(stats)
+
+    def report(self):
+        """Print the nodes per second (rollouts per second for the MCTS
+        agent), the average depth of the completed searches, the fraction of
+        searches aborted by the timer and the histogram of the time left on
+        the clock of every agent.
+        """
+        if not self.moves:
+            return
+        edges = ["<{}".format(edge) for edge in MARGIN_BINS]
+        edges.append(">={}".format(MARGIN_BINS[-1]))
+        print("\n{:^13}{:>7}{:>11}{:>7}{:>9}   Time left (ms): {}".format(
+            "Agent", "Moves", "Nodes/sec", "Depth", "Aborted",
+            "".join("{:>7}".format(edge) for edge in edges)))
+        for name, moves in sorted(self.moves.items()):
+            timed = [m for m in moves if m["time_used"] is not None]
+            seconds = sum(m["time_used"] for m in timed) / 1000.
+            nodes = sum(m["nodes"] for m in timed)
+            histogram = [0] * len(edges)
+            for m in timed:
+                histogram[sum(m["time_left"] >= edge for edge in MARGIN_BINS)] += 1
+            print("{:^13}{:>7}{:>11.0f}{:>7.2f}{:>9.1%}   {:>16}{}".format(
+                name, len(moves), nodes / seconds if seconds else 0.,
+                sum(m["depth"] for m in moves) / len(moves),
+                sum(m["timed_out"] for m in moves) / len(moves), "",
+                "".join("{:>7.1%}".format(count / max(len(timed), 1))
+                        for count in histogram)))
+
+
+def schedule_round(cpu_agent, test_agents, num_matches, first_match=0, mode="round",
+                   rng=random):
+    """Return the games of the "fair" matches between the test agents and the
+    cpu agent, as a list with the list of games of each match.
+
+    The games are keyed by the mode, the agents, the index of the match
+    (counting from `first_match`) and the seat of the test agent. The
+    openings and the seeds of the games are drawn from `rng`, which should
+    not be the global generator that `play_game` reseeds for every game.
+    """
+    matches = []
+    for match in range(first_match, first_match + num_matches):
 
         # initialize all games with a random move and response
-        for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
+        opening = rng.sample(Board(None, None).get_blank_spaces(), 2)
+
+        # each game draws its random numbers from a generator seeded from
+        # `rng`, so seeding `rng` reproduces the whole tournament
+        games = []
+        for agent in test_agents:
+            key = "/".join([mode, cpu_agent.name, agent.name, str(match)])
+            games.append(Game(cpu_agent.player, agent.player, (cpu_agent.name, agent.name),
+                              opening, rng.getrandbits(32), key + "/2"))
+            games.append(Game(agent.player, cpu_agent.player, (agent.name, cpu_agent.name),
+                              opening, rng.getrandbits(32), key + "/1"))
+        matches.append(games)
+    return matches
+
+
+def submit_round(matches, executor, results_log=None, enforce=False, isolate=False,
+                 ponder=False):
+    """Submit the games of a round to the executor and return the list of
+    pending results of each match.
+
+    Games already recorded in the results log are not played again; the
+    result of every other game is added to the log as soon as it finishes.
+    """
+    def log_game(game):
+        def callback(future):
+            if future.exception() is None:
+                results_log.write(game_record(game, future.result()))
+        return callback
+
+    pending = []
+    for games in matches:
+        pending.append([])
+        for game in games:
+            if results_log is not None and game.key in results_log:
+                result = RecordedResult(results_log[game.key])
+            else:
+                result = executor.submit(play_game, game, TIME_LIMIT, enforce, isolate,
+                                         ponder)
+                if results_log is not None:
+                    result.add_done_callback(log_game(game))
+            pending[-1].append(result)
+    return pending
+
+
+def tally_round(matches, results, test_agents, win_counts, summary=None):
+    """Add the winners of the games of a round to `win_counts` (and their
+    search statistics to `summary`, if any) and return the number of matches
+    that ended with a timeout or a forfeit.
+    """
+    timeout_count = 0
+    forfeit_count = 0
+    for games, game_results in zip(matches, results):
 
         # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
+        for game, result in zip(games, game_results):
+            seat, termination = result.result()[:2]
+            if summary is not None:
+                summary.add(game, result.result())
+            winner = (game.player_1, game.player_2)[seat]
             win_counts[winner] += 1
 
         if termination == "timeout":
@@ -77,12 +309,30 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
+def play_matches(cpu_agents, test_agents, num_matches, executor=None, results_log=None,
+                 summary=None, enforce=False, isolate=False, ponder=False, rng=None):
+    """Play matches between the test agent and each cpu_agent individually.
+
+    "Fair" matches use random starting locations and force the agents to
+    play as both first and second player to control for advantages resulting
+    from choosing better opening moves or having first initiative to move.
+
+    All games are scheduled (and submitted to the executor, if any) before
+    the results of the first round are tallied, so a process pool can play
+    games of every round at the same time. The games are drawn from `rng`
+    (a `random.Random` instance, unseeded if None).
+    """
+    executor = executor or SerialExecutor()
+    rng = rng or random.Random()
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
     total_matches = 2 * num_matches * len(cpu_agents)
+    start = timeit.default_timer()
+
+    rounds = [schedule_round(agent, test_agents, num_matches, rng=rng) for agent in cpu_agents]
+    results = [submit_round(matches, executor, results_log, enforce, isolate, ponder)
+               for matches in rounds]
 
     print("\n{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}".format(
         "Match #", "Opponent", test_agents[0].name, test_agents[1].name,
@@ -99,7 +349,7 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = tally_round(rounds[idx], results[idx], test_agents, wins, summary)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -115,6 +365,7 @@ def play_matches(cpu_agents, test_agents, num_matches):
         *["{:.1f}%".format(100 * total_wins[a.player] / total_matches)
           for a in test_agents]
     ))
+    print("{:^9}{:^13}{:.1f}s".format("", "Wall time:", timeit.default_timer() - start))
 
     if total_timeouts:
         print(("\nThere were {} timeouts during the tournament -- make sure " +
@@ -126,8 +377,114 @@ def play_matches(cpu_agents, test_agents, num_matches):
                "legal moves available to play.\n").format(total_forfeits))
 
 
+def play_sprt(cpu_agents, test_agents, test, max_games, executor=None, batch_size=1,
+              results_log=None, summary=None, enforce=False, isolate=False,
+              ponder=False, rng=None):
+    """Play each test agent against each cpu agent until a sequential
+    probability ratio test decides whether the test agent is stronger, or
+    until `max_games` games have been played.
+
+    The games are played in "fair" pairs (both agents play from the same
+    opening in both seats), `batch_size` pairs at a time. The games are drawn
+    from `rng` (a `random.Random` instance, unseeded if None), so the same
+    seed schedules the same games whether they are played in this process or
+    on a process pool.
+    """
+    executor = executor or SerialExecutor()
+    rng = rng or random.Random()
+    start = timeit.default_timer()
+    verdicts = {SPRT.H1: "stronger", SPRT.H0: "not stronger", None: "undecided"}
+
+    print(("\nSPRT: H1 = at least {:+.0f} Elo, H0 = at most {:+.0f} Elo, " +
+           "up to {} games per pairing").format(test.elo1, test.elo0, max_games))
+    print("\n{:^13}{:^13}{:^7}{:^9}{:^8}{:^17}{:^14}".format(
+        "Agent", "Opponent", "Games", "Won-Lost", "Elo", "95% CI", "Verdict"))
+
+    for test_agent in test_agents:
+        for cpu_agent in cpu_agents:
+            wins, losses, verdict = 0, 0, None
+            while verdict is None and wins + losses < max_games:
+                pairs = schedule_round(cpu_agent, [test_agent], batch_size,
+                                       first_match=(wins + losses) // 2, mode="sprt",
+                                       rng=rng)
+                pending = submit_round(pairs, executor, results_log, enforce, isolate,
+                                       ponder)
+                for games, game_results in zip(pairs, pending):
+                    for game, result in zip(games, game_results):
+                        seat = result.result()[0]
+                        if summary is not None:
+                            summary.add(game, result.result())
+                        if (game.player_1, game.player_2)[seat] == test_agent.player:
+                            wins += 1
+                        else:
+                            losses += 1
+                verdict = test.status(wins, losses)
+
+            elo, low, high = elo_interval(wins, losses)
+            print("{:^13}{:^13}{:^7}{:^9}{:^+8.0f}{:^17}{:^14}".format(
+                test_agent.name, cpu_agent.name, wins + losses,
+                "{}-{}".format(wins, losses), elo,
+                "[{:+.0f}, {:+.0f}]".format(low, high), verdicts[verdict]),
+                flush=True)
+
+    print("-" * 81)
+    print("{:^26}{:.1f}s".format("Wall time:", timeit.default_timer() - start))
+
+
 def main():
 
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed the opening moves and the move order of "
+                             "every game to reproduce a tournament")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="play the games on a pool of N processes, each "
+                             "pinned to its own CPU (0: one per CPU)")
+    parser.add_argument("--sprt", action="store_true",
+                        help="stop each pairing as soon as a sequential "
+                             "probability ratio test reaches a verdict, and "
+                             "report Elo differences instead of win rates")
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="Elo difference of the SPRT null hypothesis")
+    parser.add_argument("--elo1", type=float, default=100.,
+                        help="Elo difference of the SPRT alternative hypothesis")
+    parser.add_argument("--max-games", type=int, default=SPRT_MAX_GAMES,
+                        help="maximum number of games of a pairing in SPRT mode")
+    parser.add_argument("--results", metavar="FILE",
+                        help="append a JSON record of every finished game to FILE")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip the games already recorded in the --results "
+                             "file and reuse their results")
+    parser.add_argument("--stats", action="store_true",
+                        help="collect the search statistics of every move and "
+                             "report the nodes per second, search depth and "
+                             "timeout margin of each agent")
+    parser.add_argument("--enforce", action="store_true",
+                        help="interrupt the agents that overrun the time limit "
+                             "instead of waiting for their moves")
+    parser.add_argument("--isolate", action="store_true",
+                        help="run each agent in its own worker process during "
+                             "its games, so that agents cannot affect each "
+                             "other's timing and a crash only forfeits a game")
+    parser.add_argument("--ponder", action="store_true",
+                        help="give the test agents a transposition table and "
+                             "let them search during the turn of their "
+                             "opponent (pondering shares the CPU with the "
+                             "opponent unless each --isolate worker has its "
+                             "own CPU, so it is off by default)")
+    parser.add_argument("--mcts", action="store_true",
+                        help="add a Monte Carlo tree search agent to the "
+                             "opponents of the test agents")
+    parser.add_argument("--exploration", type=float, default=MCTSPlayer().exploration,
+                        help="exploration constant of the --mcts agent")
+    args = parser.parse_args()
+    if args.resume and not args.results:
+        parser.error("--resume requires --results")
+
+    # The games are scheduled from a generator of their own, since playing a
+    # game in this process reseeds the global one
+    rng = random.Random(args.seed)
+
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
     test_agents = [
@@ -147,12 +504,48 @@ def main():
         Agent(AlphaBetaPlayer(score_fn=center_score), "AB_Center"),
         Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
     ]
+    if args.ponder:
+        # Pondering hands its results to the next search through the table
+        for agent in test_agents:
+            agent.player.tt = TranspositionTable()
+    if args.mcts:
+        cpu_agents.append(Agent(MCTSPlayer(exploration=args.exploration), "MCTS"))
+
+    summary = None
+    if args.stats:
+        summary = SearchSummary()
+        for agent in test_agents + cpu_agents:
+            if isinstance(agent.player, IsolationPlayer):
+                agent.player.move_stats = []
 
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    results_log = None
+    if args.results:
+        results_log = ResultsLog(args.results, resume=args.resume)
+        if results_log.records:
+            print("Resuming: {} games already recorded in {}".format(
+                len(results_log.records), args.results))
+
+    executor = make_executor(args.workers)
+    try:
+        if args.sprt:
+            play_sprt(cpu_agents, test_agents, SPRT(args.elo0, args.elo1),
+                      args.max_games, executor,
+                      batch_size=args.workers or len(available_cpus()),
+                      results_log=results_log, summary=summary, enforce=args.enforce,
+                      isolate=args.isolate, ponder=args.ponder, rng=rng)
+        else:
+            play_matches(cpu_agents, test_agents, NUM_MATCHES, executor, results_log,
+                         summary, args.enforce, args.isolate, args.ponder, rng)
+        if summary is not None:
+            summary.report()
+    finally:
+        executor.shutdown()
+        if results_log is not None:
+            results_log.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""This file contains a bounded-memory transposition table that the search
+agents in `game_agent.py` can use to reuse the results of previous searches
+of a game state reached through a different sequence of moves, or searched
+during an earlier pass of iterative deepening.
+"""
+from collections import namedtuple
+
+# Bound types of a stored score: the exact value of the state, a lower bound
+# (the search failed high) or an upper bound (the search failed low)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Approximate memory used by one table entry (the slot in the table, the
+# entry tuple, its 64-bit key, score and move objects)
+ENTRY_BYTES = 200
+
+# Key mixed into the hash of a state when the searching agent is player 2;
+# the stored scores are from the point of view of the searching agent, so
+# the same state must not share entries between the two seats
+SEAT_KEY = 0x5EA7C0DE5EA7C0DE
+
+Entry = namedtuple("Entry", ["key", "depth", "score", "bound", "move", "age"])
+
+
+class TTStats(object):
+    """Counters describing the use of a transposition table."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+        self.rejections = 0
+
+    @property
+    def hit_rate(self):
+        """The fraction of probes that found an entry for the state."""
+        return self.hits / self.probes if self.probes else 0.
+
+    def __repr__(self):
+        return ("TTStats(probes={}, hits={}, hit_rate={:.3f}, stores={}, "
+                "replacements={}, rejections={})").format(
+                    self.probes, self.hits, self.hit_rate, self.stores,
+                    self.replacements, self.rejections)
+
+
+class TranspositionTable(object):
+    """A hash table of search results with a fixed memory budget.
+
+    The table is split into buckets of `bucket_size` slots, and a state is
+    always stored in the bucket selected by the low bits of its hash. When
+    the bucket is full, the replacement scheme decides which entry is
+    overwritten:
+
+        "depth"  -- depth-preferred: the shallowest entry of the bucket is
+                    replaced, but only by a search at least as deep (entries
+                    left from the search of a previous move are always
+                    replaceable)
+        "always" -- always-replace: the new entry goes to the front of the
+                    bucket and the oldest entry is dropped
+
+    Parameters
+    ----------
+    max_bytes : int (optional)
+        The approximate memory budget of the table in bytes.
+
+    replacement : str (optional)
+        The replacement scheme, "depth" or "always".
+
+    bucket_size : int (optional)
+        The number of entries in each bucket.
+    """
+    REPLACEMENT_SCHEMES = ("depth", "always")
+
+    def __init__(self, max_bytes=16 * 2**20, replacement="depth", bucket_size=2):
+        if replacement not in self.REPLACEMENT_SCHEMES:
+            raise ValueError("Unknown replacement scheme: {}".format(replacement))
+        if bucket_size < 1 or max_bytes < ENTRY_BYTES * bucket_size:
+            raise ValueError("The table must hold at least one bucket.")
+
+        # Use a power of two number of buckets so that the bucket of a key
+        # can be found with a mask
+        num_buckets = 1
+        while 2 * num_buckets * bucket_size * ENTRY_BYTES <= max_bytes:
+            num_buckets *= 2
+
+        self.replacement = replacement
+        self.bucket_size = bucket_size
+        self.num_entries = num_buckets * bucket_size
+        self.stats = TTStats()
+        self._mask = num_buckets - 1
+        self._age = 0
+        self._slots = [None] * self.num_entries
+
+    def __len__(self):
+        return sum(entry is not None for entry in self._slots)
+
+    def clear(self):
+        """Remove every entry from the table and reset the statistics."""
+        self._slots = [None] * self.num_entries
+        self._age = 0
+        self.stats.reset()
+
+    def new_search(self):
+        """Mark the entries currently in the table as left from a previous
+        search; call once before searching for each new move.
+        """
+        self._age += 1
+
+    def lookup(self, key):
+        """Return the `Entry` stored for the state with the given hash, or
+        None if the table holds no entry for it.
+        """
+        self.stats.probes += 1
+        start = (key & self._mask) * self.bucket_size
+        for entry in self._slots[start:start + self.bucket_size]:
+            if entry is not None and entry.key == key:
+                self.stats.hits += 1
+                return entry
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """Record the result of searching the state with the given hash.
+
+        Parameters
+        ----------
+        key : int
+            The 64-bit hash of the state.
+
+        depth : int
+            The remaining search depth of the result.
+
+        score : float
+            The score of the state found by the search.
+
+        bound : int
+            One of EXACT, LOWER or UPPER.
+
+        move : (int, int)
+            The best move found for the state, or (-1, -1) if none.
+        """
+        slots = self._slots
+        start = (key & self._mask) * self.bucket_size
+        end = start + self.bucket_size
+        new_entry = Entry(key, depth, score, bound, move, self._age)
+
+        if self.replacement == "always":
+            for idx in range(start, end):
+                if slots[idx] is not None and slots[idx].key == key:
+                    break
+            else:
+                idx = end - 1
+                if slots[idx] is not None:
+                    self.stats.replacements += 1
+            slots[start + 1:idx + 1] = slots[start:idx]
+            slots[start] = new_entry
+            self.stats.stores += 1
+            return
+
+        # Depth-preferred: update the entry of the same state, fill an empty
+        # slot, or replace the stale or shallowest entry of the bucket
+        victim = None
+        for idx in range(start, end):
+            entry = slots[idx]
+            if entry is None or entry.key == key:
+                victim = idx
+                break
+            if victim is None or self._priority(entry) < self._priority(slots[victim]):
+                victim = idx
+
+        entry = slots[victim]
+        if entry is not None:
+            if entry.age == self._age and entry.depth > depth:
+                self.stats.rejections += 1
+                return
+            if entry.key != key:
+                self.stats.replacements += 1
+        slots[victim] = new_entry
+        self.stats.stores += 1
+
+    def _priority(self, entry):
+        """Order the entries of a bucket by how much they are worth keeping:
+        entries of the current search first, then by depth.
+        """
+        return (entry.age == self._age, entry.depth)
@@ -0,0 +1,132 @@
+"""
+Solve many Sudoku grids across a pool of worker processes.
+
+The grids are sent to the workers in chunks, and at most a few chunks per worker are in flight
+at any time, so inputs of any size are solved in bounded memory. The results come back in the
+order of the input. From the command line, one grid per line is read from a file (or stdin)
+and one line per grid is written out:
+
+    python batch.py puzzles.txt --workers 4 > solutions.txt
+
+Each output line is the solved grid, or 'FAILED: <reason>' if the grid has no solution or is
+not a valid grid. Empty boxes may be written as '.' or '0'.
+"""
+import argparse
+import os
+import sys
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import solution
+from constants import EMPTY
+
+# Number of grids sent to a worker at a time.
+CHUNK_SIZE = 64
+
+# Number of chunks queued per worker ahead of the results being read.
+CHUNKS_PER_WORKER = 2
+
+def solve_grid(grid):
+    """
+    Solve a single grid, turning failures into results.
+    Args:
+        grid(string): a string representing a sudoku grid.
+    Returns:
+        (string, string) The solved grid and None, or None and the reason why the grid was not solved.
+    """
+
+    try:
+        values = solution.solve(grid)
+    except Exception as e:
+        return None, '{}: {}'.format(type(e).__name__, e)
+    if not values:
+        return None, 'no solution'
+    return ''.join(values[box] for box in solution.boxes), None
+
+def solve_chunk(chunk):
+    """
+    Solve a chunk of grids in a worker process.
+    Args:
+        chunk(list): a list of (index, grid) pairs.
+    Returns:
+        A list of (index, solution, error) tuples (see `solve_grid`).
+    """
+
+    return [(index,) + solve_grid(grid) for index, grid in chunk]
+
+def chunks(iterable, size):
+    """ Split an iterable into lists of `size` items (the last one may be shorter). """
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+def solve_batch(grids, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Solve grids across a process pool.
+    Args:
+        grids(iterable): the grids in string form; read lazily, so it can be a file.
+        workers(int): the number of worker processes, one per CPU if None; the grids are solved
+            in this process if it is 1.
+        chunk_size(int): the number of grids sent to a worker at a time.
+    Returns:
+        An iterator over the (index, solution, error) tuples of the grids, in input order. The
+        solution is the solved grid in string form, or None if the grid was not solved, in which
+        case error describes why.
+    """
+
+    indexed_chunks = chunks(enumerate(grids), chunk_size)
+    if workers == 1:
+        for chunk in indexed_chunks:
+            for result in solve_chunk(chunk):
+                yield result
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        max_pending = CHUNKS_PER_WORKER * workers
+        pending = deque()
+        for chunk in indexed_chunks:
+            pending.append(executor.submit(solve_chunk, chunk))
+            if len(pending) >= max_pending:
+                for result in pending.popleft().result():
+                    yield result
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+
+def read_grids(lines):
+    """ Return the grids of the non-empty lines, with '0' accepted for empty boxes. """
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield line.replace('0', EMPTY)
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve one Sudoku grid per line.')
+    parser.add_argument('input', nargs='?', default='-',
+                        help='file of grids, one per line (default: stdin)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='number of grids sent to a worker at a time')
+    args = parser.parse_args()
+
+    failed = 0
+    lines = sys.stdin if args.input == '-' else open(args.input)
+    try:
+        for index, grid, error in solve_batch(read_grids(lines), args.workers, args.chunk_size):
+            if grid is None:
+                failed += 1
+                grid = 'FAILED: ' + error
+            sys.stdout.write(grid + '\n')
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Measure the performance of the diagonal Sudoku solver.
+
+Each benchmark is available as a subcommand, e.g.:
+
+    python benchmark.py solve --puzzles 200 --clues 24
+
+The puzzles are generated from a solved diagonal Sudoku by relabeling its
+digits, applying a symmetry that maps the diagonals onto themselves and
+removing all but `--clues` boxes, so the same seed always gives the same
+corpus. Puzzles with fewer clues need more search.
+"""
+import argparse
+import random
+import timeit
+import tracemalloc
+
+import batch
+import solution
+from constants import ALL_DIGITS, EMPTY
+
+# A solved diagonal Sudoku, the source of the generated puzzles.
+SOLVED_GRID = ('267945381853716249491823576576438192384192657129657438'
+               '642379815935281764718564923')
+
+def transpose(grid):
+    """ Reflect a grid along its main diagonal. """
+    return ''.join(grid[c * 9 + r] for r in range(9) for c in range(9))
+
+def random_puzzles(count, clues, seed=None):
+    """
+    Generate puzzles from `SOLVED_GRID`.
+    Args:
+        count(int): the number of puzzles.
+        clues(int): the number of boxes given in each puzzle.
+        seed(int): the seed of the random number generator.
+    Returns:
+        A list of grids in string form.
+    """
+    rng = random.Random(seed)
+    puzzles = []
+    for _ in range(count):
+        digits = list(ALL_DIGITS)
+        rng.shuffle(digits)
+        grid = SOLVED_GRID.translate(str.maketrans(ALL_DIGITS, ''.join(digits)))
+        if rng.random() < 0.5:
+            grid = transpose(grid)
+        if rng.random() < 0.5:
+            # A half turn maps each diagonal onto itself
+            grid = grid[::-1]
+        given = set(rng.sample(range(81), clues))
+        puzzles.append(''.join(grid[i] if i in given else EMPTY for i in range(81)))
+    return puzzles
+
+def is_solution(values, grid):
+    """ Return True if `values` solves the puzzle `grid`. """
+    if not values:
+        return False
+    if any(grid[i] != EMPTY and values[box] != grid[i] for i, box in enumerate(solution.boxes)):
+        return False
+    return all(sorted(values[box] for box in unit) == list(ALL_DIGITS)
+               for unit in solution.units_all)
+
+def bench_solve(args):
+    """ Report the number of puzzles solved per second. """
+    puzzles = random_puzzles(args.puzzles, args.clues, args.seed)
+    start = timeit.default_timer()
+    results = []
+    for grid in puzzles:
+        results.append(solution.solve(grid))
+    elapsed = timeit.default_timer() - start
+    solved = sum(is_solution(values, grid) for values, grid in zip(results, puzzles))
+    print('{} puzzles with {} clues: {} solved in {:.3f}s, {:.1f} puzzles/sec'.format(
+        len(puzzles), args.clues, solved, elapsed, len(puzzles) / elapsed))
+
+def bench_batch(args):
+    """ Report the puzzles solved per second by `batch.solve_batch` with each number of workers. """
+    puzzles = random_puzzles(args.puzzles, args.clues, args.seed)
+    print('{:>8}{:>10}{:>16}'.format('Workers', 'Seconds', 'Puzzles/sec'))
+    for workers in args.workers:
+        start = timeit.default_timer()
+        solved = sum(grid is not None for _, grid, _ in
+                     batch.solve_batch(puzzles, workers, args.chunk_size))
+        elapsed = timeit.default_timer() - start
+        assert solved == len(puzzles)
+        print('{:>8}{:>10.3f}{:>16.1f}'.format(workers, elapsed, len(puzzles) / elapsed))
+
+def bench_trace(args):
+    """
+    Report the time, the peak memory and the number of records of solving puzzles with the trace
+    mode off and on. The records of each puzzle are kept until the next one starts, as the
+    visualization would need them; the memory is measured in a second pass, since tracing the
+    allocations slows the solver down.
+    """
+    puzzles = random_puzzles(args.puzzles, args.clues, args.seed)
+    print('{:<7}{:>10}{:>14}{:>16}{:>16}'.format(
+        'Trace', 'Seconds', 'Puzzles/sec', 'Peak MiB', 'Records/puzzle'))
+    for trace in (False, True):
+        context = solution.SolverContext(trace)
+        records = 0
+        start = timeit.default_timer()
+        for grid in puzzles:
+            context.solve(grid)
+            records += len(context.assignments)
+        elapsed = timeit.default_timer() - start
+
+        peak = 0
+        for grid in puzzles:
+            tracemalloc.start()
+            context.solve(grid)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        print('{:<7}{:>10.3f}{:>14.1f}{:>16.2f}{:>16.1f}'.format(
+            'on' if trace else 'off', elapsed, len(puzzles) / elapsed, peak / 2**20,
+            records / len(puzzles)))
+
+def bench_sequence(args):
+    """
+    Solve a long sequence of puzzles with `solution.solve` and report the time per puzzle of each
+    block of puzzles, which stays flat if no state builds up from one solve to the next.
+    """
+    puzzles = random_puzzles(args.puzzles, args.clues, args.seed)
+    print('{:>8}{:>10}{:>14}{:>16}'.format('Block', 'Puzzles', 'Seconds', 'ms/puzzle'))
+    for block, first in enumerate(range(0, len(puzzles), args.block_size)):
+        grids = puzzles[first:first + args.block_size]
+        start = timeit.default_timer()
+        for grid in grids:
+            assert solution.solve(grid)
+        elapsed = timeit.default_timer() - start
+        print('{:>8}{:>10}{:>14.3f}{:>16.3f}'.format(block, len(grids), elapsed, 1000 * elapsed / len(grids)))
+
+def bench_propagate(args):
+    """
+    Report the time per puzzle of the constraint propagation of `solution.reduce_puzzle` on the
+    puzzles as given, and of the full search of `solution.solve`, which propagates again in every
+    branch. The default corpus of 17-clue puzzles needs a lot of search.
+    """
+    puzzles = random_puzzles(args.puzzles, args.clues, args.seed)
+    values = [solution.grid_values(grid) for grid in puzzles]
+    start = timeit.default_timer()
+    for puzzle in values:
+        solution.reduce_puzzle(dict(puzzle))
+    reduce_elapsed = timeit.default_timer() - start
+    start = timeit.default_timer()
+    for grid in puzzles:
+        solution.solve(grid)
+    solve_elapsed = timeit.default_timer() - start
+    print('{} puzzles with {} clues: reduce_puzzle {:.3f} ms/puzzle, solve {:.3f} ms/puzzle'.format(
+        len(puzzles), args.clues, 1000 * reduce_elapsed / len(puzzles), 1000 * solve_elapsed / len(puzzles)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark')
+    subparsers.required = True
+
+    solve_parser = subparsers.add_parser('solve', help='puzzles solved per second')
+    solve_parser.add_argument('--puzzles', type=int, default=200)
+    solve_parser.add_argument('--clues', type=int, default=24)
+    solve_parser.add_argument('--seed', type=int, default=0)
+    solve_parser.set_defaults(run=bench_solve)
+
+    batch_parser = subparsers.add_parser('batch', help='puzzles solved per second by a process pool')
+    batch_parser.add_argument('--puzzles', type=int, default=1000)
+    batch_parser.add_argument('--clues', type=int, default=24)
+    batch_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    batch_parser.add_argument('--chunk-size', type=int, default=batch.CHUNK_SIZE)
+    batch_parser.add_argument('--seed', type=int, default=0)
+    batch_parser.set_defaults(run=bench_batch)
+
+    trace_parser = subparsers.add_parser('trace', help='time and memory of the trace mode')
+    trace_parser.add_argument('--puzzles', type=int, default=100)
+    trace_parser.add_argument('--clues', type=int, default=17)
+    trace_parser.add_argument('--seed', type=int, default=0)
+    trace_parser.set_defaults(run=bench_trace)
+
+    sequence_parser = subparsers.add_parser('sequence', help='time per puzzle over a long run')
+    sequence_parser.add_argument('--puzzles', type=int, default=10000)
+    sequence_parser.add_argument('--block-size', type=int, default=1000)
+    sequence_parser.add_argument('--clues', type=int, default=24)
+    sequence_parser.add_argument('--seed', type=int, default=0)
+    sequence_parser.set_defaults(run=bench_sequence)
+
+    propagate_parser = subparsers.add_parser('propagate', help='time per puzzle of the propagation')
+    propagate_parser.add_argument('--puzzles', type=int, default=200)
+    propagate_parser.add_argument('--clues', type=int, default=17)
+    propagate_parser.add_argument('--seed', type=int, default=0)
+    propagate_parser.set_defaults(run=bench_propagate)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
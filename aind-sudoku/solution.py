@@ -1,6 +1,7 @@
 """
 Constants used by the project are listed here.
 """
+from collections import deque
 
 # Empty boxes are represented using this symbol.
 EMPTY = '.'
@@ -16,12 +17,6 @@ ROWS_SQUARE = ['ABC', 'DEF', 'GHI']
 COLUMNS = '123456789'
 COLUMNS_SQUARE = ['123', '456', '789']
 
-# This list holds the board values used in visualization.
-assignments = []
-
-# This holds the naked twin pairs that have been processed.
-processed_naked_twins = []
-
 def cross(A, B):
     """ Cross product of elements in A and elements in B. """
     return [a + b for a in A for b in B]
@@ -36,6 +31,324 @@ units_all = units_rows + units_columns + units_diagonal + units_square
 units = dict((k, [v for v in units_all if k in v]) for k in boxes)
 peers = dict((k, set(sum(units[k], [])) - set([k])) for k in boxes)
 
+# The same structures for the candidate masks of the bitmask core, which use box indices.
+digit_masks = dict((digit, 1 << i) for i, digit in enumerate(ALL_DIGITS))
+digit_bits = [digit_masks[digit] for digit in ALL_DIGITS]
+all_digits_mask = sum(digit_bits)
+mask_digits = [''.join(digit for digit in ALL_DIGITS if mask & digit_masks[digit]) for mask in range(all_digits_mask + 1)]
+mask_sizes = [len(digits) for digits in mask_digits]
+digits_mask = dict((digits, mask) for mask, digits in enumerate(mask_digits))
+box_indices = dict((box, i) for i, box in enumerate(boxes))
+unit_indices = [[box_indices[box] for box in unit] for unit in units_all]
+peer_indices = [set(box_indices[peer] for peer in peers[box]) for box in boxes]
+box_units = [[i for i, unit in enumerate(unit_indices) if box in unit] for box in range(len(boxes))]
+
+class SolverContext(object):
+    """
+    The state of a solve: the assignments recorded in trace mode. The functions of this module use
+    `default_context`; threads that solve puzzles at the same time need a context each.
+    Args:
+        trace(bool): record the changes made to the boards in `assignments`, for the visualization.
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        # This list holds the changes of the last solve, as (box, old value, new value) tuples.
+        self.assignments = []
+
+    def eliminate(self, values):
+        """Context form of `eliminate`."""
+
+        return update_values(values, self.eliminate_masks(values_masks(values)))
+
+    def only_choice(self, values):
+        """Context form of `only_choice`."""
+
+        return update_values(values, self.only_choice_masks(values_masks(values)))
+
+    def naked_twins(self, values):
+        """Context form of `naked_twins`."""
+
+        return update_values(values, self.naked_twins_masks(values_masks(values)))
+
+    def single_possibility(self, values):
+        """Context form of `single_possibility`."""
+
+        return update_values(values, self.single_possibility_masks(values_masks(values)))
+
+    def reduce_puzzle(self, values):
+        """Context form of `reduce_puzzle`."""
+
+        masks = self.reduce_masks(values_masks(values))
+        if masks is False:
+            return False
+        return update_values(values, masks)
+
+    def search(self, values):
+        """Context form of `search`."""
+
+        masks = self.search_masks(values_masks(values))
+        if not masks:
+            # No solution exists.
+            return masks
+        return masks_values(masks)
+
+    def solve(self, grid):
+        """Context form of `solve`; the assignments of the previous solve are discarded."""
+
+        del self.assignments[:]
+        return self.search(grid_values(grid))
+
+    def assign_value(self, values, box, value):
+        """Context form of `assign_value`."""
+
+        # Don't waste memory appending actions that don't actually change any values
+        if values[box] == value:
+            return values
+
+        if self.trace and len(value) == 1:
+            # Record the change in trace mode when we assign a single value to a box.
+            self.assignments.append((box, values[box], value))
+        values[box] = value
+        return values
+
+    def undo_assignments(self, start):
+        """
+        Record the changes that restore the boxes changed since the record `start` of the
+        assignments to their earlier values, e.g., when search abandons a branch.
+        """
+
+        first_values = {}
+        last_values = {}
+        for box, old_value, new_value in self.assignments[start:]:
+            first_values.setdefault(box, old_value)
+            last_values[box] = new_value
+        self.assignments.extend((box, last_values[box], first_values[box]) for box in first_values
+                                if first_values[box] != last_values[box])
+
+    # Bitmask core: the strategies run on a list of 81 candidate masks, one per box in the order
+    # of `boxes`, where bit d - 1 is set if the digit d is still possible in the box. The units
+    # and peers are lists of box indices.
+
+    def assign_mask(self, masks, box, mask):
+        """
+        Mask form of `assign_value`: set the candidates of the box with index `box` and record the
+        change in trace mode when the box becomes solved.
+        """
+
+        if masks[box] == mask:
+            return masks
+
+        if self.trace and mask_sizes[mask] == 1:
+            self.assignments.append((boxes[box], mask_digits[masks[box]], mask_digits[mask]))
+        masks[box] = mask
+        return masks
+
+    def eliminate_masks(self, masks):
+        """Mask form of `eliminate`."""
+
+        assign_mask = self.assign_mask
+        for unit in unit_indices:
+            # Collect the digits of the solved boxes, and the digits solved twice in the unit.
+            solved_digits = repeated_digits = 0
+            for box in unit:
+                if mask_sizes[masks[box]] == 1:
+                    repeated_digits |= solved_digits & masks[box]
+                    solved_digits |= masks[box]
+            for box in unit:
+                mask = masks[box]
+                # A solved box only loses its digit to another box solved with the same digit.
+                if mask_sizes[mask] > 1 or mask & repeated_digits:
+                    if mask & solved_digits:
+                        assign_mask(masks, box, mask & ~solved_digits)
+        return masks
+
+    def only_choice_masks(self, masks):
+        """Mask form of `only_choice`."""
+
+        for unit in unit_indices:
+            # Find the digits possible in exactly one box of the unit, leaving out the solved boxes.
+            seen_once = seen_twice = solved_digits = 0
+            for box in unit:
+                mask = masks[box]
+                seen_twice |= seen_once & mask
+                seen_once |= mask
+                if mask_sizes[mask] == 1:
+                    solved_digits |= mask
+            only_choices = seen_once & ~seen_twice & ~solved_digits
+            while only_choices:
+                digit = only_choices & -only_choices
+                only_choices ^= digit
+                # The box may have lost the digit to an earlier choice in this unit.
+                for box in unit:
+                    if masks[box] & digit:
+                        self.assign_mask(masks, box, digit)
+                        break
+        return masks
+
+    def naked_twins_masks(self, masks):
+        """Mask form of `naked_twins`."""
+
+        for unit in unit_indices:
+            for pair in set([masks[box] for box in unit if mask_sizes[masks[box]] == 2]):
+                naked_twins_candidate = tuple([box for box in unit if masks[box] == pair])
+                if len(naked_twins_candidate) != 2:
+                    continue
+                first_twin, second_twin = naked_twins_candidate
+                for affected_peer in peer_indices[first_twin] & peer_indices[second_twin]:
+                    if mask_sizes[masks[affected_peer]] > 1:
+                        self.assign_mask(masks, affected_peer, masks[affected_peer] & ~pair)
+        return masks
+
+    def single_possibility_masks(self, masks):
+        """Mask form of `single_possibility`."""
+
+        for unit in unit_indices:
+            unsolved_boxes = [box for box in unit if mask_sizes[masks[box]] > 1]
+            if len(unsolved_boxes) == 1:
+                # The other boxes of the unit hold at most one digit each.
+                remaining = all_digits_mask
+                for box in unit:
+                    if box != unsolved_boxes[0]:
+                        remaining &= ~masks[box]
+                # No digit left is a contradiction, caught by reduce_masks.
+                self.assign_mask(masks, unsolved_boxes[0], remaining & -remaining)
+        return masks
+
+    def reduce_masks(self, masks):
+        """Mask form of `reduce_puzzle`."""
+
+        return self.propagate_masks(masks, range(len(masks)))
+
+    def propagate_masks(self, masks, changed):
+        """
+        Apply the strategies of `reduce_masks` until they stop changing the masks, starting from the
+        boxes whose candidates changed since the masks were last reduced. Instead of sweeping every
+        unit, a queue holds the boxes changed since they were last visited, and another one the
+        units that hold such boxes, so only their peers and units are looked at again.
+        Args:
+            masks(list): a list of 81 candidate masks, changed in place.
+            changed(iterable): the indices of the boxes to start from; all of them if the masks
+                were never reduced.
+        Returns:
+            The reduced masks, or False as soon as a box has no candidate left or a digit has no
+            box left in a unit.
+        """
+
+        assign_mask = self.assign_mask
+        box_queue = deque(changed)
+        queued_boxes = [False] * len(masks)
+        unit_queue = deque()
+        queued_units = [False] * len(unit_indices)
+        for box in box_queue:
+            queued_boxes[box] = True
+
+        def update(box, mask):
+            # Narrow the candidates of a box and queue it and its units.
+            assign_mask(masks, box, mask)
+            if not queued_boxes[box]:
+                queued_boxes[box] = True
+                box_queue.append(box)
+
+        while box_queue or unit_queue:
+            while box_queue:
+                box = box_queue.popleft()
+                queued_boxes[box] = False
+                for unit in box_units[box]:
+                    if not queued_units[unit]:
+                        queued_units[unit] = True
+                        unit_queue.append(unit)
+                mask = masks[box]
+                if mask == 0:
+                    return False
+                if mask_sizes[mask] == 1:
+                    # Eliminate: the digit of a solved box is not a candidate of its peers.
+                    for peer in peer_indices[box]:
+                        if masks[peer] & mask:
+                            if masks[peer] == mask:
+                                return False
+                            update(peer, masks[peer] & ~mask)
+                elif mask_sizes[mask] == 2:
+                    # Naked twins: the pair of digits is not a candidate of the peers of both boxes.
+                    for unit in box_units[box]:
+                        for twin in unit_indices[unit]:
+                            if twin != box and masks[twin] == mask:
+                                for peer in peer_indices[box] & peer_indices[twin]:
+                                    if masks[peer] & mask:
+                                        update(peer, masks[peer] & ~mask)
+                                        if masks[peer] == 0:
+                                            return False
+
+            # Only choice: a digit possible in a single box of a unit is the digit of the box. This
+            # also covers the single possibility strategy, once the solved boxes are eliminated.
+            unit = unit_queue.popleft()
+            queued_units[unit] = False
+            seen_once = seen_twice = 0
+            for box in unit_indices[unit]:
+                seen_twice |= seen_once & masks[box]
+                seen_once |= masks[box]
+            if seen_once != all_digits_mask:
+                return False
+            only_choices = seen_once & ~seen_twice
+            for box in unit_indices[unit]:
+                digit = masks[box] & only_choices
+                if digit and masks[box] != digit:
+                    if mask_sizes[digit] > 1:
+                        # The box is the only choice of two digits.
+                        return False
+                    update(box, digit)
+
+        return masks
+
+    def search_masks(self, masks, changed=None):
+        """
+        Mask form of `search`; each branch works on a copy of the masks, which only propagates from
+        the box it assigns.
+        Args:
+            masks(list): a list of 81 candidate masks.
+            changed(list): the indices of the boxes changed since the masks were reduced, if they were.
+        """
+
+        if changed is None:
+            masks = self.reduce_masks(masks)
+        else:
+            masks = self.propagate_masks(masks, changed)
+
+        if masks is False:
+            return False
+
+        if all(mask_sizes[mask] == 1 for mask in masks):
+            return masks
+
+        # Choose one of the unfilled boxes with the fewest possibilities (the first one on ties).
+        n, chosen_box = min((mask_sizes[mask], box) for box, mask in enumerate(masks) if mask_sizes[mask] > 1)
+
+        for digit in digit_bits:
+            if masks[chosen_box] & digit:
+                branch_start = len(self.assignments)
+                candidate_solution = self.search_masks(self.assign_mask(masks[:], chosen_box, digit), [chosen_box])
+                if candidate_solution:
+                    return candidate_solution
+                if self.trace:
+                    self.undo_assignments(branch_start)
+
+# The per-solve state of the functions of this module.
+default_context = SolverContext()
+
+# The changes recorded by the default context in trace mode, for the visualization.
+assignments = default_context.assignments
+
+# The bitmask core of the default context.
+assign_mask = default_context.assign_mask
+undo_assignments = default_context.undo_assignments
+eliminate_masks = default_context.eliminate_masks
+only_choice_masks = default_context.only_choice_masks
+naked_twins_masks = default_context.naked_twins_masks
+single_possibility_masks = default_context.single_possibility_masks
+reduce_masks = default_context.reduce_masks
+propagate_masks = default_context.propagate_masks
+search_masks = default_context.search_masks
+
 def eliminate(values):
     """Eliminate values using the elimination strategy.
     Args:
@@ -45,13 +358,7 @@ def eliminate(values):
         the values dictionary with the solved boxes/values eliminated from peers.
     """
 
-    # Iterate through the list of all solved boxes, i.e., boxes that have a single digit.
-    for unit in units_all:
-        for solved_box in [solved_box for solved_box in unit if len(values[solved_box]) == 1]:
-            # Eliminate the solved value from the other boxes in the same unit.
-            for unsolved_box in [box for box in unit if box is not solved_box and values[solved_box] in values[box]]:
-                values = assign_value(values, unsolved_box, values[unsolved_box].replace(values[solved_box], ''))
-    return values
+    return default_context.eliminate(values)
 
 def only_choice(values):
     """Eliminate values using the only choice strategy.
@@ -62,15 +369,7 @@ def only_choice(values):
         the values dictionary with the only digit choice set for specific boxes.
     """
 
-    for unit in units_all:
-        for digit in ALL_DIGITS:
-            # Find the list of boxes in a unit that can take on a specific value.
-            box_choices = [box for box in unit if digit in values[box]]
-            # If there is only one box that can take on this specific value,
-            if len(box_choices) == 1:
-                # then, assign this specific value to that box.
-                values = assign_value(values, box_choices[0], digit)
-    return values
+    return default_context.only_choice(values)
 
 def naked_twins(values):
     """Eliminate values using the naked twins strategy.
@@ -81,24 +380,7 @@ def naked_twins(values):
         the values dictionary with the naked twins eliminated from peers.
     """
 
-    global processed_naked_twins
-
-    for unit in units_all:
-        # Find all boxes with two-digit possibilities in a unit.
-        for value in set([values[box] for box in unit if len(values[box]) == 2]):
-            # If there are exactly two boxes that have the same two-digit possibilities (naked twins),
-            naked_twins_candidate = set([box for box in unit if values[box] == value])
-            if len(naked_twins_candidate) == 2 and naked_twins_candidate not in processed_naked_twins:
-                # then, we have found a pair of naked twins in a unit.
-                processed_naked_twins.append(naked_twins_candidate)
-                # Eliminate the naked twins as possibilities for their common peers.
-                digits_to_eliminate = set(value)
-                for affected_peer in set.intersection(*[peers[naked_twin] for naked_twin in naked_twins_candidate]):
-                    # Eliminate the naked twin digit pair from the possible values for each common peer.
-                    if len(values[affected_peer]) > 1:
-                        affected_peer_new_value = ''.join(sorted([digit for digit in set(values[affected_peer]) - digits_to_eliminate]))
-                        values = assign_value(values, affected_peer, affected_peer_new_value)
-    return values
+    return default_context.naked_twins(values)
 
 def single_possibility(values):
     """Eliminate values using the single possibility strategy.
@@ -109,67 +391,23 @@ def single_possibility(values):
         the values dictionary with the single possible value set for units with eight solved boxes.
     """
 
-    # Iterate through the list of all units, checking to see if there is only one unsolved box in that unit.
-    for unit in units_all:
-        unsolved_boxes = [box for box in unit if len(values[box]) > 1]
-        if len(unsolved_boxes) == 1:
-            # There is only one unsolved box in this unit.
-            # Set the value of this box to the only remaining value.
-            value = set(ALL_DIGITS) - set([values[box] for box in unit if box is not unsolved_boxes[0]])
-            values = assign_value(values, unsolved_boxes[0], list(value)[0])
-    return values
+    return default_context.single_possibility(values)
 
 def reduce_puzzle(values):
-    stalled = False
-    while not stalled:
-        # Initial state - check how many boxes have a determined value.
-        solved_values_before = len([box for box in boxes if len(values[box]) == 1])
-
-        # Run predefined strategies to reduce the puzzle.
-        values = eliminate(values)
-        values = only_choice(values)
-        values = naked_twins(values)
-        values = single_possibility(values)
-
-        # Check how many boxes have a determined value, to compare with the initial state.
-        solved_values_after = len([box for box in boxes if len(values[box]) == 1])
-
-        # If no new values were added, stop the loop.
-        stalled = solved_values_before == solved_values_after
+    """Apply the strategies until they stop changing the candidates.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
 
-        # Sanity check: return False if there is a box with zero available values:
-        if len([box for box in boxes if len(values[box]) == 0]):
-            return False
+    Returns:
+        the reduced values dictionary, or False if a box has no possible value left.
+    """
 
-    return values
+    return default_context.reduce_puzzle(values)
 
 def search(values):
     """Using depth-first search and propagation, create a search tree and solve the sudoku."""
 
-    # First, reduce the puzzle using the previous function.
-    values = reduce_puzzle(values)
-
-    if values == False:
-        # We have box with zero possible values.
-        return False
-
-    if all(len(values[box]) == 1 for box in boxes):
-        # The puzzle has been completely solved.
-        return values
-
-    # Choose one of the unfilled squares with the fewest possibilities.
-    n, chosen_box = min((len(values[chosen_box]), chosen_box) for chosen_box in boxes if len(values[chosen_box]) > 1)
-
-    # Iterate through the possibilities to find a viable solution.
-    for digit in values[chosen_box]:
-        # Check that no other peer has been assigned this value
-
-        # Make a copy of the puzzle, set the value of the chosen box to one of the possible values, and search for a solution.
-        candidate_solution = values.copy()
-        candidate_solution = assign_value(candidate_solution, chosen_box, digit)
-        candidate_solution = search(candidate_solution)
-        if candidate_solution:
-            return candidate_solution
+    return default_context.search(values)
 
 def solve(grid):
     """
@@ -181,8 +419,47 @@ def solve(grid):
         The dictionary representation of the final sudoku grid. False if no solution exists.
     """
 
-    # Convert the grid to a dictionary and search for a solution.
-    return search(grid_values(grid))
+    return default_context.solve(grid)
+
+def values_masks(values):
+    """
+    Convert the dictionary form of a puzzle to its candidate masks.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
+    Returns:
+        A list of 81 candidate masks.
+    """
+
+    return [digits_mask[value] if value in digits_mask else
+            sum(digit_masks[digit] for digit in set(value)) for value in map(values.__getitem__, boxes)]
+
+def masks_values(masks):
+    """
+    Convert candidate masks to the dictionary form of a puzzle.
+    Args:
+        masks(list): a list of 81 candidate masks
+    Returns:
+        A dictionary of the form {'box_name': '123456789', ...}
+    """
+
+    return dict(zip(boxes, map(mask_digits.__getitem__, masks)))
+
+def update_values(values, masks):
+    """
+    Copy the candidates that changed in the masks to the dictionary form of the puzzle. The masks
+    record their own assignments, so the boxes are updated directly.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        masks(list): a list of 81 candidate masks
+    Returns:
+        The updated values dictionary.
+    """
+
+    for box, mask in zip(boxes, masks):
+        value = mask_digits[mask]
+        if values[box] != value:
+            values[box] = value
+    return values
 
 def display(values):
     """
@@ -206,17 +483,24 @@ def assign_value(values, box, value):
     Assigns a value to a given box. If it updates the board record it.
     """
 
-    global assignments
+    return default_context.assign_value(values, box, value)
 
-    # Don't waste memory appending actions that don't actually change any values
-    if values[box] == value:
-        return values
+def replay_assignments(values, assignments):
+    """
+    Replay the changes recorded in trace mode.
+    Args:
+        values(dict): the board the changes were recorded from, e.g., grid_values(grid)
+        assignments(list): a list of (box, old value, new value) changes
+    Returns:
+        A list with the board after each change.
+    """
 
-    values[box] = value
-    if len(value) == 1:
-        # Update the assignments when we assign a single value to a box.
-        assignments.append(values.copy())
-    return values
+    values = values.copy()
+    boards = []
+    for box, old_value, new_value in assignments:
+        values[box] = new_value
+        boards.append(values.copy())
+    return boards
 
 def grid_values(grid):
     """
@@ -239,12 +523,13 @@ def grid_values(grid):
 
 if __name__ == '__main__':
     diag_sudoku_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+    default_context.trace = True
     solution = solve(diag_sudoku_grid)
     display(solution)
 
     try:
         from visualize import visualize_assignments
-        visualize_assignments(assignments)
+        visualize_assignments(assignments, grid_values(diag_sudoku_grid))
 
     except SystemExit:
         pass
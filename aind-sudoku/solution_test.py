@@ -1,5 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import batch
+import benchmark
+import functools
+import operator
 import solution
 import unittest
+import utils
 
 class TestNakedTwins(unittest.TestCase):
     before_naked_twins_1 = {'I6': '4', 'H9': '3', 'I2': '6', 'E8': '1', 'H3': '5', 'H7': '8', 'I7': '1', 'I4': '8',
@@ -97,5 +104,190 @@ class TestDiagonalSudoku(unittest.TestCase):
     def test_solve(self):
         self.assertEqual(solution.solve(self.diagonal_grid), self.solved_diag_sudoku)
 
+class TestBitmaskCore(unittest.TestCase):
+    diagonal_grid = TestDiagonalSudoku.diagonal_grid
+
+    def test_round_trip(self):
+        values = TestNakedTwins.before_naked_twins_1
+        masks = solution.values_masks(values)
+        self.assertEqual(len(masks), 81)
+        self.assertEqual(masks[solution.box_indices['I1']], 0b110)
+        self.assertEqual(solution.masks_values(masks), values)
+        # The candidates do not need to be sorted in the dictionary form.
+        self.assertEqual(solution.values_masks(dict(values, I1='32')), masks)
+
+    def test_strategies_match_masks(self):
+        values = solution.grid_values(self.diagonal_grid)
+        for strategy, mask_strategy in [(solution.eliminate, solution.eliminate_masks),
+                                        (solution.only_choice, solution.only_choice_masks),
+                                        (solution.single_possibility, solution.single_possibility_masks)]:
+            masks = mask_strategy(solution.values_masks(values))
+            values = strategy(dict(values))
+            self.assertEqual(solution.masks_values(masks), values)
+
+    def test_naked_twins_masks_repeated(self):
+        # Each call to the module-level strategy starts afresh.
+        masks = solution.values_masks(solution.grid_values(benchmark.random_puzzles(1, 24, seed=1)[0]))
+        masks = solution.eliminate_masks(solution.only_choice_masks(solution.eliminate_masks(masks)))
+        first = solution.naked_twins_masks(masks[:])
+        self.assertNotEqual(first, masks)
+        self.assertEqual(solution.naked_twins_masks(masks[:]), first)
+
+    def sweep_masks(self, masks):
+        # Run the strategies over the whole grid until the masks stop changing.
+        context = solution.SolverContext()
+        before = None
+        while masks != before and 0 not in masks:
+            before = masks[:]
+            for strategy in (context.eliminate_masks, context.only_choice_masks,
+                             context.naked_twins_masks, context.single_possibility_masks):
+                masks = strategy(masks)
+        return masks
+
+    def is_consistent(self, masks):
+        for unit in solution.unit_indices:
+            solved = [masks[box] for box in unit if solution.mask_sizes[masks[box]] == 1]
+            if len(set(solved)) != len(solved) or functools.reduce(operator.or_, [masks[box] for box in unit]) != solution.all_digits_mask:
+                return False
+        return 0 not in masks
+
+    def assert_same_fixed_point(self, masks, propagated):
+        swept = self.sweep_masks(masks[:])
+        if propagated is False:
+            self.assertFalse(self.is_consistent(swept))
+        else:
+            self.assertEqual(propagated, swept)
+
+    def test_propagation_fixed_point(self):
+        context = solution.SolverContext()
+        grids = [self.diagonal_grid, TestTrace.backtracking_grid] + benchmark.random_puzzles(20, 20, seed=1)
+        for grid in grids:
+            masks = solution.values_masks(solution.grid_values(grid))
+            reduced = context.reduce_masks(masks[:])
+            self.assert_same_fixed_point(masks, reduced)
+            if reduced is False or all(solution.mask_sizes[mask] == 1 for mask in reduced):
+                continue
+            # Propagating from the box of a search branch reaches the fixed point of a full reduction.
+            box = min((solution.mask_sizes[mask], box) for box, mask in enumerate(reduced) if solution.mask_sizes[mask] > 1)[1]
+            for digit in solution.digit_bits:
+                if reduced[box] & digit:
+                    branch = context.assign_mask(reduced[:], box, digit)
+                    self.assert_same_fixed_point(branch, context.propagate_masks(branch[:], [box]))
+
+    def test_contradiction(self):
+        # Two boxes of the first row solved with the same digit.
+        grid = '22' + '.' * 79
+        self.assertFalse(solution.reduce_puzzle(solution.grid_values(grid)))
+        self.assertFalse(solution.solve(grid))
+        # No box left for the digit 1 in the first row.
+        masks = solution.values_masks(solution.grid_values('.' * 81))
+        for box in range(9):
+            masks[box] &= ~solution.digit_masks['1']
+        self.assertFalse(solution.reduce_masks(masks))
+
+    def test_solve_empty(self):
+        values = solution.solve('.' * 81)
+        for unit in solution.units_all:
+            self.assertEqual(sorted(values[box] for box in unit), list('123456789'))
+
+class TestTrace(unittest.TestCase):
+    diagonal_grid = TestDiagonalSudoku.diagonal_grid
+    # This puzzle needs to abandon a search branch.
+    backtracking_grid = '.6.2...9..........93.....4.6.934....1...9.4.6.4.1...........7....64.39.1..1.5....'
+
+    def tearDown(self):
+        solution.default_context.trace = False
+        del solution.assignments[:]
+
+    def test_trace_off(self):
+        del solution.assignments[:]
+        solution.solve(self.diagonal_grid)
+        self.assertEqual(solution.assignments, [])
+
+    def test_replay(self):
+        solution.default_context.trace = True
+        for grid in (self.diagonal_grid, self.backtracking_grid):
+            del solution.assignments[:]
+            values = solution.solve(grid)
+            for box, old_value, new_value in solution.assignments:
+                self.assertIn(box, solution.boxes)
+                self.assertNotEqual(old_value, new_value)
+            boards = solution.replay_assignments(solution.grid_values(grid), solution.assignments)
+            self.assertEqual(len(boards), len(solution.assignments))
+            self.assertEqual(boards[-1], values)
+
+    def test_undo(self):
+        solution.default_context.trace = True
+        del solution.assignments[:]
+        values = solution.grid_values(self.diagonal_grid)
+        solution.assign_value(values, 'A2', '6')
+        start = len(solution.assignments)
+        solution.assign_value(values, 'A3', '7')
+        solution.assign_value(values, 'A3', '')
+        solution.assign_value(values, 'A4', '9')
+        solution.undo_assignments(start)
+        boards = solution.replay_assignments(solution.grid_values(self.diagonal_grid), solution.assignments)
+        self.assertEqual(boards[-1], dict(solution.grid_values(self.diagonal_grid), A2='6'))
+
+    def test_utils_trace(self):
+        values = solution.grid_values(self.diagonal_grid)
+        del solution.assignments[:]
+        utils.assign_value(values, 'A2', '6')
+        self.assertEqual(utils.assignments, [])
+        solution.default_context.trace = True
+        utils.assign_value(values, 'A3', '7')
+        self.assertEqual(solution.assignments, [('A3', '123456789', '7')])
+        self.assertIs(utils.assignments, solution.assignments)
+
+class TestSolverContext(unittest.TestCase):
+    diagonal_grid = TestDiagonalSudoku.diagonal_grid
+    backtracking_grid = TestTrace.backtracking_grid
+
+    def test_separate_state(self):
+        traced = solution.SolverContext(trace=True)
+        untraced = solution.SolverContext()
+        values = traced.solve(self.backtracking_grid)
+        self.assertEqual(untraced.solve(self.backtracking_grid), values)
+        self.assertEqual(untraced.assignments, [])
+        self.assertEqual(solution.assignments, [])
+        boards = solution.replay_assignments(solution.grid_values(self.backtracking_grid), traced.assignments)
+        self.assertEqual(boards[-1], values)
+
+    def test_solve_resets_state(self):
+        context = solution.SolverContext(trace=True)
+        context.solve(self.backtracking_grid)
+        values = context.solve(self.diagonal_grid)
+        self.assertEqual(values, TestDiagonalSudoku.solved_diag_sudoku)
+        boards = solution.replay_assignments(solution.grid_values(self.diagonal_grid), context.assignments)
+        self.assertEqual(boards[-1], values)
+
+    def test_threads(self):
+        grids = [self.diagonal_grid, self.backtracking_grid] * 4
+        expected = [solution.SolverContext().solve(grid) for grid in grids]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda grid: solution.SolverContext().solve(grid), grids))
+        self.assertEqual(results, expected)
+
+class TestBatch(unittest.TestCase):
+    diagonal_grid = TestDiagonalSudoku.diagonal_grid
+    solution_grid = ''.join(TestDiagonalSudoku.solved_diag_sudoku[box] for box in solution.boxes)
+
+    def test_solve_batch(self):
+        grids = [self.diagonal_grid, '22' + '.' * 79, '123', self.solution_grid] * 5
+        for workers in (1, 2):
+            results = list(batch.solve_batch(iter(grids), workers=workers, chunk_size=3))
+            self.assertEqual([index for index, _, _ in results], list(range(len(grids))))
+            for index, grid, error in results:
+                if index % 4 in (0, 3):
+                    self.assertEqual((grid, error), (self.solution_grid, None))
+                else:
+                    self.assertIsNone(grid)
+            self.assertEqual(results[1][2], 'no solution')
+            self.assertTrue(results[2][2].startswith('AssertionError'))
+
+    def test_read_grids(self):
+        lines = ['\n', self.diagonal_grid.replace('.', '0') + '\n']
+        self.assertEqual(list(batch.read_grids(lines)), [self.diagonal_grid])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,9 @@
 from constants import *
+import solution
 
-# This list holds the board values used in visualization.
-assignments = []
+# The changes used in visualization, as (box, old value, new value) tuples. They are recorded by
+# `solution.default_context`, whose `trace` attribute switches the recording on.
+assignments = solution.default_context.assignments
 
 def cross(A, B):
     """ Cross product of elements in A and elements in B. """
@@ -37,16 +39,7 @@ def assign_value(values, box, value):
     Please use this function to update your values dictionary!
     Assigns a value to a given box. If it updates the board record it.
     """
-
-    # Don't waste memory appending actions that don't actually change any values
-    if values[box] == value:
-        return values
-
-    values[box] = value
-    if len(value) == 1:
-        # Update the assignments when we assign a single value to a box.
-        assignments.append(values.copy())
-    return values
+    return solution.default_context.assign_value(values, box, value)
 
 def grid_values(grid):
     """
@@ -1,7 +1,14 @@
 from PySudoku import play
+from solution import replay_assignments
 
-def visualize_assignments(assignments):
-    """ Visualizes the set of assignments created by the Sudoku AI"""
+def visualize_assignments(assignments, values=None):
+    """ Visualizes the set of assignments created by the Sudoku AI
+
+    The assignments are either boards, or the (box, old value, new value) changes recorded in trace
+    mode, which are replayed from the starting board `values`.
+    """
+    if values is not None:
+        assignments = replay_assignments(values, assignments)
     last_assignment = None
     filtered_assignments = []
 